@@ -1,20 +1,29 @@
 # app.py
 import threading
-import time
 from datetime import datetime, time as dt_time, timedelta
 from config import CONFIG
+from utils import reloj
 from modules.short_monitor import run_short_monitor
-from modules.top_gainers import run_top_gainers
+from modules.top_gainers import run_top_gainers, run_clasificacion
 # Importar el nuevo módulo
 from modules.movimiento_brusco import run_movimiento_brusco
 from modules.deteccion_movimiento import run_deteccion_movimiento
 from modules.reporte_diario import generar_reporte_diario
+from modules.anomalias_volumen import run_anomalias_volumen
+from modules.servidor_estado import run_servidor_estado
+from utils.enrutador import enrutador_notificaciones
+from utils.perfilador import perfilador
+from utils.memoria_precios import pizarra_precios
+from utils.registro import obtener_registro
+from utils import estado
+
+log = obtener_registro("App")
 
 def ejecutar_diariamente(func, hora_ejecucion, nombre):
     tz = CONFIG["MERCADO"]["ZONA_HORARIA"]
     primera_ejecucion = True
     while True:
-        ahora_et = datetime.now(tz)
+        ahora_et = reloj.ahora(tz)
         hora_objetivo = dt_time(*hora_ejecucion)
         # Asegurarse de que la fecha y hora combinadas tengan la zona horaria correcta
         proxima_ejecucion = tz.localize(datetime.combine(ahora_et.date(), hora_objetivo))
@@ -24,28 +33,29 @@ def ejecutar_diariamente(func, hora_ejecucion, nombre):
             proxima_ejecucion += timedelta(days=1)
 
         segundos_espera = (proxima_ejecucion - ahora_et).total_seconds()
+        estado.fusionar("programacion", {nombre: {"proxima_ejecucion": proxima_ejecucion.isoformat()}})
         
         if primera_ejecucion:
-            print(f"⏱️  Programando {nombre} a las {hora_objetivo} ET")
+            log.info("Programando tarea", tarea=nombre, hora=str(hora_objetivo))
             primera_ejecucion = False
 
         # Si es hora de ejecutar
         if segundos_espera <= 0:
-            print(f"⏰ Ejecutando {nombre} a las {ahora_et.strftime('%H:%M:%S')} ET")
+            log.info("Ejecutando tarea", tarea=nombre, hora=ahora_et.strftime('%H:%M:%S'))
             try:
                 func() # Ejecutar la función directamente
             except Exception as e:
-                print(f"❌ Error en {nombre}: {str(e)}")
+                log.error("Error en tarea", tarea=nombre, error=str(e))
             
             # Dormir un minuto para evitar ejecuciones múltiples si el reloj se ajusta
-            time.sleep(61) 
+            reloj.dormir(61) 
             continue # Volver al inicio del bucle para recalcular la próxima ejecución
 
         # Esperar en intervalos, no todo el tiempo restante
         tiempo_espera = min(1800, segundos_espera) # Máximo 30 minutos
         if tiempo_espera > 60:
-            print(f"⏳ Durmiendo {tiempo_espera/60:.1f} min para {nombre}")
-        time.sleep(tiempo_espera)
+            log.debug("Durmiendo hasta la próxima ejecución", tarea=nombre, minutos=tiempo_espera / 60)
+        reloj.dormir(tiempo_espera)
 
 # main.py (agregar después de la función ejecutar_diariamente)
 
@@ -58,7 +68,7 @@ def ejecutar_al_cierre(func, hora_cierre, nombre):
     ejecutado_hoy = False # Bandera para evitar ejecuciones múltiples el mismo día
     
     while True:
-        ahora_et = datetime.now(tz)
+        ahora_et = reloj.ahora(tz)
         hora_objetivo = dt_time(*hora_cierre)
         proxima_ejecucion = tz.localize(datetime.combine(ahora_et.date(), hora_objetivo))
         
@@ -68,35 +78,53 @@ def ejecutar_al_cierre(func, hora_cierre, nombre):
             ejecutado_hoy = False # Resetear bandera para el próximo día
 
         segundos_espera = (proxima_ejecucion - ahora_et).total_seconds()
+        estado.fusionar("programacion", {nombre: {"proxima_ejecucion": proxima_ejecucion.isoformat()}})
         
         if primera_ejecucion:
-            print(f"⏱️  Programando {nombre} para {hora_objetivo} ET (al cierre)")
+            log.info("Programando tarea al cierre", tarea=nombre, hora=str(hora_objetivo))
             primera_ejecucion = False
 
         # Si es hora de ejecutar y no se ha ejecutado hoy
         if segundos_espera <= 0 and not ejecutado_hoy:
-            print(f"⏰ Ejecutando {nombre} a las {ahora_et.strftime('%H:%M:%S')} ET")
+            log.info("Ejecutando tarea", tarea=nombre, hora=ahora_et.strftime('%H:%M:%S'))
             try:
                 func() # Ejecutar la función directamente
                 ejecutado_hoy = True # Marcar como ejecutado hoy
-                print(f"✅ {nombre} ejecutado.")
+                log.info("Tarea ejecutada", tarea=nombre)
             except Exception as e:
-                print(f"❌ Error en {nombre}: {str(e)}")
+                log.error("Error en tarea", tarea=nombre, error=str(e))
             
             # Dormir un minuto para evitar ejecuciones múltiples si el reloj se ajusta
-            time.sleep(61) 
+            reloj.dormir(61) 
             continue # Volver al inicio del bucle para recalcular la próxima ejecución
 
         # Esperar en intervalos, no todo el tiempo restante
         tiempo_espera = min(1800, segundos_espera) # Máximo 30 minutos
         if tiempo_espera > 60 and segundos_espera > 60: # Solo mostrar si hay más de 1 minuto
-            print(f"⏳ Durmiendo {tiempo_espera/60:.1f} min para {nombre}")
-        time.sleep(tiempo_espera)
+            log.debug("Durmiendo hasta la próxima ejecución", tarea=nombre, minutos=tiempo_espera / 60)
+        reloj.dormir(tiempo_espera)
 
 
 def main():
-    print("🚀 Iniciando Sistema de Trading Avanzado")
+    log.info("Iniciando Sistema de Trading Avanzado")
     try:
+        # Hilos de envío de notificaciones (uno por canal)
+        enrutador_notificaciones.iniciar()
+        log.info("Canales de notificación iniciados", canales=",".join(enrutador_notificaciones.canales))
+
+        # Perfilador bajo demanda (SIGUSR1 o archivo de control); apagado no toma muestras
+        perfilador.iniciar()
+        perfilador.instalar_senal()
+
+        # Pizarra de precios en memoria compartida para tableros y scripts locales
+        config_pizarra = CONFIG["MEMORIA_PRECIOS"]
+        if config_pizarra["ENABLED"]:
+            try:
+                pizarra_precios.iniciar(config_pizarra["NOMBRE"], config_pizarra["CAPACIDAD"])
+                log.info("Pizarra de precios compartida", nombre=pizarra_precios.nombre, capacidad=config_pizarra["CAPACIDAD"])
+            except OSError as e:
+                log.warning("No se pudo crear la pizarra de precios compartida", error=str(e))
+
         # Hilo para REPORTES de cortos
         hilo_monitor = threading.Thread(
             target=run_short_monitor,
@@ -104,7 +132,7 @@ def main():
             name="ShortMonitor"
         )
         hilo_monitor.start()
-        print(f"✅ Hilo ShortMonitor (Reportes) iniciado")
+        log.info("Hilo iniciado", hilo="ShortMonitor")
 
         # --- NUEVO HILO: Monitoreo de Movimiento Brusco ---
         hilo_movimiento = threading.Thread(
@@ -113,17 +141,29 @@ def main():
             name="MovimientoBrusco"
         )
         hilo_movimiento.start()
-        print(f"✅ Hilo MovimientoBrusco iniciado")
-
-        # Hilo para top gainers (mañana)
-        hilo_am = threading.Thread(
-            target=ejecutar_diariamente,
-            args=(run_top_gainers, (9, 45), "TopGainersAM"),
+        log.info("Hilo iniciado", hilo="MovimientoBrusco")
+
+        # Hilos para publicar top gainers/losers a las horas configuradas
+        for hora in CONFIG["CLASIFICACION"]["HORAS_PUBLICACION"]:
+            hora_publicacion = dt_time.fromisoformat(hora)
+            nombre = f"TopGainers{hora_publicacion.strftime('%H%M')}"
+            hilo_top = threading.Thread(
+                target=ejecutar_diariamente,
+                args=(run_top_gainers, (hora_publicacion.hour, hora_publicacion.minute), nombre),
+                daemon=True,
+                name=nombre
+            )
+            hilo_top.start()
+            log.info("Hilo iniciado", hilo=nombre, hora=hora)
+
+        # Hilo para alertas de cambios en la clasificación intradía
+        hilo_clasificacion = threading.Thread(
+            target=run_clasificacion,
             daemon=True,
-            name="TopGainersAM"
+            name="Clasificacion"
         )
-        hilo_am.start()
-        print(f"✅ Hilo TopGainersAM iniciado (09:45 AM ET)")
+        hilo_clasificacion.start()
+        log.info("Hilo iniciado", hilo="Clasificacion")
 
         # --- NUEVO HILO: Detección de Movimiento ---
         hilo_deteccion = threading.Thread(
@@ -132,7 +172,16 @@ def main():
             name="DeteccionMovimiento"
         )
         hilo_deteccion.start()
-        print(f"✅ Hilo DeteccionMovimiento iniciado")
+        log.info("Hilo iniciado", hilo="DeteccionMovimiento")
+
+        # Hilo para anomalías de volumen (usa las barras archivadas, sin consultas extra)
+        hilo_anomalias = threading.Thread(
+            target=run_anomalias_volumen,
+            daemon=True,
+            name="AnomaliasVolumen"
+        )
+        hilo_anomalias.start()
+        log.info("Hilo iniciado", hilo="AnomaliasVolumen")
 
         # --- NUEVO HILO: Reporte Diario al Cierre ---
         # Programar para 5 minutos después del cierre del mercado (16:05 ET)
@@ -143,13 +192,23 @@ def main():
             name="ReporteDiario"
         )
         hilo_reporte.start()
-        print(f"✅ Hilo ReporteDiario programado para 16:05 ET")
+        log.info("Hilo iniciado", hilo="ReporteDiario", hora="16:30")
+
+        # --- Servidor HTTP de estado (solo lectura) ---
+        if CONFIG["SERVIDOR_ESTADO"]["ENABLED"]:
+            hilo_servidor = threading.Thread(
+                target=run_servidor_estado,
+                daemon=True,
+                name="ServidorEstado"
+            )
+            hilo_servidor.start()
+            log.info("Hilo iniciado", hilo="ServidorEstado", puerto=CONFIG["SERVIDOR_ESTADO"]["PUERTO"])
 
         # Monitor de estado
         estado_mercado_anterior = None
         ultimo_reporte_hilos = 0
         while True:
-            time.sleep(300) # Dormir 5 minutos
+            reloj.dormir(300) # Dormir 5 minutos
             
             # Verificar estado del mercado
             from utils.notificaciones import mercado_abierto # Importar aquí
@@ -157,21 +216,22 @@ def main():
             
             if estado_mercado_actual != estado_mercado_anterior:
                 estado_str = "ABIERTO" if estado_mercado_actual else "CERRADO"
-                print(f"\n📊 Estado del Mercado: {estado_str}")
+                log.info("Estado del Mercado", estado=estado_str)
                 estado_mercado_anterior = estado_mercado_actual
 
             # Mostrar estado de hilos aproximadamente cada hora
-            tiempo_actual = time.time()
+            tiempo_actual = reloj.epoch()
             if tiempo_actual - ultimo_reporte_hilos > 3300: # Cada ~55 minutos
-                print("\n📊 Estado de hilos:")
-                for hilo in threading.enumerate():
-                    print(f" - {hilo.name}: {'✅ Activo' if hilo.is_alive() else '❌ Inactivo'}")
+                log.info(
+                    "Estado de hilos",
+                    activos=",".join(hilo.name for hilo in threading.enumerate() if hilo.is_alive()),
+                )
                 ultimo_reporte_hilos = tiempo_actual
 
     except KeyboardInterrupt:
-        print("\n🛑 Sistema detenido por el usuario")
+        log.info("Sistema detenido por el usuario")
     except Exception as e:
-        print(f"❌ Error crítico en main: {str(e)}")
+        log.exception("Error crítico en main", error=str(e))
 
 if __name__ == "__main__":
     # Verificar e instalar dependencias si faltan (opcional)
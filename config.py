@@ -2,9 +2,50 @@
 import pytz
 import os
 from dotenv import load_dotenv
+from utils import ajustes
 
 load_dotenv()
 
+
+def _env_entero(nombre, defecto):
+    valor = os.getenv(nombre)
+    if valor is None or valor.strip() == "":
+        return defecto
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"La variable de entorno {nombre} debe ser un entero (valor: {valor!r}).") from None
+
+
+def _env_decimal(nombre, defecto):
+    valor = os.getenv(nombre)
+    if valor is None or valor.strip() == "":
+        return defecto
+    try:
+        return float(valor)
+    except ValueError:
+        raise ValueError(f"La variable de entorno {nombre} debe ser un número (valor: {valor!r}).") from None
+
+
+def _env_booleano(nombre, defecto):
+    valor = os.getenv(nombre)
+    if valor is None or valor.strip() == "":
+        return defecto
+    if valor.strip().lower() in ("true", "1", "si", "sí", "yes"):
+        return True
+    if valor.strip().lower() in ("false", "0", "no"):
+        return False
+    raise ValueError(f"La variable de entorno {nombre} debe ser True o False (valor: {valor!r}).")
+
+
+def _env_lista(nombre, defecto):
+    """Lista separada por comas (p. ej. WATCHLIST=AAPL,NVDA)."""
+    valor = os.getenv(nombre)
+    if valor is None or valor.strip() == "":
+        return defecto
+    return [elemento.strip().upper() for elemento in valor.split(",") if elemento.strip()]
+
+
 # Cargar y validar variables de entorno críticas
 TELEGRAM_TOKEN = os.getenv("BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("CHAT_ID")
@@ -20,7 +61,8 @@ CONFIG = {
     "TELEGRAM": {
         "TOKEN": TELEGRAM_TOKEN,
         "CHAT_ID": TELEGRAM_CHAT_ID,
-        "ENABLED": os.getenv("TELEGRAM_ENABLED", "True").lower() == "true"
+        "ENABLED": _env_booleano("TELEGRAM_ENABLED", True),
+        "API_URL": os.getenv("TELEGRAM_API_URL", "https://api.telegram.org"), # La prueba de carga usa un endpoint falso
     },
     "MERCADO": {
         "APERTURA_HORA": 9,     # Hora de apertura (ET)
@@ -32,12 +74,12 @@ CONFIG = {
         "ZONA_HORARIA": pytz.timezone(os.getenv("TIMEZONE", "US/Eastern"))
     },
     "INTERVALOS": {
-        "SHORT_MONITOR": int(os.getenv("SHORT_MONITOR_INTERVAL", 120)),
+        "SHORT_MONITOR": _env_entero("SHORT_MONITOR_INTERVAL", 120),
         "TOP_GAINERS": 3600,
         "ANOMALY_DETECTOR": 300,
-        "MOVIMIENTO_BRUSCO": int(os.getenv("MOVIMIENTO_BRUSCO_INTERVAL", 300)), # Nuevo intervalo
+        "MOVIMIENTO_BRUSCO": _env_entero("MOVIMIENTO_BRUSCO_INTERVAL", 300), # Nuevo intervalo
         # Nuevo intervalo para detección de movimiento
-        "DETECCION_MOVIMIENTO": int(os.getenv("DETECCION_MOVIMIENTO_INTERVAL", 600)) # Por ejemplo, cada 10 minutos
+        "DETECCION_MOVIMIENTO": _env_entero("DETECCION_MOVIMIENTO_INTERVAL", 600) # Por ejemplo, cada 10 minutos
     },
     "POSICIONES_CORTO": {
         "VAPE": {
@@ -86,19 +128,178 @@ CONFIG = {
     "DETECCION_MOVIMIENTO": {
         # Lista de tickers a monitorear para movimientos bruscos
         # Esta lista puede incluir acciones de largo plazo que quieres vigilar
-        "TICKERS_WATCHLIST": [
+        # (sobrescribible con WATCHLIST=AAPL,NVDA,...)
+        "TICKERS_WATCHLIST": _env_lista("WATCHLIST", [
             "AAPL", "NVDA", "AMD", "TSLA", "META", "MSFT", "AMZN", "LLY",
             "GOOG", "ORLY", "ETN", "LVS", "NFLX", "BTI", "MPWR", "GEV",
             "PPIH", "GS", "AVGO"
-        ],
+        ]),
         # Umbral por defecto para el cambio porcentual entre intervalos
-        "UMBRAL_POR_DEFECTO": 3.0,
+        "UMBRAL_POR_DEFECTO": _env_decimal("UMBRAL_POR_DEFECTO", 3.0),
         # Diccionario para umbrales específicos por ticker (opcional, sobreescribe el por defecto)
         "UMBRALES_POR_TICKER": {
             "TSLA": 2.5, # TSLA es muy volátil, umbral más bajo
             # "META": 2.0, # Si no está, usa UMBRAL_POR_DEFECTO
         }
     },
+
+    "REGLAS": {
+        # Reglas de alerta evaluadas en cada ciclo para todos los tickers del módulo (utils.reglas).
+        # Campos: precio, cambio (% en el intervalo), cambio_dia (% desde la apertura), umbral,
+        #         pnl y pnl_pct (solo posiciones cortas). Operadores: + - * / < <= > >= == != and or not, abs/min/max.
+        # SALIDA: condición que vuelve a armar la regla tras disparar (histéresis); sin ella,
+        #         se rearma cuando CONDICION deja de cumplirse.
+        # ENFRIAMIENTO: segundos mínimos entre disparos del mismo ticker.
+        # TIPO_ALERTA (opcional): ruta de NOTIFICACIONES; por defecto la del módulo.
+        "movimiento_cortos": {
+            "MODULOS": ["MovimientoBrusco"],
+            "DESCRIPCION": "Cambio brusco",
+            "CONDICION": "abs(cambio) >= umbral",
+            "SALIDA": "abs(cambio) < umbral / 2",
+        },
+        "movimiento_watchlist": {
+            "MODULOS": ["DeteccionMovimiento"],
+            "DESCRIPCION": "Cambio brusco",
+            "CONDICION": "abs(cambio) >= umbral",
+            "SALIDA": "abs(cambio) < umbral / 2",
+        },
+        # "solo_caidas": {"MODULOS": ["DeteccionMovimiento"], "CONDICION": "cambio <= -umbral"},
+        # "pnl_bajo": {"MODULOS": ["MovimientoBrusco"], "CONDICION": "pnl < -500", "SALIDA": "pnl > -400", "ENFRIAMIENTO": 3600},
+        # "dia_fuerte": {"MODULOS": ["DeteccionMovimiento"], "CONDICION": "cambio_dia > 5", "SALIDA": "cambio_dia < 4"},
+    },
+
+    "NOTIFICACIONES": {
+        # Canales de envío: cada uno tiene su cola y su hilo (utils.enrutador)
+        "CANALES": {
+            "telegram": {"TIPO": "telegram"}, # Chat principal (TELEGRAM.CHAT_ID); "DIGESTO": False lo desactiva
+            # "telegram_oportunidades": {"TIPO": "telegram", "CHAT_ID": "-1001234567890"},
+            # "webhook": {"TIPO": "webhook", "URL": "https://ejemplo.com/alertas", "CABECERAS": {}},
+            # "archivo": {"TIPO": "archivo", "RUTA": "alertas.jsonl"},
+            # "socket": {"TIPO": "socket", "HOST": "127.0.0.1", "PUERTO": 9009},
+        },
+        # Tipo de alerta -> canales. "*" aplica a los tipos sin ruta propia.
+        # Tipos: reporte, movimiento (cortos), oportunidad (watchlist), mercado, clasificacion, volumen
+        "RUTAS": {
+            "*": ["telegram"],
+        },
+        "TAMANO_COLA": 200,     # Mensajes en espera por canal antes de descartar los más antiguos
+        "REINTENTOS": 3,        # Reintentos por mensaje ante errores del canal
+        "BACKOFF_BASE": 2.0,    # Segundos del primer reintento (se duplica en cada intento)
+        "BACKOFF_MAXIMO": 60.0,
+        "TIMEOUT": 10,          # Segundos por envío
+        # Digesto: alertas que llegan dentro de la ventana se envían en un solo mensaje por chat
+        # (canales con "DIGESTO": True; Telegram lo tiene activo por defecto)
+        "VENTANA_DIGESTO": _env_decimal("VENTANA_DIGESTO", 5.0), # Segundos; 0 desactiva el digesto
+        "TIPOS_URGENTES": ["mercado"], # Tipos que se envían al instante, sin esperar la ventana
+    },
+
+    "CLASIFICACION": {
+        # Tabla intradía de ganadores/perdedores desde la apertura, actualizada con cada barra
+        "TAMANO": 10,                   # N de ganadores y perdedores seguidos (eventos al entrar al top N)
+        "TAMANO_PUBLICACION": 5,        # Filas de cada lista en los envíos programados
+        "HORAS_PUBLICACION": _env_lista("HORAS_CLASIFICACION", ["09:45", "12:00", "15:45"]), # Envíos por Telegram (ET)
+        "ALERTAR_CAMBIOS_RANGO": _env_booleano("ALERTAR_CAMBIOS_RANGO", True), # Alertar entradas al top N
+        "ENFRIAMIENTO_ALERTA": 1800,    # Segundos mínimos entre alertas del mismo ticker y lista
+        "MIN_TICKERS_EVENTOS": 20,      # Tickers con precio necesarios antes de generar eventos de rango
+        "INTERVALO_EVENTOS": 60,        # Cada cuánto se revisan los eventos pendientes
+        "INTERVALO_PUBLICACION": 5,     # Segundos mínimos entre snapshots publicados al estado
+    },
+
+    "ANOMALIAS_VOLUMEN": {
+        # Detector de volumen inusual sobre barras de 5m archivadas (usa INTERVALOS["ANOMALY_DETECTOR"])
+        "DIAS_PERFIL": 20,          # Sesiones previas usadas para el perfil por franja horaria
+        "MIN_SESIONES": 5,          # Sesiones mínimas con dato en la franja para evaluar
+        "Z_UMBRAL": 3.0,            # z (log-volumen) a partir del cual se alerta
+        "VENTANA_Z": 3,             # Barras combinadas en el z móvil
+        "DESVIACION_MINIMA": 0.1,   # Piso de la desviación del log-volumen
+    },
+
+    "TRANSVERSAL": {
+        # Etapa transversal: detecta movimientos de todo el universo para no alertar ticker por ticker
+        "UMBRAL_MERCADO": 1.5,      # |Movimiento típico| (%) a partir del cual se considera movimiento de mercado
+        "AMPLITUD_MINIMA": 0.7,     # Fracción mínima de tickers moviéndose en la misma dirección
+        "MIN_TICKERS": 5,           # Tamaño mínimo del universo para el análisis
+        "Z_ATIPICO": 3.0,           # |z| mínimo para alertar un ticker durante un movimiento de mercado
+        "DISPERSION_MINIMA": 0.25,  # Piso (%) de la dispersión para evitar z-scores explosivos
+        "ETF_REFERENCIA": os.getenv("ETF_REFERENCIA", ""), # p. ej. "SPY"; vacío usa la mediana del universo
+        "BETAS": {},                # Betas por ticker contra el ETF (1.0 si no se indica)
+    },
+
+    "PLANIFICADOR": {
+        # Presupuesto global de solicitudes a Yahoo por minuto para los monitores planificados
+        "SOLICITUDES_POR_MINUTO": _env_entero("PRESUPUESTO_SOLICITUDES_MINUTO", 120),
+        # Límites del intervalo por ticker, como múltiplos del intervalo base del módulo
+        "FACTOR_INTERVALO_MINIMO": 0.2,
+        "FACTOR_INTERVALO_MAXIMO": 1.5, # Un ticker quieto se consulta cada 1,5 intervalos base
+        # Pesos de la prioridad: volatilidad, cercanía al umbral y exposición de la posición
+        "PESO_VOLATILIDAD": 1.0,
+        "PESO_CERCANIA": 2.0,
+        "PESO_EXPOSICION": 1.0,
+        "SUAVIZADO_VOLATILIDAD": 0.3, # Factor de la media móvil exponencial de la volatilidad
+    },
+
+    "LIMITADOR": {
+        # Gobernador global de solicitudes a Yahoo (cubeta de fichas + backoff + circuito)
+        "SOLICITUDES_POR_SEGUNDO": _env_decimal("LIMITE_SOLICITUDES_SEGUNDO", 2.0), # Tasa máxima
+        "TASA_MINIMA": 0.2,        # Piso de la tasa tras reducciones por 429
+        "RAFAGA": 5,               # Capacidad de la cubeta
+        "REINTENTOS": 3,           # Reintentos ante 429/5xx/errores de red
+        "BACKOFF_BASE": 1.0,       # Segundos del primer backoff (se duplica en cada intento)
+        "BACKOFF_MAXIMO": 60.0,
+        "FALLOS_PARA_ABRIR": 5,    # Fallos transitorios seguidos que abren el circuito
+        "PAUSA_CIRCUITO": _env_entero("PAUSA_CIRCUITO", 120), # Segundos con el circuito abierto
+        "RESERVA_POSICIONES": 1,   # Fichas de la cubeta que solo usan las solicitudes de posiciones
+    },
+
+    "FUENTE_DATOS": {
+        # URL de un servidor de historiales alternativo (p. ej. el simulador de prueba_carga.py).
+        # Vacío usa Yahoo Finance.
+        "URL": os.getenv("FUENTE_DATOS_URL", ""),
+    },
+
+    "PERFILADOR": {
+        # Perfilador por muestreo bajo demanda (utils.perfilador). Se activa con `kill -USR1 <pid>`
+        # (MODULO y CICLOS de abajo) o creando ARCHIVO_CONTROL con "Modulo [ciclos]" ("off" lo detiene).
+        # Escribe pilas plegadas en DIRECTORIO, listas para flamegraph.pl o speedscope.
+        "ARCHIVO_CONTROL": os.getenv("PERFILADOR_CONTROL", "perfilar.txt"),
+        "DIRECTORIO": os.getenv("PERFILADOR_DIR", "perfiles"),
+        "MODULO": os.getenv("PERFILADOR_MODULO", "DeteccionMovimiento"), # Monitor que perfila la señal
+        "CICLOS": 3,                  # Ciclos a perfilar por activación
+        "INTERVALO_MUESTREO": 0.005,  # Segundos reales entre muestras durante un ciclo perfilado
+        "REVISION_CONTROL": 2.0,      # Segundos reales entre revisiones del archivo de control
+    },
+
+    "MEMORIA_PRECIOS": {
+        # Pizarra de precios en memoria compartida (utils.memoria_precios) para otros procesos
+        # locales: `LectorPrecios(NOMBRE).snapshot()` lee precios, aperturas, cambios y P&L sin red.
+        "ENABLED": _env_booleano("MEMORIA_PRECIOS_ENABLED", True),
+        "NOMBRE": os.getenv("MEMORIA_PRECIOS_NOMBRE", "market_monitor_precios"),
+        "CAPACIDAD": 1024, # Tickers máximos en el bloque (72 bytes cada uno)
+    },
+
+    "REGISTRO": {
+        # Registro estructurado asíncrono (utils.registro)
+        "NIVEL": os.getenv("LOG_NIVEL", "INFO").upper(), # DEBUG muestra el detalle por ticker
+        "FORMATO": os.getenv("LOG_FORMATO", "kv"),       # "kv" (clave=valor) o "json"
+        "TAMANO_COLA": 10000,                           # Eventos en espera antes de descartar
+    },
+
+    "SERVIDOR_ESTADO": {
+        # Endpoint HTTP local de solo lectura con snapshots en JSON (precios, P&L, alertas, hilos)
+        "ENABLED": _env_booleano("SERVIDOR_ESTADO_ENABLED", True),
+        "HOST": os.getenv("SERVIDOR_ESTADO_HOST", "127.0.0.1"),
+        "PUERTO": _env_entero("SERVIDOR_ESTADO_PUERTO", 8080),
+    },
+
+    "ARCHIVO_BARRAS": {
+        # Archivo binario de solo-anexado con las barras intradiarias obtenidas
+        "ENABLED": _env_booleano("ARCHIVO_BARRAS_ENABLED", True),
+        "DIRECTORIO": os.getenv("ARCHIVO_BARRAS_DIR", "datos/barras"),
+        "INTERVALOS": ["1m", "5m"], # Intervalos que se guardan
+    },
 }
 
+# Compilar una sola vez al arrancar: falla aquí (y no en medio de un ciclo) si algo no es válido
+AJUSTES = ajustes.establecer(ajustes.compilar(CONFIG))
+
 print("✅ Configuración cargada y validada.")
\ No newline at end of file
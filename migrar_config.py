@@ -0,0 +1,110 @@
+# migrar_config.py
+"""
+Convierte la configuración con el formato anterior (last_config.py) al formato actual.
+
+El formato anterior tenía el token en el código, horarios como tuplas (hora, minuto),
+un único intervalo MONITOREO y POSICIONES_CORTO fuera de CONFIG. El actual lee los
+secretos e intervalos del entorno (.env) y el resto de config.py.
+
+Uso:
+    python migrar_config.py [last_config.py] [--env .env]
+
+Imprime las variables de entorno y las secciones de CONFIG a copiar en config.py, y
+verifica que el resultado compile con utils.ajustes antes de mostrarlo.
+"""
+import os
+import sys
+import copy
+import pprint
+import argparse
+import importlib.util
+
+
+def cargar_legado(ruta):
+    """Importa el archivo de configuración anterior como módulo."""
+    spec = importlib.util.spec_from_file_location("config_legado", ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def convertir_legado(config_legado, posiciones_legado):
+    """
+    Devuelve (entorno, secciones): variables de entorno para .env y las claves de CONFIG
+    equivalentes en el formato actual.
+    """
+    telegram = config_legado.get("TELEGRAM", {})
+    mercado = config_legado.get("MERCADO", {})
+    intervalos = config_legado.get("INTERVALOS", {})
+    notificaciones = config_legado.get("NOTIFICACIONES", {})
+
+    entorno = {
+        "BOT_TOKEN": telegram.get("TOKEN", ""),
+        "CHAT_ID": telegram.get("CHAT_ID", ""),
+        "TELEGRAM_ENABLED": str(bool(notificaciones.get("TELEGRAM", True))),
+    }
+    if "ZONA_HORARIA" in mercado:
+        entorno["TIMEZONE"] = str(mercado["ZONA_HORARIA"])
+    if "MONITOREO" in intervalos:
+        # El intervalo único del formato anterior correspondía al monitor de cortos
+        entorno["SHORT_MONITOR_INTERVAL"] = str(int(intervalos["MONITOREO"]))
+
+    secciones = {"MERCADO": {}, "INTERVALOS": {}, "POSICIONES_CORTO": copy.deepcopy(posiciones_legado)}
+    for clave in ("APERTURA", "CIERRE"):
+        if clave in mercado:
+            hora, minuto = mercado[clave]
+            secciones["MERCADO"][f"{clave}_HORA"] = int(hora)
+            secciones["MERCADO"][f"{clave}_MINUTO"] = int(minuto)
+    if "TOP_GAINERS" in intervalos:
+        secciones["INTERVALOS"]["TOP_GAINERS"] = int(intervalos["TOP_GAINERS"])
+    return entorno, secciones
+
+
+def validar(entorno, secciones):
+    """Aplica la conversión sobre la configuración actual y la compila (lanza si no es válida)."""
+    for nombre, valor in entorno.items():
+        os.environ.setdefault(nombre, valor)
+    from config import CONFIG
+    from utils import ajustes
+
+    candidata = copy.deepcopy(CONFIG)
+    candidata["TELEGRAM"].update(TOKEN=entorno["BOT_TOKEN"], CHAT_ID=entorno["CHAT_ID"])
+    candidata["MERCADO"].update(secciones["MERCADO"])
+    candidata["INTERVALOS"].update(secciones["INTERVALOS"])
+    if "SHORT_MONITOR_INTERVAL" in entorno:
+        candidata["INTERVALOS"]["SHORT_MONITOR"] = int(entorno["SHORT_MONITOR_INTERVAL"])
+    candidata["POSICIONES_CORTO"] = secciones["POSICIONES_CORTO"]
+    return ajustes.compilar(candidata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra last_config.py al formato de configuración actual.")
+    parser.add_argument("ruta", nargs="?", default="last_config.py", help="Archivo con el formato anterior")
+    parser.add_argument("--env", default=None, help="Archivo .env al que anexar las variables (si no, solo se imprimen)")
+    args = parser.parse_args()
+
+    legado = cargar_legado(args.ruta)
+    entorno, secciones = convertir_legado(getattr(legado, "CONFIG", {}), getattr(legado, "POSICIONES_CORTO", {}))
+    try:
+        configuracion = validar(entorno, secciones)
+    except ValueError as e:
+        print(f"❌ La configuración convertida no es válida:\n{e}")
+        sys.exit(1)
+
+    lineas_env = [f"{nombre}={valor}" for nombre, valor in entorno.items()]
+    print("# --- Variables de entorno (.env) ---")
+    print("\n".join(lineas_env))
+    print("\n# --- Claves a actualizar en CONFIG (config.py) ---")
+    for seccion, valores in secciones.items():
+        if valores:
+            print(f'"{seccion}": {pprint.pformat(valores, sort_dicts=False)},')
+
+    if args.env:
+        with open(args.env, "a", encoding="utf-8") as f:
+            f.write("\n".join(lineas_env) + "\n")
+        print(f"\n📝 Variables anexadas a {args.env}")
+    print(f"\n✅ Conversión válida: {len(configuracion.posiciones)} posiciones cortas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# modules/anomalias_volumen.py
+import datetime
+import warnings
+from dataclasses import dataclass
+import numpy as np
+from config import CONFIG
+from utils import ajustes, reloj
+from utils.archivo_barras import leer_barras, fechas_disponibles
+from utils.notificaciones import notificar, mercado_abierto
+from utils.registro import obtener_registro
+from utils.metricas import metricas
+from utils.perfilador import perfilador
+from utils import estado
+
+log = obtener_registro("AnomaliasVolumen")
+
+SEGUNDOS_BARRA = 300 # Barras de 5m
+
+
+def obtener_hora_actual_et():
+    return reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"])
+
+
+def _apertura_epoch(fecha):
+    """Epoch (s) de la apertura del mercado para una fecha."""
+    mercado = ajustes.actual().mercado
+    return int(mercado.zona_horaria.localize(datetime.datetime.combine(fecha, mercado.apertura)).timestamp())
+
+
+def _franjas_por_sesion():
+    """Cantidad de barras de 5m entre apertura y cierre (78 en una sesión normal)."""
+    return ajustes.actual().mercado.minutos_sesion * 60 // SEGUNDOS_BARRA
+
+
+def _volumen_por_franja(ticker, fecha, n_franjas):
+    """Volumen de cada franja horaria de una sesión (NaN donde no hay barra archivada)."""
+    fila = np.full(n_franjas, np.nan)
+    barras = leer_barras(ticker, "5m", fecha)
+    if len(barras) == 0:
+        return fila
+    fecha = fecha if isinstance(fecha, datetime.date) else datetime.date.fromisoformat(fecha)
+    franjas = (barras["ts"] - _apertura_epoch(fecha)) // SEGUNDOS_BARRA
+    validas = (franjas >= 0) & (franjas < n_franjas)
+    fila[franjas[validas]] = barras["volume"][validas]
+    return fila
+
+
+@dataclass(frozen=True)
+class PerfilVolumen:
+    """Perfil de volumen por ticker y franja horaria, en log(1 + volumen)."""
+    fecha: datetime.date
+    tickers: tuple
+    media: np.ndarray       # (tickers, franjas)
+    desviacion: np.ndarray  # (tickers, franjas)
+    sesiones: np.ndarray    # Sesiones con dato por ticker y franja
+
+
+def construir_perfil(tickers, fecha):
+    """
+    Construye el perfil de volumen con las sesiones archivadas anteriores a `fecha`.
+    Se calcula una vez por día; la evaluación posterior es solo aritmética de arreglos.
+    """
+    config = CONFIG["ANOMALIAS_VOLUMEN"]
+    n_franjas = _franjas_por_sesion()
+    fecha_str = fecha.strftime("%Y-%m-%d")
+    sesiones = [f for f in fechas_disponibles("5m") if f < fecha_str][-config["DIAS_PERFIL"]:]
+
+    # Cubo (sesiones, tickers, franjas) de log-volumen
+    cubo = np.full((len(sesiones), len(tickers), n_franjas), np.nan)
+    for i, sesion in enumerate(sesiones):
+        for j, ticker in enumerate(tickers):
+            cubo[i, j] = _volumen_por_franja(ticker, sesion, n_franjas)
+    cubo = np.log1p(cubo)
+
+    # Franjas sin ninguna sesión quedan en NaN (nanmean avisa con RuntimeWarning)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        media = np.nanmean(cubo, axis=0)
+        desviacion = np.nanstd(cubo, axis=0)
+    conteo = np.sum(~np.isnan(cubo), axis=0)
+    desviacion = np.maximum(desviacion, config["DESVIACION_MINIMA"])
+
+    return PerfilVolumen(fecha=fecha, tickers=tuple(tickers), media=media, desviacion=desviacion, sesiones=conteo)
+
+
+def evaluar(perfil, fecha):
+    """
+    Evalúa las barras de hoy de todos los tickers contra el perfil en una pasada vectorizada.
+    Devuelve (z por barra, z móvil, volúmenes de hoy), todos de forma (tickers, franjas).
+    """
+    config = CONFIG["ANOMALIAS_VOLUMEN"]
+    n_franjas = perfil.media.shape[1]
+    hoy = np.vstack([_volumen_por_franja(t, fecha, n_franjas) for t in perfil.tickers]) if perfil.tickers else np.empty((0, n_franjas))
+
+    z = (np.log1p(hoy) - perfil.media) / perfil.desviacion
+    z[perfil.sesiones < config["MIN_SESIONES"]] = np.nan
+
+    # z móvil: combinación de las últimas VENTANA_Z barras (suma / raíz de k)
+    k = config["VENTANA_Z"]
+    z_relleno = np.nan_to_num(z, nan=0.0)
+    presentes = (~np.isnan(z)).astype(np.float64)
+    acumulado = np.cumsum(z_relleno, axis=1)
+    acumulado_presentes = np.cumsum(presentes, axis=1)
+    suma = acumulado.copy()
+    n = acumulado_presentes.copy()
+    suma[:, k:] -= acumulado[:, :-k]
+    n[:, k:] -= acumulado_presentes[:, :-k]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z_movil = np.where(n > 0, suma / np.sqrt(n), np.nan)
+    return z, z_movil, hoy
+
+
+def _ultima_franja_con_dato(con_dato):
+    """Índice de la última franja con dato en cada fila."""
+    return con_dato.shape[1] - 1 - np.argmax(con_dato[:, ::-1], axis=1)
+
+
+def run_anomalias_volumen():
+    """
+    Detecta volumen inusual en las barras de 5m de la watchlist y las posiciones cortas.
+    Usa solo barras ya archivadas por los otros monitores: no hace consultas a Yahoo.
+    """
+    config = CONFIG["ANOMALIAS_VOLUMEN"]
+    intervalo = ajustes.actual().intervalos.anomaly_detector
+    tickers = ajustes.actual().universo
+    log.info("Iniciando detector de anomalías de volumen", tickers=len(tickers), intervalo=intervalo)
+
+    perfil = None
+    armado = None # Por ticker: se puede alertar (histéresis por episodio)
+
+    while True:
+        if not mercado_abierto():
+            reloj.dormir(intervalo)
+            continue
+
+        inicio_ciclo = reloj.monotonico()
+        perfilador.iniciar_ciclo("AnomaliasVolumen")
+        try:
+            ahora = obtener_hora_actual_et()
+            hoy = ahora.date()
+            if perfil is None or perfil.fecha != hoy:
+                perfil = construir_perfil(tickers, hoy)
+                armado = np.ones(len(perfil.tickers), dtype=bool)
+                log.info("Perfil de volumen construido", fecha=str(hoy), sesiones=int(perfil.sesiones.max(initial=0)))
+
+            try:
+                z, z_movil, volumenes = evaluar(perfil, hoy)
+            except Exception as e:
+                # Se reintenta en el próximo intervalo (la espera queda fuera del ciclo)
+                log.warning("Error evaluando volumen", error=str(e))
+            else:
+                # Solo la última barra con dato de cada ticker
+                con_dato = ~np.isnan(volumenes)
+                ultima = np.where(con_dato.any(axis=1), _ultima_franja_con_dato(con_dato), -1)
+                filas = np.arange(len(perfil.tickers))
+                z_ultima = np.where(ultima >= 0, z[filas, ultima], np.nan)
+                z_movil_ultima = np.where(ultima >= 0, z_movil[filas, ultima], np.nan)
+                anomalos = (z_ultima >= config["Z_UMBRAL"]) | (z_movil_ultima >= config["Z_UMBRAL"])
+
+                # Un pico sigue dentro del z móvil durante VENTANA_Z barras: una sola alerta por
+                # episodio, y el ticker se rearma recién cuando ambos z vuelven bajo el umbral
+                armado |= (ultima >= 0) & ~anomalos
+                nuevos = anomalos & armado
+                armado &= ~nuevos
+
+                for j in np.flatnonzero(nuevos):
+                    ticker = perfil.tickers[j]
+                    franja = int(ultima[j])
+
+                    hora_barra = datetime.datetime.fromtimestamp(_apertura_epoch(hoy) + franja * SEGUNDOS_BARRA, CONFIG["MERCADO"]["ZONA_HORARIA"])
+                    volumen = volumenes[j, franja]
+                    multiplo = volumen / np.expm1(perfil.media[j, franja]) if perfil.media[j, franja] > 0 else float("nan")
+                    mensaje = (
+                        f"📊 Volumen inusual en *{ticker}*:\n"
+                        f"  Barra {hora_barra.strftime('%H:%M')}: {volumen:,.0f} acciones (x{multiplo:.1f} vs perfil)\n"
+                        f"  z barra: {z_ultima[j]:+.1f} | z móvil ({config['VENTANA_Z']} barras): {z_movil_ultima[j]:+.1f}"
+                    )
+                    notificar("volumen", mensaje)
+                    log.info("Alerta de volumen inusual enviada", ticker=ticker, barra=hora_barra.strftime('%H:%M'), z=float(z_ultima[j]), z_movil=float(z_movil_ultima[j]))
+
+                metricas.registrar_ciclo("AnomaliasVolumen", reloj.monotonico() - inicio_ciclo, intervalo)
+                estado.registrar_latido("AnomaliasVolumen", tickers=int(con_dato.any(axis=1).sum()))
+        finally:
+            perfilador.terminar_ciclo("AnomaliasVolumen")
+
+        reloj.dormir(intervalo)
+
@@ -1,16 +1,30 @@
 # modules/deteccion_movimiento.py
-import time
-import datetime
-import yfinance as yf
 from config import CONFIG
-from utils.notificaciones import enviar_telegram, mercado_abierto
+from utils import ajustes, reloj
+from utils.datos_mercado import obtener_historial
+from utils.limitador import CircuitoAbiertoError, limitador_yahoo
+from utils.notificaciones import notificar, mercado_abierto
+from utils.planificador import PlanificadorPrioridad
+from utils.reglas import MotorReglas, TablaCampos, agrupar_disparos
+from utils.transversal import analizar_recientes, mensaje_mercado
+from utils.registro import obtener_registro
+from utils.metricas import metricas
+from utils.perfilador import perfilador
+from utils.memoria_precios import pizarra_precios
+from utils import estado
+
+log = obtener_registro("DeteccionMovimiento")
 
 # Diccionario para almacenar el precio anterior de cada ticker
 # Se inicializa como un diccionario vacío
 precios_anteriores = {}
+# Momento (epoch) en que se fijó cada precio anterior
+momentos_referencia = {}
+# Último cambio por intervalo de cada ticker: {ticker: (cambio %, momento epoch)}
+ultimos_cambios = {}
 
 def obtener_hora_actual_et():
-    return datetime.datetime.now(CONFIG["MERCADO"]["ZONA_HORARIA"])
+    return reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"])
 
 def calcular_cambio_porcentual(precio_actual, precio_base):
     """Calcula el cambio porcentual entre dos precios."""
@@ -21,124 +35,188 @@ def calcular_cambio_porcentual(precio_actual, precio_base):
 def run_deteccion_movimiento():
     """
     Monitorea movimientos bruscos intradiarios de una lista de acciones.
-    Envía alertas cuando el cambio porcentual entre dos intervalos es significativo.
+    Las alertas las deciden las reglas de CONFIG["REGLAS"] (por defecto, un cambio entre
+    intervalos mayor al umbral), evaluadas juntas para toda la watchlist en cada ciclo.
     Pensado para identificar oportunidades de entrada o salidas potenciales.
+    Los tickers se consultan con frecuencia adaptativa (ver utils.planificador).
     """
     global precios_anteriores # Acceder a la variable global
-    print("🚀 Iniciando módulo de Detección de Movimiento (Oportunidades)...")
-    
     # Obtener la lista de tickers a monitorear desde la configuración
-    tickers_a_monitorear = CONFIG["DETECCION_MOVIMIENTO"]["TICKERS_WATCHLIST"]
-    
-    print(f"🔍 Monitoreando movimientos de {len(tickers_a_monitorear)} acciones:")
+    config = ajustes.actual()
+    watchlist = config.watchlist # Umbral por ticker resuelto una sola vez al compilar la configuración
+    tickers_a_monitorear = watchlist.tickers
+    log.info(
+        "Iniciando módulo de Detección de Movimiento (Oportunidades)",
+        acciones=len(tickers_a_monitorear),
+        tickers=",".join(tickers_a_monitorear),
+    )
     for ticker in tickers_a_monitorear:
-        print(f" - {ticker}")
         # Inicializar el diccionario de precios anteriores si es la primera vez
         if ticker not in precios_anteriores:
             precios_anteriores[ticker] = None
 
     # Definir el intervalo de monitoreo (puedes usar uno específico o el de movimiento_brusco)
-    intervalo_monitoreo = CONFIG["INTERVALOS"].get("DETECCION_MOVIMIENTO", CONFIG["INTERVALOS"]["MOVIMIENTO_BRUSCO"])
+    intervalo_monitoreo = config.intervalos.deteccion_movimiento
+    planificador = PlanificadorPrioridad(tickers_a_monitorear, intervalo_monitoreo)
+    ultima_alerta_mercado = 0.0
+    # Campos por ticker para las reglas (umbral fijo; el resto se actualiza en cada consulta)
+    tabla = TablaCampos(tickers_a_monitorear)
+    tabla.asignar("umbral", tickers_a_monitorear, [watchlist.reglas[t].umbral for t in tickers_a_monitorear])
+    motor = MotorReglas(config.reglas_de("DeteccionMovimiento"), tabla.tickers)
+    log.info("Reglas de alerta", reglas=",".join(regla.nombre for regla in motor.reglas))
 
     while True:
         # Verificar si el mercado está abierto antes de hacer cualquier cosa
         if not mercado_abierto():
-            time.sleep(intervalo_monitoreo)
+            reloj.dormir(intervalo_monitoreo)
             continue
 
-        ahora = obtener_hora_actual_et()
-        # print(f"\n🔍 Verificación Detección de Movimiento: {ahora.strftime('%Y-%m-%d %H:%M:%S')} ET") # Opcional: loggear cada verificación
-        alertas_enviadas = [] # Para evitar enviar la misma alerta múltiples veces en una iteración
+        inicio_ciclo = reloj.monotonico()
+        perfilador.iniciar_ciclo("DeteccionMovimiento")
+        try:
+            ahora = obtener_hora_actual_et()
+            log.debug("Verificación Detección de Movimiento", hora=ahora.strftime('%H:%M:%S'))
+            precios_ciclo = {} # Snapshot de precios publicado al final del ciclo
+            alertas_ciclo = {}
+            contexto = {} # ticker -> datos para el mensaje de alerta
         
-        for ticker in tickers_a_monitorear: # Iterar sobre la lista de tickers
-            try:
-                ticker_obj = yf.Ticker(ticker)
-                
-                # --- 1. Obtener precio actual ---
-                hist_actual = ticker_obj.history(period="1d", interval="5m") # Usar 5m
+            tickers_ciclo = planificador.pendientes() # Solo los tickers que toca consultar en esta vuelta
+            for posicion_ciclo, ticker in enumerate(tickers_ciclo):
+                try:
+                    # --- 1. Obtener precio actual ---
+                    hist_actual = obtener_historial(ticker, period="1d", interval="5m") # Usar 5m
                 
-                if hist_actual.empty:
-                    raise ValueError("No se pudieron obtener datos históricos recientes (5m)")
+                    if hist_actual.empty:
+                        raise ValueError("No se pudieron obtener datos históricos recientes (5m)")
                 
-                precio_actual = hist_actual['Close'].iloc[-1]
+                    precio_actual = hist_actual['Close'].iloc[-1]
                 
-                if precio_actual is None or precio_actual <= 0:
-                    raise ValueError("Precio actual no disponible o inválido")
+                    if precio_actual is None or precio_actual <= 0:
+                        raise ValueError("Precio actual no disponible o inválido")
 
-                # --- 2. Obtener el precio ANTERIOR ---
-                precio_anterior = precios_anteriores.get(ticker)
+                    # --- 2. Obtener el precio ANTERIOR ---
+                    precio_anterior = precios_anteriores.get(ticker)
                 
-                # --- 3. Calcular el CAMBIO PORCENTUAL entre intervalos ---
-                cambio_porcentual = 0.0
-                if precio_anterior is not None and precio_anterior > 0:
-                    cambio_porcentual = calcular_cambio_porcentual(precio_actual, precio_anterior)
-                    cambio_porcentual = round(cambio_porcentual, 2)
-                else:
-                    # Si no hay precio anterior, intentar usar el precio de apertura del día
-                    if precio_anterior is None:
-                        hist_diario = ticker_obj.history(period="1d", interval="1d")
-                        if not hist_diario.empty:
-                            precio_apertura_hoy = hist_diario['Open'].iloc[-1]
-                            if precio_apertura_hoy is not None and precio_apertura_hoy > 0:
-                                cambio_porcentual = calcular_cambio_porcentual(precio_actual, precio_apertura_hoy)
-                                cambio_porcentual = round(cambio_porcentual, 2)
-                                print(f"  ℹ️  {ticker}: Usando precio de apertura (${precio_apertura_hoy:.2f}) para primera comparación.")
+                    # --- 3. Calcular el CAMBIO PORCENTUAL entre intervalos ---
+                    cambio_porcentual = 0.0
+                    if precio_anterior is not None and precio_anterior > 0:
+                        cambio_porcentual = calcular_cambio_porcentual(precio_actual, precio_anterior)
+                        cambio_porcentual = round(cambio_porcentual, 2)
+                    else:
+                        # Si no hay precio anterior, intentar usar el precio de apertura del día
+                        if precio_anterior is None:
+                            hist_diario = obtener_historial(ticker, period="1d", interval="1d")
+                            if not hist_diario.empty:
+                                precio_apertura_hoy = hist_diario['Open'].iloc[-1]
+                                if precio_apertura_hoy is not None and precio_apertura_hoy > 0:
+                                    cambio_porcentual = calcular_cambio_porcentual(precio_actual, precio_apertura_hoy)
+                                    cambio_porcentual = round(cambio_porcentual, 2)
+                                    log.debug("Usando precio de apertura para primera comparación", ticker=ticker, apertura=precio_apertura_hoy)
+                                else:
+                                    log.warning("Precio de apertura no disponible para primera comparación", ticker=ticker)
                             else:
-                                print(f"  ⚠️  {ticker}: Precio de apertura no disponible para primera comparación.")
-                        else:
-                            print(f"  ⚠️  {ticker}: Datos diarios no disponibles para primera comparación.")
-
-                # --- 4. Actualizar el precio anterior para la próxima iteración ---
-                precios_anteriores[ticker] = precio_actual
-
-                # --- 5. Formar mensaje informativo (opcional para consola) ---
-                precio_anterior_fmt = f"{precio_anterior:.2f}" if precio_anterior is not None else 'N/A'
-                mensaje_consola = (
-                    f"  {ticker}: ${precio_anterior_fmt} → ${precio_actual:.2f} | "
-                    f"Cambio: {cambio_porcentual:+.2f}% | "
-                    f"Umbral: {CONFIG['DETECCION_MOVIMIENTO']['UMBRALES_POR_TICKER'].get(ticker, CONFIG['DETECCION_MOVIMIENTO']['UMBRAL_POR_DEFECTO']):.1f}%"
-                )
-                print(f"  {mensaje_consola}")
+                                log.warning("Datos diarios no disponibles para primera comparación", ticker=ticker)
 
-                # --- 6. Verificar umbral para ALERTA ---
-                # Obtener umbral específico o usar el por defecto
-                umbral_movimiento = CONFIG['DETECCION_MOVIMIENTO']['UMBRALES_POR_TICKER'].get(ticker, CONFIG['DETECCION_MOVIMIENTO']['UMBRAL_POR_DEFECTO'])
-                
-                # Solo enviar alerta si el cambio porcentual es significativo 
-                # Y no se ha enviado ya en esta iteración para este ticker
-                # Puedes personalizar la lógica aquí: solo caídas, solo subidas, ambos
-                # Por ejemplo, para solo caídas: if cambio_porcentual <= -umbral_movimiento and ticker not in alertas_enviadas:
-                if abs(cambio_porcentual) >= umbral_movimiento and ticker not in alertas_enviadas:
-                    
-                    # --- 7. Calcular Movimiento Total del Día para la Alerta ---
-                    cambio_total_dia = "N/A"
-                    try:
-                        hist_diario_alerta = ticker_obj.history(period="1d", interval="1d")
-                        if not hist_diario_alerta.empty:
-                            precio_apertura_hoy_alerta = hist_diario_alerta['Open'].iloc[-1]
-                            if precio_apertura_hoy_alerta is not None and precio_apertura_hoy_alerta > 0:
-                                cambio_total_dia = calcular_cambio_porcentual(precio_actual, precio_apertura_hoy_alerta)
-                                cambio_total_dia = round(cambio_total_dia, 2)
-                    except Exception:
-                        pass # cambio_total_dia ya es "N/A"
-
-                    # --- 8. Formar y enviar mensaje de alerta ---
-                    direccion_movimiento = "📉 Caída Brusca" if cambio_porcentual < 0 else "📈 Subida Brusca"
-                    
-                    mensaje_alerta = (
-                        f"🔔 {direccion_movimiento} en *{ticker}*:\n"
-                        f"  Precio: ${precio_anterior_fmt} → ${precio_actual:.2f}\n"
-                        f"  Cambio Intervalo: {cambio_porcentual:+.2f}% (Umbral: {umbral_movimiento:.1f}%)\n"
-                        f"  📊 Movimiento Total Hoy: {cambio_total_dia if cambio_total_dia != 'N/A' else 'N/A'}%"
-                    )
-                    enviar_telegram(mensaje_alerta)
-                    print(f"  🔔 Alerta de movimiento brusco enviada para {ticker}: {cambio_porcentual:+.2f}% (Total Hoy: {cambio_total_dia if cambio_total_dia != 'N/A' else 'N/A'}%)")
-                    alertas_enviadas.append(ticker) # Marcar como alerta enviada
+                    # --- 4. Renovar el precio anterior una vez por intervalo ---
+                    # Las consultas adicionales del planificador comparan contra la misma referencia
+                    if precio_anterior is None or reloj.epoch() - momentos_referencia.get(ticker, 0) >= intervalo_monitoreo:
+                        precios_anteriores[ticker] = precio_actual
+                        momentos_referencia[ticker] = reloj.epoch()
+
+                    # --- 5. Formatear precio anterior para la alerta ---
+                    precio_anterior_fmt = f"{precio_anterior:.2f}" if precio_anterior is not None else 'N/A'
+
+                    # --- 6. Umbral del ticker (prioridad en el planificador y campo de las reglas) ---
+                    # Umbral específico o por defecto, ya resuelto en la regla del ticker
+                    umbral_movimiento = watchlist.reglas[ticker].umbral
+                    planificador.registrar(ticker, precio_actual, cambio_porcentual, umbral_movimiento)
+                    # Detalle por ticker (solo en nivel DEBUG)
+                    log.debug("Movimiento", ticker=ticker, anterior=precio_anterior, actual=precio_actual, cambio=cambio_porcentual, umbral=umbral_movimiento)
+                    precios_ciclo[ticker] = {
+                        "precio": float(precio_actual),
+                        "anterior": float(precio_anterior) if precio_anterior is not None else None,
+                        "cambio_intervalo": float(cambio_porcentual),
+                        "momento": ahora.isoformat(),
+                        "modulo": "DeteccionMovimiento",
+                    }
+                    ultimos_cambios[ticker] = (float(cambio_porcentual), reloj.epoch())
+
+                    # --- 7. Registrar los campos del ticker para las reglas ---
+                    # El cambio del día sale de la primera barra de 5m de hoy (sin otra consulta).
+                    # Las condiciones (solo caídas, solo subidas, ...) se definen en CONFIG["REGLAS"].
+                    apertura_5m = hist_actual['Open'].iloc[0]
+                    cambio_dia = round(calcular_cambio_porcentual(precio_actual, apertura_5m), 2) if apertura_5m > 0 else None
+                    tabla.actualizar(ticker, precio=precio_actual, cambio=cambio_porcentual, cambio_dia=cambio_dia)
+                    precios_ciclo[ticker]["apertura"] = float(apertura_5m) if apertura_5m > 0 else None
+                    precios_ciclo[ticker]["cambio_dia"] = cambio_dia
+                    contexto[ticker] = (precio_anterior_fmt, precio_actual, cambio_porcentual, cambio_dia)
                     
-            except Exception as e: # Manejo de excepciones general
-                print(f"⚠️ Error general procesando {ticker} (Detección Movimiento): {str(e)}")
-                # Opcional: Resetear el valor anterior en caso de error 
-                # precios_anteriores[ticker] = None
-                continue
+                except CircuitoAbiertoError:
+                    # Yahoo está limitando: no insistir con el resto de los tickers
+                    log.warning("Yahoo no disponible (circuito abierto). Pausando Detección de Movimiento")
+                    planificador.devolver(tickers_ciclo[posicion_ciclo + 1:]) # No se consultaron
+                    reloj.dormir(limitador_yahoo.segundos_para_reintento())
+                    break
+                except Exception as e: # Manejo de excepciones general
+                    log.warning("Error general procesando ticker", ticker=ticker, error=str(e))
+                    # Opcional: Resetear el valor anterior en caso de error 
+                    # precios_anteriores[ticker] = None
+                    planificador.reprogramar(ticker)
+                    continue
+
+            # --- 8. Evaluar las reglas sobre toda la watchlist de una vez ---
+            disparos = motor.evaluar(tabla, reloj.epoch())
+            for disparo in disparos:
+                if "cambio" in disparo.regla.campos:
+                    # Tras la alerta, el siguiente cambio se mide desde el precio actual
+                    precios_anteriores[disparo.ticker] = contexto[disparo.ticker][1]
+                    momentos_referencia[disparo.ticker] = reloj.epoch()
+
+            # --- 9. Etapa transversal: separar el movimiento de mercado de los propios ---
+            # Si toda la watchlist se mueve a la vez, se envía una sola alerta de mercado
+            # y solo se alertan los tickers atípicos respecto al resto (reglas sobre el cambio).
+            if any("cambio" in disparo.regla.campos for disparo in disparos):
+                analisis = analizar_recientes(ultimos_cambios, intervalo_monitoreo)
+                if analisis is not None and analisis.movimiento_mercado:
+                    if reloj.epoch() - ultima_alerta_mercado >= intervalo_monitoreo:
+                        notificar("mercado", mensaje_mercado(analisis, "la watchlist"))
+                        ultima_alerta_mercado = reloj.epoch()
+                        log.info("Alerta de movimiento de mercado enviada", mediana=analisis.mediana, amplitud=analisis.amplitud)
+                    suprimidos = {d.ticker for d in disparos if "cambio" in d.regla.campos and not analisis.es_atipico(d.ticker)}
+                    if suprimidos:
+                        log.info("Alertas suprimidas por movimiento de mercado", tickers=",".join(sorted(suprimidos)))
+                    disparos = [d for d in disparos if not ("cambio" in d.regla.campos and d.ticker in suprimidos)]
+
+            # --- 10. Formar y enviar un mensaje por ticker con las reglas que disparó ---
+            for (ticker, tipo_alerta), reglas_ticker in agrupar_disparos(disparos, "oportunidad").items():
+                precio_anterior_fmt, precio_actual, cambio_porcentual, cambio_total_dia = contexto[ticker]
+                direccion_movimiento = "📉 Caída Brusca" if cambio_porcentual < 0 else "📈 Subida Brusca"
+            
+                mensaje_alerta = (
+                    f"🔔 {direccion_movimiento} en *{ticker}*: {', '.join(regla.descripcion for regla in reglas_ticker)}\n"
+                    f"  Precio: ${precio_anterior_fmt} → ${precio_actual:.2f}\n"
+                    f"  Cambio Intervalo: {cambio_porcentual:+.2f}% (Umbral: {watchlist.reglas[ticker].umbral:.1f}%)\n"
+                    f"  📊 Movimiento Total Hoy: {cambio_total_dia if cambio_total_dia is not None else 'N/A'}%"
+                )
+                notificar(tipo_alerta, mensaje_alerta)
+                log.info(
+                    "Alerta de movimiento brusco enviada",
+                    ticker=ticker, reglas=",".join(regla.nombre for regla in reglas_ticker),
+                    cambio=cambio_porcentual, total_hoy=cambio_total_dia,
+                )
+                alertas_ciclo[ticker] = {"momento": ahora.isoformat(), "cambio": float(cambio_porcentual), "modulo": "DeteccionMovimiento"}
+
+            # Publicar snapshots para el servidor de estado y la pizarra compartida
+            estado.fusionar("precios", precios_ciclo)
+            pizarra_precios.actualizar({
+                ticker: {"precio": datos["precio"], "apertura": datos.get("apertura"), "cambio": datos["cambio_intervalo"], "cambio_dia": datos.get("cambio_dia")}
+                for ticker, datos in precios_ciclo.items()
+            })
+            if alertas_ciclo:
+                estado.fusionar("alertas", alertas_ciclo)
+            metricas.registrar_ciclo("DeteccionMovimiento", reloj.monotonico() - inicio_ciclo, intervalo_monitoreo)
+            estado.registrar_latido("DeteccionMovimiento", tickers=len(precios_ciclo))
+        finally:
+            perfilador.terminar_ciclo("DeteccionMovimiento")
 
-        time.sleep(intervalo_monitoreo)
+        reloj.dormir(planificador.espera())
@@ -1,15 +1,30 @@
 # modules/movimiento_brusco.py
-import time
-import datetime
-import yfinance as yf
 from config import CONFIG
-from utils.notificaciones import enviar_telegram, mercado_abierto
+from utils import ajustes, reloj
+from utils.datos_mercado import obtener_historial
+from utils.limitador import CircuitoAbiertoError, PRIORIDAD_POSICIONES, limitador_yahoo
+from utils.notificaciones import notificar, mercado_abierto
+from utils.portafolio import portafolio_cortos
+from utils.planificador import PlanificadorPrioridad
+from utils.reglas import MotorReglas, TablaCampos, agrupar_disparos
+from utils.transversal import analizar_recientes, mensaje_mercado
+from utils.registro import obtener_registro
+from utils.metricas import metricas
+from utils.perfilador import perfilador
+from utils.memoria_precios import pizarra_precios
+from utils import estado
+
+log = obtener_registro("MovimientoBrusco")
 
 # Diccionario para almacenar el precio anterior de cada ticker
 precios_anteriores = {}
+# Momento (epoch) en que se fijó cada precio anterior
+momentos_referencia = {}
+# Último cambio por intervalo de cada ticker: {ticker: (cambio %, momento epoch)}
+ultimos_cambios = {}
 
 def obtener_hora_actual_et():
-    return datetime.datetime.now(CONFIG["MERCADO"]["ZONA_HORARIA"])
+    return reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"])
 
 def calcular_cambio_porcentual(precio_actual, precio_base):
     """Calcula el cambio porcentual entre dos precios."""
@@ -17,121 +32,220 @@ def calcular_cambio_porcentual(precio_actual, precio_base):
         return 0  # Evitar división por cero o valores nulos
     return ((precio_actual - precio_base) / precio_base) * 100
 
+def pesos_exposicion(snapshot):
+    """Fracción de la exposición total que representa cada posición (0 si no hay precio)."""
+    if not snapshot.exposicion_total:
+        return {}
+    return {
+        ticker: float(exposicion) / snapshot.exposicion_total
+        for ticker, exposicion in zip(snapshot.tickers, snapshot.exposicion)
+        if exposicion == exposicion # Descarta NaN
+    }
+
 def run_movimiento_brusco():
     """
     Monitorea el movimiento brusco intradiario de las posiciones cortas.
-    Envía alertas cuando el cambio porcentual entre dos intervalos es significativo.
+    Las alertas las deciden las reglas de CONFIG["REGLAS"] (por defecto, un cambio entre
+    intervalos mayor al umbral), evaluadas juntas para todas las posiciones en cada ciclo.
+    Los tickers se consultan con frecuencia adaptativa (ver utils.planificador).
     """
     global precios_anteriores
-    print("🚀 Iniciando módulo de detección de Movimiento Brusco...")
-    posiciones = CONFIG["POSICIONES_CORTO"]
-    print(f"🔍 Monitoreando movimiento brusco de {len(posiciones)} posiciones:")
+    config = ajustes.actual()
+    posiciones = config.posiciones # Reglas por ticker ya resueltas (umbral incluido)
+    log.info("Iniciando módulo de detección de Movimiento Brusco", posiciones=len(posiciones), tickers=",".join(posiciones))
     for ticker in posiciones:
-        print(f" - {ticker}")
         if ticker not in precios_anteriores:
             precios_anteriores[ticker] = None
 
+    tiempo_intervalo = config.intervalos.movimiento_brusco
+    # Cada consulta cuesta una solicitud (barras de 5m); la apertura sale de la primera barra
+    planificador = PlanificadorPrioridad(list(posiciones), tiempo_intervalo)
+    ultima_alerta_mercado = 0.0
+    # Campos por ticker para las reglas (umbral fijo; el resto se actualiza en cada consulta)
+    tabla = TablaCampos(posiciones)
+    tabla.asignar("umbral", list(posiciones), [posicion.umbral for posicion in posiciones.values()])
+    motor = MotorReglas(config.reglas_de("MovimientoBrusco"), tabla.tickers)
+    log.info("Reglas de alerta", reglas=",".join(regla.nombre for regla in motor.reglas))
+
     while True:
         if not mercado_abierto():
-            tiempo_intervalo = CONFIG["INTERVALOS"].get("MOVIMIENTO_BRUSCO", CONFIG["INTERVALOS"]["SHORT_MONITOR"])
-            time.sleep(tiempo_intervalo)
+            reloj.dormir(tiempo_intervalo)
             continue
 
-        ahora = obtener_hora_actual_et()
-        alertas_enviadas = []
+        tickers_ciclo = planificador.pendientes()
+        if not tickers_ciclo:
+            reloj.dormir(planificador.espera())
+            continue
+
+        inicio_ciclo = reloj.monotonico()
+        perfilador.iniciar_ciclo("MovimientoBrusco")
+        try:
+            ahora = obtener_hora_actual_et()
+            precios_ciclo = {} # Snapshot de precios publicado al final del ciclo
+            alertas_ciclo = {}
+            contexto = {} # ticker -> datos para el mensaje de alerta
+            exposiciones = pesos_exposicion(portafolio_cortos.snapshot())
         
-        for ticker, datos in posiciones.items():
-            try:
-                ticker_obj = yf.Ticker(ticker)
-                
-                # --- 1. Obtener precio actual ---
-                hist_actual = ticker_obj.history(period="1d", interval="5m")
+            for posicion_ciclo, ticker in enumerate(tickers_ciclo):
+                posicion = posiciones[ticker]
+                try:
+                    # --- 1. Obtener precio actual ---
+                    hist_actual = obtener_historial(ticker, prioridad=PRIORIDAD_POSICIONES, period="1d", interval="5m")
                 
-                if hist_actual.empty:
-                    raise ValueError("No se pudieron obtener datos históricos recientes (5m)")
+                    if hist_actual.empty:
+                        raise ValueError("No se pudieron obtener datos históricos recientes (5m)")
                 
-                precio_actual = hist_actual['Close'].iloc[-1]
+                    precio_actual = hist_actual['Close'].iloc[-1]
                 
-                if precio_actual is None or precio_actual <= 0:
-                    raise ValueError("Precio actual no disponible o inválido")
+                    if precio_actual is None or precio_actual <= 0:
+                        raise ValueError("Precio actual no disponible o inválido")
 
-                # --- 2. Obtener el precio ANTERIOR ---
-                precio_anterior = precios_anteriores.get(ticker)
+                    # --- 2. Obtener el precio ANTERIOR ---
+                    precio_anterior = precios_anteriores.get(ticker)
                 
-                # --- 3. Calcular el CAMBIO PORCENTUAL entre intervalos ---
-                cambio_porcentual = 0.0
-                if precio_anterior is not None and precio_anterior > 0:
-                    cambio_porcentual = calcular_cambio_porcentual(precio_actual, precio_anterior)
-                    cambio_porcentual = round(cambio_porcentual, 2)
-                else:
-                    if precio_anterior is None:
-                        hist_diario = ticker_obj.history(period="1d", interval="1d")
-                        if not hist_diario.empty:
-                            precio_apertura_hoy = hist_diario['Open'].iloc[-1]
-                            if precio_apertura_hoy is not None and precio_apertura_hoy > 0:
-                                cambio_porcentual = calcular_cambio_porcentual(precio_actual, precio_apertura_hoy)
-                                cambio_porcentual = round(cambio_porcentual, 2)
-                                print(f"  ℹ️  {ticker}: Usando precio de apertura (${precio_apertura_hoy:.2f}) para primera comparación.")
+                    # --- 3. Calcular el CAMBIO PORCENTUAL entre intervalos ---
+                    cambio_porcentual = 0.0
+                    if precio_anterior is not None and precio_anterior > 0:
+                        cambio_porcentual = calcular_cambio_porcentual(precio_actual, precio_anterior)
+                        cambio_porcentual = round(cambio_porcentual, 2)
+                    else:
+                        if precio_anterior is None:
+                            # Solicitud extra solo en la primera consulta: se cobra aparte del costo por ticker
+                            planificador.presupuesto.consumir(1)
+                            hist_diario = obtener_historial(ticker, prioridad=PRIORIDAD_POSICIONES, period="1d", interval="1d")
+                            if not hist_diario.empty:
+                                precio_apertura_hoy = hist_diario['Open'].iloc[-1]
+                                if precio_apertura_hoy is not None and precio_apertura_hoy > 0:
+                                    cambio_porcentual = calcular_cambio_porcentual(precio_actual, precio_apertura_hoy)
+                                    cambio_porcentual = round(cambio_porcentual, 2)
+                                    log.debug("Usando precio de apertura para primera comparación", ticker=ticker, apertura=precio_apertura_hoy)
+                                else:
+                                    log.warning("Precio de apertura no disponible para primera comparación", ticker=ticker)
                             else:
-                                print(f"  ⚠️  {ticker}: Precio de apertura no disponible para primera comparación.")
-                        else:
-                            print(f"  ⚠️  {ticker}: Datos diarios no disponibles para primera comparación.")
-
-                # --- 4. Actualizar el precio anterior para la próxima iteración ---
-                precios_anteriores[ticker] = precio_actual
-
-                # --- 5. Formar mensaje informativo (opcional para consola) ---
-                mensaje_consola = (
-                    f"  {ticker}: ${precio_anterior if precio_anterior else 'N/A'} → ${precio_actual:.2f} | "
-                    f"Cambio: {cambio_porcentual:+.2f}% | "
-                    f"Umbral: {datos.get('umbral_porcentaje', 2.0):.1f}%"
-                )
-                print(f"  {mensaje_consola}")
+                                log.warning("Datos diarios no disponibles para primera comparación", ticker=ticker)
 
-                # --- 6. Calcular P&L y Movimiento Total del Día para la Alerta ---
-                pnl = (datos["precio_apertura"] - precio_actual) * datos["acciones"]
-                pnl = round(pnl, 2)
-                pnl_pct = calcular_cambio_porcentual(datos["precio_apertura"], precio_actual)
-                pnl_pct = round(pnl_pct, 2)
-                
-                # Obtener movimiento total del día para incluir en la alerta
-                cambio_total_dia = "N/A"
-                try:
-                    hist_diario_alerta = ticker_obj.history(period="1d", interval="1d")
-                    if not hist_diario_alerta.empty:
-                        precio_apertura_hoy_alerta = hist_diario_alerta['Open'].iloc[-1]
-                        if precio_apertura_hoy_alerta is not None and precio_apertura_hoy_alerta > 0:
-                            cambio_total_dia = calcular_cambio_porcentual(precio_actual, precio_apertura_hoy_alerta)
-                            cambio_total_dia = round(cambio_total_dia, 2)
-                except Exception:
-                    pass # cambio_total_dia ya es "N/A"
-
-                # --- 7. Verificar umbral para ALERTA ---
-                umbral_movimiento = datos.get('umbral_porcentaje', 2.0) 
-                
-                if abs(cambio_porcentual) >= umbral_movimiento and ticker not in alertas_enviadas:
-                    
+                    # --- 4. Renovar el precio anterior una vez por intervalo ---
+                    # Las consultas adicionales del planificador comparan contra la misma referencia,
+                    # así un ticker cerca del umbral se detecta antes sin diluir el cambio.
+                    if precio_anterior is None or reloj.epoch() - momentos_referencia.get(ticker, 0) >= tiempo_intervalo:
+                        precios_anteriores[ticker] = precio_actual
+                        momentos_referencia[ticker] = reloj.epoch()
+
+                    # --- 5. Detalle por ticker (solo en nivel DEBUG) ---
+                    log.debug(
+                        "Movimiento",
+                        ticker=ticker,
+                        anterior=precio_anterior,
+                        actual=precio_actual,
+                        cambio=cambio_porcentual,
+                        umbral=posicion.umbral,
+                    )
+                    precios_ciclo[ticker] = {
+                        "precio": float(precio_actual),
+                        "anterior": float(precio_anterior) if precio_anterior is not None else None,
+                        "cambio_intervalo": float(cambio_porcentual),
+                        "momento": ahora.isoformat(),
+                        "modulo": "MovimientoBrusco",
+                    }
+                    ultimos_cambios[ticker] = (float(cambio_porcentual), reloj.epoch())
+
+                    # --- 6. Obtener Movimiento Total del Día para la Alerta ---
+                    cambio_total_dia = "N/A"
+                    precio_apertura_hoy_alerta = None
+                    # La primera barra de 5m abre con la sesión: no hace falta otra consulta diaria
+                    apertura_5m = hist_actual['Open'].iloc[0]
+                    if apertura_5m is not None and apertura_5m > 0:
+                        precio_apertura_hoy_alerta = apertura_5m
+                        cambio_total_dia = round(calcular_cambio_porcentual(precio_actual, precio_apertura_hoy_alerta), 2)
+
+                    precios_ciclo[ticker]["apertura"] = float(precio_apertura_hoy_alerta) if precio_apertura_hoy_alerta else None
+                    precios_ciclo[ticker]["cambio_dia"] = None if cambio_total_dia == "N/A" else float(cambio_total_dia)
+
+                    # Registrar precio en el portafolio compartido (el P&L se revalúa al final del ciclo)
+                    portafolio_cortos.actualizar(ticker, precio_actual, precio_apertura_hoy_alerta)
+
+                    # --- 7. Registrar los campos del ticker para las reglas ---
+                    planificador.registrar(ticker, precio_actual, cambio_porcentual, posicion.umbral, exposiciones.get(ticker, 0.0))
+                    tabla.actualizar(
+                        ticker,
+                        precio=precio_actual,
+                        cambio=cambio_porcentual,
+                        cambio_dia=None if cambio_total_dia == "N/A" else cambio_total_dia,
+                    )
                     # --- CORRECCIÓN: Formatear precio_anterior correctamente ---
                     precio_anterior_fmt = f"{precio_anterior:.2f}" if precio_anterior is not None else 'N/A'
+                    contexto[ticker] = (precio_anterior_fmt, precio_actual, cambio_porcentual, cambio_total_dia)
                     
-                    mensaje_alerta = (
-                        f"⌚ Ultimo monitoreo: {ahora.strftime('%m-%d %H:%M')}\n"
-                        f"📢 ALERTA en *{ticker}*:\n"
-                        f"📊 Precio: ${precio_anterior_fmt} → ${precio_actual:.2f}\n"
-                        f"📈 Cambio Brusco: {cambio_porcentual:+.2f}%\n"
-                        f"⚖️ Umbral: {umbral_movimiento:.1f}%\n"
-                        f"💵 P&L: ${pnl:.2f} ({pnl_pct:+.2f}%)\n"
-                        f"📊 Movimiento Total Hoy: {cambio_total_dia if cambio_total_dia != 'N/A' else 'N/A'}%"
-                    )
-                    enviar_telegram(mensaje_alerta)
-                    print(f"  🔔 Alerta de movimiento brusco enviada para {ticker}: {cambio_porcentual:+.2f}% (Total Hoy: {cambio_total_dia if cambio_total_dia != 'N/A' else 'N/A'}%)")
-                    alertas_enviadas.append(ticker)
-                    
-            # --- CORRECCIÓN: Manejo de excepciones más general ---
-            except Exception as e: # En lugar de yf.YFinanceError
-                print(f"⚠️ Error general procesando {ticker} (Movimiento Brusco): {str(e)}")
-                continue
+                except CircuitoAbiertoError:
+                    # Yahoo está limitando: no insistir con el resto de los tickers
+                    log.warning("Yahoo no disponible (circuito abierto). Pausando Movimiento Brusco")
+                    planificador.devolver(tickers_ciclo[posicion_ciclo + 1:]) # No se consultaron
+                    reloj.dormir(limitador_yahoo.segundos_para_reintento())
+                    break
+                # --- CORRECCIÓN: Manejo de excepciones más general ---
+                except Exception as e: # En lugar de yf.YFinanceError
+                    log.warning("Error general procesando ticker", ticker=ticker, error=str(e))
+                    planificador.reprogramar(ticker)
+                    continue
+
+            # --- 8. Revaluar el libro una sola vez y evaluar las reglas sobre todas las posiciones ---
+            snapshot = portafolio_cortos.revaluar(ahora)
+            tabla.asignar("pnl", snapshot.tickers, snapshot.pnl)
+            tabla.asignar("pnl_pct", snapshot.tickers, snapshot.pnl_pct)
+            disparos = motor.evaluar(tabla, reloj.epoch())
+            for disparo in disparos:
+                if "cambio" in disparo.regla.campos:
+                    # Tras la alerta, el siguiente cambio se mide desde el precio actual
+                    precios_anteriores[disparo.ticker] = contexto[disparo.ticker][1]
+                    momentos_referencia[disparo.ticker] = reloj.epoch()
+
+            # --- 9. Etapa transversal: si todas las posiciones se mueven juntas, una sola alerta ---
+            # Solo afecta a las reglas sobre el cambio del intervalo
+            if any("cambio" in disparo.regla.campos for disparo in disparos):
+                analisis = analizar_recientes(ultimos_cambios, tiempo_intervalo)
+                if analisis is not None and analisis.movimiento_mercado:
+                    if reloj.epoch() - ultima_alerta_mercado >= tiempo_intervalo:
+                        notificar("mercado", mensaje_mercado(analisis, "las posiciones cortas"))
+                        ultima_alerta_mercado = reloj.epoch()
+                        log.info("Alerta de movimiento de mercado enviada", mediana=analisis.mediana, amplitud=analisis.amplitud)
+                    suprimidos = {d.ticker for d in disparos if "cambio" in d.regla.campos and not analisis.es_atipico(d.ticker)}
+                    if suprimidos:
+                        log.info("Alertas suprimidas por movimiento de mercado", tickers=",".join(sorted(suprimidos)))
+                    disparos = [d for d in disparos if not ("cambio" in d.regla.campos and d.ticker in suprimidos)]
+
+            # --- 10. Un mensaje por ticker con las reglas que disparó y su P&L ---
+            for (ticker, tipo_alerta), reglas_ticker in agrupar_disparos(disparos, "movimiento").items():
+                precio_anterior_fmt, precio_actual, cambio_porcentual, cambio_total_dia = contexto[ticker]
+                posicion = snapshot.posicion(ticker)
+                mensaje_alerta = (
+                    f"⌚ Ultimo monitoreo: {ahora.strftime('%m-%d %H:%M')}\n"
+                    f"📢 ALERTA en *{ticker}*: {', '.join(regla.descripcion for regla in reglas_ticker)}\n"
+                    f"📊 Precio: ${precio_anterior_fmt} → ${precio_actual:.2f}\n"
+                    f"📈 Cambio Brusco: {cambio_porcentual:+.2f}%\n"
+                    f"⚖️ Umbral: {posiciones[ticker].umbral:.1f}%\n"
+                    f"💵 P&L: ${posicion['pnl']:.2f} ({posicion['pnl_pct']:+.2f}%)\n"
+                    f"📊 Movimiento Total Hoy: {cambio_total_dia if cambio_total_dia != 'N/A' else 'N/A'}%"
+                )
+                notificar(tipo_alerta, mensaje_alerta)
+                log.info(
+                    "Alerta de movimiento brusco enviada",
+                    ticker=ticker, reglas=",".join(regla.nombre for regla in reglas_ticker),
+                    cambio=cambio_porcentual, total_hoy=cambio_total_dia,
+                )
+                alertas_ciclo[ticker] = {"momento": ahora.isoformat(), "cambio": float(cambio_porcentual), "modulo": "MovimientoBrusco"}
+
+            # --- 11. Publicar snapshots para el servidor de estado y la pizarra compartida ---
+            estado.fusionar("precios", precios_ciclo)
+            pizarra_precios.actualizar({
+                ticker: {"precio": datos["precio"], "apertura": datos.get("apertura"), "cambio": datos["cambio_intervalo"], "cambio_dia": datos.get("cambio_dia")}
+                for ticker, datos in precios_ciclo.items()
+            })
+            if alertas_ciclo:
+                estado.fusionar("alertas", alertas_ciclo)
+            metricas.registrar_ciclo("MovimientoBrusco", reloj.monotonico() - inicio_ciclo, tiempo_intervalo)
+            estado.registrar_latido("MovimientoBrusco", tickers=len(tickers_ciclo))
+        finally:
+            perfilador.terminar_ciclo("MovimientoBrusco")
 
-        tiempo_intervalo = CONFIG["INTERVALOS"].get("MOVIMIENTO_BRUSCO", CONFIG["INTERVALOS"]["SHORT_MONITOR"])
-        time.sleep(tiempo_intervalo)
+        reloj.dormir(planificador.espera())
 
@@ -1,13 +1,18 @@
 # modules/reporte_diario.py
-import datetime
-import yfinance as yf
 import csv
 import os
 from config import CONFIG
-from utils.notificaciones import enviar_telegram, mercado_abierto
+from utils import ajustes, reloj
+from utils.datos_mercado import obtener_historial
+from utils.limitador import CircuitoAbiertoError
+from utils.notificaciones import notificar, mercado_abierto
+from utils.portafolio import portafolio_cortos
+from utils.registro import obtener_registro
+
+log = obtener_registro("ReporteDiario")
 
 def obtener_hora_actual_et():
-    return datetime.datetime.now(CONFIG["MERCADO"]["ZONA_HORARIA"])
+    return reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"])
 
 def calcular_cambio_porcentual(precio_actual, precio_base):
     """Calcula el cambio porcentual entre dos precios."""
@@ -20,108 +25,112 @@ def generar_reporte_diario():
     Genera un reporte diario de las posiciones cortas al cierre del mercado.
     Calcula P&L total del día y acumulado, guarda en CSV y envía por Telegram.
     """
-    print("📊 Iniciando generación de Reporte Diario...")
+    log.info("Iniciando generación de Reporte Diario")
     
     # Verificar si el mercado está cerrado para generar el reporte
     # (aunque este módulo se llame al cierre, es bueno verificar)
     if mercado_abierto():
-        print("ℹ️  Mercado aún abierto. El reporte diario se genera al cierre.")
+        log.info("Mercado aún abierto. El reporte diario se genera al cierre")
         return
 
     ahora = obtener_hora_actual_et()
     fecha_str = ahora.strftime('%Y-%m-%d')
-    print(f"📅 Generando reporte para {fecha_str}")
+    log.info("Generando reporte", fecha=fecha_str)
     
-    posiciones = CONFIG["POSICIONES_CORTO"]
+    posiciones = ajustes.actual().posiciones
     datos_reporte = []
-    pnl_total_dia = 0.0
-    pnl_total_acumulado = 0.0
+    tickers_reporte = []
     
-    for ticker, datos in posiciones.items():
+    for ticker in posiciones:
         try:
-            ticker_obj = yf.Ticker(ticker)
-            
             # --- 1. Obtener precio de cierre del día ---
             # Usar history con periodo 1d e intervalo 1d para obtener el resumen del día
-            hist_diario = ticker_obj.history(period="1d", interval="1d")
+            hist_diario = obtener_historial(ticker, period="1d", interval="1d")
             
             if hist_diario.empty:
-                print(f"⚠️ No se pudieron obtener datos diarios para {ticker}")
+                log.warning("No se pudieron obtener datos diarios", ticker=ticker)
                 # Usar precio actual como fallback si no hay datos diarios (aunque el mercado está cerrado)
-                hist_actual = ticker_obj.history(period="1d", interval="1m")
+                hist_actual = obtener_historial(ticker, period="1d", interval="1m")
                 if not hist_actual.empty:
                     precio_cierre = hist_actual['Close'].iloc[-1]
-                    print(f"  ℹ️  Usando último precio disponible para {ticker}: ${precio_cierre:.2f}")
+                    log.info("Usando último precio disponible", ticker=ticker, precio=precio_cierre)
                 else:
-                    print(f"  ⚠️  No se pudo obtener ningún precio para {ticker}. Saltando.")
+                    log.warning("No se pudo obtener ningún precio. Saltando", ticker=ticker)
                     continue
             else:
                 # Obtener el precio de cierre del día
                 precio_cierre = hist_diario['Close'].iloc[-1]
             
             if precio_cierre is None or precio_cierre <= 0:
-                print(f"  ⚠️  Precio de cierre inválido para {ticker}. Saltando.")
+                log.warning("Precio de cierre inválido. Saltando", ticker=ticker)
                 continue
 
-            # --- 2. Calcular P&L del día ---
-            # Asumimos que el precio de apertura para el P&L del día es el precio de venta en corto
-            # Si tienes un precio de apertura real diferente, se podría ajustar aquí.
-            # Para un P&L "del día", necesitaríamos el precio de apertura del día.
-            # Pero como ya lo tienes configurado como precio de venta, calculamos P&L vs ese precio.
-            
-            # P&L Acumulado (desde la venta en corto)
-            pnl_acumulado = (datos["precio_apertura"] - precio_cierre) * datos["acciones"]
-            pnl_acumulado = round(pnl_acumulado, 2)
-            pnl_pct_acumulado = calcular_cambio_porcentual(datos["precio_apertura"], precio_cierre)
-            pnl_pct_acumulado = round(pnl_pct_acumulado, 2)
-            
-            # Para P&L del día, necesitamos el precio de apertura de HOY.
+            # --- 2. Obtener precio de apertura de HOY para el P&L del día ---
+            precio_apertura_hoy = None
             try:
                 precio_apertura_hoy = hist_diario['Open'].iloc[-1]
-                if precio_apertura_hoy is not None and precio_apertura_hoy > 0:
-                    pnl_dia = (precio_apertura_hoy - precio_cierre) * datos["acciones"]
-                    pnl_dia = round(pnl_dia, 2)
-                    pnl_pct_dia = calcular_cambio_porcentual(precio_apertura_hoy, precio_cierre)
-                    pnl_pct_dia = round(pnl_pct_dia, 2)
-                else:
-                    # Si no hay precio de apertura válido, P&L del día es 0
-                    pnl_dia = 0.0
-                    pnl_pct_dia = 0.0
-                    print(f"  ⚠️  Precio de apertura no disponible para {ticker}. P&L del día = $0.00.")
+                if precio_apertura_hoy is None or precio_apertura_hoy <= 0:
+                    precio_apertura_hoy = None
+                    log.warning("Precio de apertura no disponible. P&L del día = 0", ticker=ticker)
             except Exception as e:
-                pnl_dia = 0.0
-                pnl_pct_dia = 0.0
-                print(f"  ⚠️  Error obteniendo precio de apertura para {ticker}: {e}. P&L del día = $0.00.")
-
-            # --- 3. Agregar datos al reporte ---
-            datos_reporte.append({
-                "Fecha": fecha_str,
-                "Ticker": ticker,
-                "Precio Apertura Venta": datos["precio_apertura"], # Precio venta en corto
-                "Precio Apertura Hoy": precio_apertura_hoy if 'precio_apertura_hoy' in locals() and precio_apertura_hoy else 'N/A',
-                "Precio Cierre": precio_cierre,
-                "P&L Día ($)": pnl_dia,
-                "P&L Día (%)": pnl_pct_dia,
-                "P&L Acumulado ($)": pnl_acumulado,
-                "P&L Acumulado (%)": pnl_pct_acumulado,
-                "Acciones": datos["acciones"]
-            })
-            
-            # Sumar al total
-            pnl_total_dia += pnl_dia
-            pnl_total_acumulado += pnl_acumulado
-            
-            print(f"  {ticker}: Cierre ${precio_cierre:.2f} | P&L Día: ${pnl_dia:.2f} ({pnl_pct_dia:+.2f}%) | P&L Acum: ${pnl_acumulado:.2f} ({pnl_pct_acumulado:+.2f}%)")
+                log.warning("Error obteniendo precio de apertura. P&L del día = 0", ticker=ticker, error=str(e))
+
+            # --- 3. Registrar cierre y apertura en el portafolio compartido ---
+            # El P&L acumulado (desde la venta en corto) y el del día se calculan
+            # para todo el libro a la vez en la revaluación posterior.
+            portafolio_cortos.actualizar(ticker, precio_cierre, precio_apertura_hoy)
+            tickers_reporte.append((ticker, precio_apertura_hoy is not None))
             
+        except CircuitoAbiertoError:
+            log.warning("Yahoo no disponible (circuito abierto). Reporte con datos parciales")
+            break
         except Exception as e:
-            print(f"⚠️ Error procesando {ticker} para reporte diario: {str(e)}")
+            log.warning("Error procesando ticker para reporte diario", ticker=ticker, error=str(e))
             continue
 
-    if not datos_reporte:
-        print("⚠️ No se generó reporte: No hay datos para posiciones.")
+    if not tickers_reporte:
+        log.warning("No se generó reporte: No hay datos para posiciones")
         return
 
-    # --- 4. Guardar reporte en CSV ---
+    # --- 4. Revaluar el libro y armar el reporte desde el snapshot ---
+    snapshot = portafolio_cortos.revaluar(ahora)
+    for ticker, apertura_valida in tickers_reporte:
+        posicion = snapshot.posicion(ticker)
+        # Sin apertura válida de hoy, el P&L del día es 0 (mismo criterio que antes)
+        pnl_dia = round(posicion["pnl_dia"], 2) if apertura_valida else 0.0
+        pnl_pct_dia = round(posicion["pnl_dia_pct"], 2) if apertura_valida else 0.0
+        pnl_acumulado = round(posicion["pnl"], 2)
+        pnl_pct_acumulado = round(posicion["pnl_pct"], 2)
+        precio_cierre = posicion["precio_actual"]
+
+        datos_reporte.append({
+            "Fecha": fecha_str,
+            "Ticker": ticker,
+            "Precio Apertura Venta": posicion["precio_apertura"], # Precio venta en corto
+            "Precio Apertura Hoy": posicion["apertura_dia"] if apertura_valida else 'N/A',
+            "Precio Cierre": precio_cierre,
+            "P&L Día ($)": pnl_dia,
+            "P&L Día (%)": pnl_pct_dia,
+            "P&L Acumulado ($)": pnl_acumulado,
+            "P&L Acumulado (%)": pnl_pct_acumulado,
+            "Acciones": posicion["acciones"]
+        })
+
+        log.info(
+            "Posición al cierre",
+            ticker=ticker,
+            cierre=precio_cierre,
+            pnl_dia=pnl_dia,
+            pnl_dia_pct=pnl_pct_dia,
+            pnl_acumulado=pnl_acumulado,
+            pnl_acumulado_pct=pnl_pct_acumulado,
+        )
+
+    # Totales de las posiciones reportadas
+    pnl_total_dia = sum(item["P&L Día ($)"] for item in datos_reporte)
+    pnl_total_acumulado = sum(item["P&L Acumulado ($)"] for item in datos_reporte)
+
+    # --- 5. Guardar reporte en CSV ---
     nombre_csv = f"reporte_posiciones_cortas_{fecha_str}.csv"
     try:
         # Verificar si el archivo ya existe para no sobrescribir encabezados
@@ -132,12 +141,12 @@ def generar_reporte_diario():
             if not archivo_existe or os.path.getsize(nombre_csv) == 0:
                 writer.writeheader()
             writer.writerows(datos_reporte)
-        print(f"💾 Reporte diario guardado en {nombre_csv}")
+        log.info("Reporte diario guardado", archivo=nombre_csv)
     except Exception as e:
-        print(f"⚠️ Error guardando CSV {nombre_csv}: {str(e)}")
+        log.error("Error guardando CSV", archivo=nombre_csv, error=str(e))
         # Si falla guardar el CSV, continuamos con el envío de Telegram
 
-    # --- 5. Enviar reporte por Telegram ---
+    # --- 6. Enviar reporte por Telegram ---
     try:
         mensaje_telegram = (
             f"📊 *Reporte Diario de Posiciones Cortas* - {fecha_str}\n"
@@ -163,10 +172,10 @@ def generar_reporte_diario():
         else:
             mensaje_telegram += "📉 Día difícil para las cortas.\n"
 
-        enviar_telegram(mensaje_telegram)
-        print("✅ Reporte diario enviado por Telegram.")
+        notificar("reporte", mensaje_telegram)
+        log.info("Reporte diario enviado a los canales de notificación")
         
     except Exception as e:
-        print(f"⚠️ Error enviando reporte por Telegram: {str(e)}")
+        log.error("Error enviando reporte por Telegram", error=str(e))
 
-    print("✅ Generación de Reporte Diario finalizada.")
+    log.info("Generación de Reporte Diario finalizada")
@@ -0,0 +1,107 @@
+# modules/servidor_estado.py
+import json
+import math
+import datetime
+import threading
+import dataclasses
+from types import MappingProxyType
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from config import CONFIG
+from utils import reloj
+from utils import estado
+from utils.registro import obtener_registro
+
+log = obtener_registro("ServidorEstado")
+
+
+def _a_json(valor):
+    """Convierte snapshots (dataclasses, arreglos numpy, mappings inmutables) a tipos JSON."""
+    if dataclasses.is_dataclass(valor):
+        return {campo.name: _a_json(getattr(valor, campo.name)) for campo in dataclasses.fields(valor)}
+    if isinstance(valor, (dict, MappingProxyType)):
+        return {str(k): _a_json(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_a_json(v) for v in valor]
+    if isinstance(valor, np.ndarray):
+        return [_a_json(v) for v in valor.tolist()]
+    if isinstance(valor, np.generic):
+        return _a_json(valor.item())
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    return valor
+
+
+def _estado_hilos():
+    """Hilos vivos del proceso y su último latido publicado."""
+    latidos = estado.leer("latidos", {})
+    ahora = reloj.epoch()
+    hilos = {}
+    for hilo in threading.enumerate():
+        latido = latidos.get(hilo.name)
+        hilos[hilo.name] = {
+            "activo": hilo.is_alive(),
+            "segundos_desde_latido": round(ahora - latido["momento"], 1) if latido else None,
+        }
+    return hilos
+
+
+def _portafolio():
+    snapshot = estado.leer("portafolio")
+    if snapshot is None:
+        return None
+    return {
+        "momento": snapshot.momento,
+        "pnl_total": snapshot.pnl_total,
+        "pnl_dia_total": snapshot.pnl_dia_total,
+        "exposicion_total": snapshot.exposicion_total,
+        "posiciones": [snapshot.posicion(ticker) for ticker in snapshot.tickers],
+    }
+
+
+# Rutas disponibles: cada una solo lee snapshots ya publicados
+RUTAS = {
+    "/precios": lambda: estado.leer("precios", {}),
+    "/portafolio": _portafolio,
+    "/alertas": lambda: estado.leer("alertas", {}),
+    "/hilos": _estado_hilos,
+    "/programacion": lambda: estado.leer("programacion", {}),
+    "/clasificacion": lambda: estado.leer("clasificacion"),
+    "/notificaciones": lambda: estado.leer("notificaciones", {}),
+    "/perfilador": lambda: {"actual": estado.leer("perfilador"), "ultimo": estado.leer("perfilador_ultimo")},
+}
+
+
+class ManejadorEstado(BaseHTTPRequestHandler):
+    def do_GET(self):
+        ruta = self.path.split("?", 1)[0].rstrip("/") or "/estado"
+        if ruta == "/estado":
+            cuerpo = {nombre.lstrip("/"): generador() for nombre, generador in RUTAS.items()}
+        elif ruta in RUTAS:
+            cuerpo = RUTAS[ruta]()
+        else:
+            self._responder(404, {"error": "ruta no encontrada", "rutas": ["/estado", *RUTAS]})
+            return
+        self._responder(200, cuerpo)
+
+    def _responder(self, codigo, cuerpo):
+        datos = json.dumps(_a_json(cuerpo), ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, formato, *args):
+        log.debug("Solicitud HTTP", cliente=self.client_address[0], linea=formato % args)
+
+
+def run_servidor_estado():
+    """Sirve el estado en vivo como JSON en un puerto local (solo lectura)."""
+    config = CONFIG["SERVIDOR_ESTADO"]
+    servidor = ThreadingHTTPServer((config["HOST"], config["PUERTO"]), ManejadorEstado)
+    servidor.daemon_threads = True
+    log.info("Servidor de estado escuchando", host=config["HOST"], puerto=config["PUERTO"])
+    servidor.serve_forever()
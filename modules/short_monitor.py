@@ -1,12 +1,20 @@
 # modules/short_monitor.py
-import time
-import datetime
 import yfinance as yf
 from config import CONFIG
+from utils import ajustes, reloj
+from utils.datos_mercado import obtener_historial
+from utils.limitador import CircuitoAbiertoError, PRIORIDAD_POSICIONES
 from utils.notificaciones import mercado_abierto # Ya no envía Telegram directamente para alertas
+from utils.portafolio import portafolio_cortos
+from utils.registro import obtener_registro, DEBUG
+from utils.metricas import metricas
+from utils.perfilador import perfilador
+from utils import estado
+
+log = obtener_registro("ShortMonitor")
 
 def obtener_hora_actual_et():
-    return datetime.datetime.now(CONFIG["MERCADO"]["ZONA_HORARIA"])
+    return reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"])
 
 def calcular_cambio_porcentual(precio_actual, precio_base):
     """Calcula el cambio porcentual entre dos precios."""
@@ -17,75 +25,86 @@ def calcular_cambio_porcentual(precio_actual, precio_base):
 def run_short_monitor():
     """
     Monitorea periódicamente el estado de las posiciones cortas.
-    Calcula P&L y muestra en consola. No envía alertas de movimiento brusco.
+    Calcula P&L y lo registra (detalle por posición en nivel DEBUG). No envía alertas de movimiento brusco.
     """
-    print("🚀 Iniciando módulo de ventas en corto (Reportes)...")
-    posiciones = CONFIG["POSICIONES_CORTO"]
-    print(f"🔍 Generando reportes para {len(posiciones)} posiciones:")
-    for ticker in posiciones:
-        print(f" - {ticker}")
+    config = ajustes.actual()
+    posiciones = config.posiciones
+    intervalo = config.intervalos.short_monitor
+    log.info("Iniciando módulo de ventas en corto (Reportes)", posiciones=len(posiciones), tickers=",".join(posiciones))
 
     while True:
         # Verificar si el mercado está abierto
         if not mercado_abierto():
-            time.sleep(CONFIG["INTERVALOS"]["SHORT_MONITOR"])
+            reloj.dormir(intervalo)
             continue
 
-        ahora = obtener_hora_actual_et()
-        print(f"\n📊 Reporte Shorts: {ahora.strftime('%Y-%m-%d %H:%M:%S')} ET")
+        inicio_ciclo = reloj.monotonico()
+        perfilador.iniciar_ciclo("ShortMonitor")
+        try:
+            ahora = obtener_hora_actual_et()
+            movimientos_hoy = {}
         
-        for ticker, datos in posiciones.items():
-            try:
-                ticker_obj = yf.Ticker(ticker)
-                
-                # --- Obtener precio actual ---
-                # Mejorado: Uso de history para obtener datos más confiables
-                hist = ticker_obj.history(period="1d", interval="5m") 
+            for ticker in posiciones:
+                try:
+                    # --- Obtener precio actual ---
+                    # Mejorado: Uso de history para obtener datos más confiables
+                    hist = obtener_historial(ticker, prioridad=PRIORIDAD_POSICIONES, period="1d", interval="5m") 
                 
-                if hist.empty:
-                    raise ValueError("No se pudieron obtener datos históricos")
+                    if hist.empty:
+                        raise ValueError("No se pudieron obtener datos históricos")
                 
-                precio_actual = hist['Close'].iloc[-1] 
+                    precio_actual = hist['Close'].iloc[-1] 
                 
-                if precio_actual is None or precio_actual <= 0:
-                    raise ValueError("Precio actual no disponible o inválido")
+                    if precio_actual is None or precio_actual <= 0:
+                        raise ValueError("Precio actual no disponible o inválido")
 
-                # --- Calcular P&L ---
-                pnl = (datos["precio_apertura"] - precio_actual) * datos["acciones"]
-                pnl = round(pnl, 2)
-                pnl_pct = calcular_cambio_porcentual(
-                    datos["precio_apertura"], # Base para P&L es tu precio de venta
-                    precio_actual
-                )
-                pnl_pct = round(pnl_pct, 2)
-                
-                # --- Obtener precio de apertura del día para movimiento total ---
-                hist_diario = ticker_obj.history(period="1d", interval="1d")
-                if hist_diario.empty:
-                    raise ValueError("No se pudieron obtener datos diarios")
-                precio_apertura_hoy = hist_diario['Open'].iloc[-1]
-                if precio_apertura_hoy is None or precio_apertura_hoy <= 0:
+                    # --- Precio de apertura del día para movimiento total ---
+                    # La primera barra de 5m abre con la sesión: no hace falta otra consulta diaria
                     precio_apertura_hoy = hist['Open'].iloc[0]
                     if precio_apertura_hoy is None or precio_apertura_hoy <= 0:
-                        raise ValueError("Precio de apertura del día no disponible")     
-                # --- Calcular cambio porcentual intradiario (movimiento total del día) ---
-                cambio_pct_intradiario = calcular_cambio_porcentual(precio_actual, precio_apertura_hoy)
-                cambio_pct_intradiario = round(cambio_pct_intradiario, 2)
+                        raise ValueError("Precio de apertura del día no disponible")
+                    # --- Calcular cambio porcentual intradiario (movimiento total del día) ---
+                    cambio_pct_intradiario = calcular_cambio_porcentual(precio_actual, precio_apertura_hoy)
+                    cambio_pct_intradiario = round(cambio_pct_intradiario, 2)
                 
-                mensaje = (
-                    f"⌚ Ultimo monitoreo: {ahora.strftime('%m-%d %H:%M')}\n"
-                    f"📢 ALERTA {"**"+ticker+"**"} {'🟢' if pnl >= 0 else '🔴'}\n"
-                    f"📊 Precio actual: ${precio_actual:.2f}\n"
-                    f"💵 P&L: ${pnl:.2f} ({pnl_pct:+.2f}%)\n"
-                    f"📈 Movimiento Hoy: {cambio_pct_intradiario:+.2f}%\n"
-                    f"⚖️ Umbral: {datos['umbral_porcentaje']:.1f}%"
-                )
-                print(f"  {mensaje}")
+                    # --- Registrar precio en el portafolio compartido ---
+                    portafolio_cortos.actualizar(ticker, precio_actual, precio_apertura_hoy)
+                    movimientos_hoy[ticker] = cambio_pct_intradiario
                 
-            except yf.YFinanceError as e:
-                print(f"⚠️ Error de YFinance al procesar {ticker}: {str(e)}")
-            except Exception as e:
-                print(f"⚠️ Error general procesando {ticker}: {str(e)}")
-                continue
+                except CircuitoAbiertoError:
+                    log.warning("Yahoo no disponible (circuito abierto). Se omite el resto del reporte")
+                    break
+                except yf.YFinanceError as e:
+                    log.warning("Error de YFinance", ticker=ticker, error=str(e))
+                except Exception as e:
+                    log.warning("Error general procesando ticker", ticker=ticker, error=str(e))
+                    continue
+
+            # --- Revaluar todo el libro en una sola pasada y mostrar el reporte ---
+            snapshot = portafolio_cortos.revaluar(ahora)
+            # El detalle por posición solo se arma si el nivel DEBUG está habilitado
+            if log.habilitado(DEBUG):
+                for ticker, cambio_pct_intradiario in movimientos_hoy.items():
+                    posicion = snapshot.posicion(ticker)
+                    log.debug(
+                        "Posición",
+                        ticker=ticker,
+                        precio=posicion["precio_actual"],
+                        pnl=posicion["pnl"],
+                        pnl_pct=posicion["pnl_pct"],
+                        movimiento_hoy=cambio_pct_intradiario,
+                        umbral=posiciones[ticker].umbral,
+                    )
+            log.info(
+                "Reporte Shorts",
+                posiciones=len(movimientos_hoy),
+                pnl_total=snapshot.pnl_total,
+                pnl_dia=snapshot.pnl_dia_total,
+                exposicion=snapshot.exposicion_total,
+            )
+            metricas.registrar_ciclo("ShortMonitor", reloj.monotonico() - inicio_ciclo, intervalo)
+            estado.registrar_latido("ShortMonitor", posiciones=len(movimientos_hoy))
+        finally:
+            perfilador.terminar_ciclo("ShortMonitor")
 
-        time.sleep(CONFIG["INTERVALOS"]["SHORT_MONITOR"])
+        reloj.dormir(intervalo)
@@ -1,83 +1,52 @@
 # modules/top_gainers.py
-import yfinance as yf
-import datetime
-import time
 import csv
 from config import CONFIG
-from utils.notificaciones import enviar_telegram, mercado_abierto # Importar mercado_abierto
+from utils import reloj
+from utils.clasificacion import clasificacion_intradia
+from utils.notificaciones import notificar, mercado_abierto # Importar mercado_abierto
+from utils.registro import obtener_registro
+from utils.metricas import metricas
+from utils.perfilador import perfilador
+from utils import estado
+
+log = obtener_registro("TopGainers")
 
 def obtener_hora_actual_et():
-    return datetime.datetime.now(CONFIG["MERCADO"]["ZONA_HORARIA"])
+    return reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"])
 
 def run_top_gainers():
+    """
+    Publica los ganadores y perdedores desde la apertura.
+    Lee la clasificación intradía que se mantiene con cada barra (utils.clasificacion):
+    no vuelve a descargar los datos desde las 9:30.
+    """
     # Verificar si el mercado está abierto antes de ejecutar
     if not mercado_abierto():
-        print("ℹ️  Módulo Top Gainers no ejecutado: Mercado cerrado.")
+        log.info("Módulo Top Gainers no ejecutado: Mercado cerrado")
         return # Salir de la función si el mercado está cerrado
 
     ahora = obtener_hora_actual_et()
     hoy = ahora.date()
-    tz = CONFIG["MERCADO"]["ZONA_HORARIA"]
-    # Crear el datetime de apertura con la zona horaria correcta
-    apertura = tz.localize(datetime.datetime.combine(hoy, datetime.time(9, 30)))
-    
-    print(f"📈 Calculando top gainers desde apertura ({apertura.strftime('%H:%M')} ET)...")
-
-    datos_ganadores = []
-    
-    for ticker in CONFIG["TOP_GAINERS_WATCHLIST"]:
-        try:
-            # Corregido: Uso de Ticker.history() para mayor robustez
-            ticker_obj = yf.Ticker(ticker)
-            # Obtener datos desde la apertura hasta ahora (intervalo 5m)
-            data = ticker_obj.history(start=apertura, end=ahora, interval="5m", prepost=False) 
-            
-            if data.empty:
-                print(f"⚠️ No hay datos para {ticker} en el rango solicitado.")
-                continue
-            
-            # Asegurarse de que hay al menos dos puntos para calcular el cambio
-            if len(data) < 2:
-                print(f"⚠️ Datos insuficientes para {ticker}.")
-                continue
-
-            # Precio de apertura (primer valor disponible después de las 9:30)
-            precio_apertura = data.iloc[0]['Open'] 
-            # Precio actual (último cierre)
-            precio_actual = data.iloc[-1]['Close'] 
-            
-            if precio_apertura <= 0:
-                print(f"⚠️ Precio de apertura inválido para {ticker}.")
-                continue
-
-            cambio_pct = ((precio_actual - precio_apertura) / precio_apertura) * 100
-            datos_ganadores.append((
-                ticker,
-                round(cambio_pct, 2),
-                round(precio_apertura, 2),
-                round(precio_actual, 2)
-            ))
-        except yf.YFinanceError as e: # Manejo de errores específicos de yfinance
-            print(f"⚠️ Error de YFinance con {ticker}: {str(e)}")
-        except Exception as e:
-            print(f"⚠️ Error general con {ticker}: {str(e)}")
-            continue
-
-    # Ordenar y seleccionar top 3
-    datos_ganadores.sort(key=lambda x: x[1], reverse=True)
-    top_3 = datos_ganadores[:3]
+    snapshot = clasificacion_intradia.snapshot(CONFIG["CLASIFICACION"]["TAMANO_PUBLICACION"])
 
-    if not top_3:
-        print("⚠️ No se encontraron datos para top gainers")
+    if not snapshot.ganadores:
+        log.warning("No se encontraron datos para top gainers")
         return
 
     # Generar mensaje
-    mensaje = "🏆 Top Gainers desde apertura:\n"
-    for ticker, cambio, apertura, actual in top_3:
-        mensaje += f"• {ticker}: {cambio:+.2f}% | ${apertura:.2f} → ${actual:.2f}\n"
+    mensaje = f"🏆 Top Gainers desde apertura ({snapshot.total} tickers):\n"
+    for fila in snapshot.ganadores:
+        mensaje += f"• {fila.ticker}: {fila.cambio:+.2f}% | ${fila.apertura:.2f} → ${fila.precio:.2f}\n"
+    mensaje += "\n📉 Top Losers desde apertura:\n"
+    for fila in snapshot.perdedores:
+        mensaje += f"• {fila.ticker}: {fila.cambio:+.2f}% | ${fila.apertura:.2f} → ${fila.precio:.2f}\n"
 
-    print(mensaje)
-    enviar_telegram(mensaje)
+    log.info(
+        "Top Gainers desde apertura",
+        top=",".join(f"{f.ticker}:{f.cambio:+.2f}%" for f in snapshot.ganadores),
+        fondo=",".join(f"{f.ticker}:{f.cambio:+.2f}%" for f in snapshot.perdedores),
+    )
+    notificar("clasificacion", mensaje)
 
     # Guardar CSV
     nombre_csv = f"reporte_top_gainers_{hoy}.csv"
@@ -85,9 +54,63 @@ def run_top_gainers():
         with open(nombre_csv, 'a', newline='', encoding='utf-8') as f: # Agregado encoding
             writer = csv.writer(f)
             if f.tell() == 0:
-                writer.writerow(["Ticker", "Cambio %", "Apertura", "Actual", "Hora"])
-            for item in top_3:
-                writer.writerow([item[0], item[1], item[2], item[3], ahora.strftime("%H:%M:%S")])
-        print(f"💾 Reporte Top Gainers guardado en {nombre_csv}")
+                writer.writerow(["Ticker", "Cambio %", "Apertura", "Actual", "Hora", "Lista"])
+            for lista, filas in (("ganadores", snapshot.ganadores), ("perdedores", snapshot.perdedores)):
+                for fila in filas:
+                    writer.writerow([fila.ticker, fila.cambio, round(fila.apertura, 2), round(fila.precio, 2), ahora.strftime("%H:%M:%S"), lista])
+        log.info("Reporte Top Gainers guardado", archivo=nombre_csv)
     except Exception as e:
-        print(f"⚠️ Error guardando CSV {nombre_csv}: {str(e)}")
+        log.error("Error guardando CSV", archivo=nombre_csv, error=str(e))
+
+def _mensaje_eventos(eventos, tamano):
+    lineas = []
+    for evento in eventos:
+        icono = "🏅" if evento.lista == "ganadores" else "🔻"
+        lineas.append(
+            f"{icono} *{evento.ticker}* entra al top {tamano} de {evento.lista} "
+            f"(#{evento.rango}, {evento.cambio:+.2f}% desde apertura)"
+        )
+    return "📊 Cambios en la clasificación:\n" + "\n".join(lineas)
+
+def run_clasificacion():
+    """
+    Revisa los cambios de rango de la clasificación intradía (un ticker que entra al
+    top N de ganadores o perdedores) y los envía como alertas, con enfriamiento por ticker.
+    """
+    config = CONFIG["CLASIFICACION"]
+    intervalo = config["INTERVALO_EVENTOS"]
+    ultima_alerta = {} # (ticker, lista) -> epoch de la última alerta
+    log.info("Iniciando módulo de Clasificación intradía", tamano=config["TAMANO"], alertas=config["ALERTAR_CAMBIOS_RANGO"])
+
+    while True:
+        if not mercado_abierto():
+            clasificacion_intradia.extraer_eventos() # Descartar eventos fuera de horario
+            reloj.dormir(intervalo)
+            continue
+
+        inicio_ciclo = reloj.monotonico()
+        perfilador.iniciar_ciclo("Clasificacion")
+        try:
+            eventos = clasificacion_intradia.extraer_eventos()
+            log.debug("Eventos de clasificación", eventos=len(eventos))
+
+            # Solo las entradas (cada una ya implica la salida de otro ticker) y fuera del enfriamiento
+            ahora = reloj.epoch()
+            alertables = []
+            for evento in eventos:
+                clave = (evento.ticker, evento.lista)
+                if evento.tipo != "entra" or ahora - ultima_alerta.get(clave, 0.0) < config["ENFRIAMIENTO_ALERTA"]:
+                    continue
+                ultima_alerta[clave] = ahora
+                alertables.append(evento)
+
+            if alertables and config["ALERTAR_CAMBIOS_RANGO"]:
+                notificar("clasificacion", _mensaje_eventos(alertables, config["TAMANO"]))
+                log.info("Alerta de cambios de clasificación enviada", tickers=",".join(e.ticker for e in alertables))
+
+            metricas.registrar_ciclo("Clasificacion", reloj.monotonico() - inicio_ciclo, intervalo)
+            estado.registrar_latido("Clasificacion", eventos=len(eventos))
+        finally:
+            perfilador.terminar_ciclo("Clasificacion")
+
+        reloj.dormir(intervalo)
@@ -0,0 +1,478 @@
+# prueba_carga.py
+"""
+Prueba de carga de extremo a extremo.
+
+Levanta todos los hilos de app.main() contra un servidor local de datos sintéticos y
+receptores falsos para cada canal de notificación (Telegram, webhook, archivo y socket),
+con el reloj acelerado para simular una sesión completa.
+Al terminar reporta excesos de ciclo, retraso de entrega de alertas, crecimiento de
+memoria y cantidad de hilos, y sale con código 1 si se supera algún presupuesto.
+
+Uso:
+    python prueba_carga.py --tickers 5000 --volatilidad 0.03 --factor 60
+    python prueba_carga.py --tickers 300 --canales telegram,webhook,archivo,socket
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import socketserver
+import datetime
+import tempfile
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Sin credenciales reales: todos los mensajes van al endpoint falso
+os.environ.setdefault("BOT_TOKEN", "prueba-carga")
+os.environ.setdefault("CHAT_ID", "0")
+os.environ["TELEGRAM_ENABLED"] = "true"
+os.environ.setdefault("LOG_NIVEL", "WARNING")
+
+import numpy as np
+from config import CONFIG
+from utils import ajustes, estado, reloj
+from utils.metricas import metricas
+
+# Hilos que app.main() inicia siempre; hilos_monitores() agrega los que dependen de la configuración
+HILOS_MONITORES = ["ShortMonitor", "MovimientoBrusco", "DeteccionMovimiento", "AnomaliasVolumen", "Clasificacion", "ReporteDiario"]
+
+_PATRON_TICKER = re.compile(r"\*([A-Z0-9.\-]+)\*")
+
+
+class MercadoSintetico:
+    """
+    Caminos de precio y volumen por minuto para toda la sesión, con saltos inyectados
+    en algunos tickers. Los saltos son los movimientos que el sistema debería alertar.
+    """
+
+    def __init__(self, tickers, fecha, volatilidad, prob_salto, magnitud_salto, semilla=0):
+        mercado = CONFIG["MERCADO"]
+        tz = mercado["ZONA_HORARIA"]
+        self.tickers = tickers
+        self.indice = {ticker: i for i, ticker in enumerate(tickers)}
+        self.fecha = fecha
+        apertura = datetime.time(mercado["APERTURA_HORA"], mercado["APERTURA_MINUTO"])
+        self.apertura = tz.localize(datetime.datetime.combine(fecha, apertura)).timestamp()
+        self.medianoche = tz.localize(datetime.datetime.combine(fecha, datetime.time(0, 0))).timestamp()
+        self.minutos = (mercado["CIERRE_HORA"] * 60 + mercado["CIERRE_MINUTO"]) - (mercado["APERTURA_HORA"] * 60 + mercado["APERTURA_MINUTO"])
+
+        rng = np.random.default_rng(semilla)
+        n = len(tickers)
+        # Camino log-normal con volatilidad diaria `volatilidad` repartida entre los minutos
+        rendimientos = rng.normal(0.0, volatilidad / np.sqrt(self.minutos), (n, self.minutos))
+        volumen = rng.lognormal(np.log(20000), 0.5, (n, self.minutos + 1))
+
+        con_salto = np.flatnonzero(rng.random(n) < prob_salto)
+        minuto_salto = rng.integers(15, self.minutos - 30, len(con_salto))
+        signo = rng.choice([-1.0, 1.0], len(con_salto))
+        rendimientos[con_salto, minuto_salto] += signo * np.log1p(magnitud_salto / 100)
+        volumen[con_salto, minuto_salto + 1] *= 10
+
+        # Columna i = precio en el minuto i de la sesión
+        precio_base = rng.uniform(5, 300, n)
+        acumulado = np.concatenate([np.zeros((n, 1)), np.cumsum(rendimientos, axis=1)], axis=1)
+        self.precios = precio_base[:, None] * np.exp(acumulado)
+        self.volumen = volumen
+        # Momento (epoch simulado) en que cada salto se vuelve visible
+        self.saltos = {
+            tickers[i]: self.apertura + (int(m) + 1) * 60 for i, m in zip(con_salto, minuto_salto)
+        }
+
+    def historial(self, ticker, interval="1d", start=None, end=None, **_):
+        """Barras hasta el minuto simulado actual, con el formato de utils.datos_mercado."""
+        vacio = {"ts": [], "Open": [], "High": [], "Low": [], "Close": [], "Volume": []}
+        i = self.indice.get(ticker)
+        minuto = int((reloj.epoch() - self.apertura) // 60)
+        if i is None or minuto < 0:
+            return vacio
+        minuto = min(minuto, self.minutos)
+        precios = self.precios[i, :minuto + 1]
+        volumen = self.volumen[i, :minuto + 1]
+
+        if interval == "1d":
+            inicios = np.array([0])
+            marcas = np.array([self.medianoche])
+        else:
+            paso = {"1m": 1, "5m": 5, "15m": 15}.get(interval, 5)
+            inicios = np.arange(0, min(minuto, self.minutos - 1) + 1, paso)
+            marcas = self.apertura + inicios * 60
+
+        # Agregación de todas las barras en una pasada: cada barra va de inicios[k] a inicios[k+1]
+        finales = np.append(inicios[1:], len(precios)) - 1
+        barras = {
+            "ts": marcas,
+            "Open": precios[inicios],
+            "High": np.maximum.reduceat(precios, inicios),
+            "Low": np.minimum.reduceat(precios, inicios),
+            "Close": precios[finales],
+            "Volume": np.add.reduceat(volumen, inicios),
+        }
+        filtro = np.ones(len(inicios), dtype=bool)
+        if start:
+            filtro &= marcas >= datetime.datetime.fromisoformat(start).timestamp()
+        if end:
+            filtro &= marcas < datetime.datetime.fromisoformat(end).timestamp()
+        return {columna: valores[filtro].tolist() for columna, valores in barras.items()}
+
+
+class Simulador:
+    """Estado compartido por el servidor de datos y el Telegram falso."""
+
+    def __init__(self, mercado, latencia_telegram=0.0):
+        self.mercado = mercado
+        self.latencia_telegram = latencia_telegram
+        self._lock = threading.Lock()
+        self.solicitudes = 0
+        self.mensajes = {} # canal -> mensajes recibidos
+        self.retrasos = {} # ticker -> segundos simulados entre el salto y su primera alerta (en cualquier canal)
+
+    def registrar_mensaje(self, texto, canal="telegram"):
+        ahora = reloj.epoch()
+        tickers = _PATRON_TICKER.findall(texto or "") # Un digesto trae varios
+        with self._lock:
+            self.mensajes[canal] = self.mensajes.get(canal, 0) + 1
+            for ticker in tickers:
+                salto = self.mercado.saltos.get(ticker)
+                if salto is not None and salto <= ahora and ticker not in self.retrasos:
+                    self.retrasos[ticker] = ahora - salto
+
+
+def crear_manejador(simulador):
+    class ManejadorSimulador(BaseHTTPRequestHandler):
+        # Conexiones persistentes (siempre se envía Content-Length): los clientes con sesión las reutilizan
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True # Cabecera y cuerpo van en dos escrituras: sin esto, cada respuesta espera el ACK diferido
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/historial":
+                self._responder(404, {"error": "ruta no encontrada"})
+                return
+            parametros = {clave: valores[-1] for clave, valores in parse_qs(url.query).items()}
+            with simulador._lock:
+                simulador.solicitudes += 1
+            self._responder(200, simulador.mercado.historial(**parametros))
+
+        def do_POST(self):
+            cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/webhook":
+                simulador.registrar_mensaje(cuerpo.get("mensaje"), "webhook")
+                self._responder(200, {"ok": True})
+                return
+            if not self.path.endswith("/sendMessage"):
+                self._responder(404, {"ok": False})
+                return
+            if simulador.latencia_telegram:
+                threading.Event().wait(simulador.latencia_telegram)
+            simulador.registrar_mensaje(cuerpo.get("text"))
+            self._responder(200, {"ok": True, "result": {}})
+
+        def _responder(self, codigo, cuerpo):
+            datos = json.dumps(cuerpo).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return ManejadorSimulador
+
+
+def crear_receptor_socket(simulador):
+    """Servidor TCP que recibe las alertas del canal socket (una línea JSON por alerta)."""
+    class ManejadorSocket(socketserver.StreamRequestHandler):
+        def handle(self):
+            for linea in self.rfile:
+                simulador.registrar_mensaje(json.loads(linea).get("mensaje"), "socket")
+
+    servidor = socketserver.ThreadingTCPServer(("127.0.0.1", 0), ManejadorSocket)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def contar_lineas(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return sum(1 for _ in f)
+    except OSError:
+        return 0
+
+
+def memoria_mb():
+    """Memoria residente actual del proceso en MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # Pico (Linux: KB)
+
+
+def proximo_dia_habil(fecha):
+    while fecha.weekday() not in CONFIG["MERCADO"]["DIAS_HABILES"]:
+        fecha += datetime.timedelta(days=1)
+    return fecha
+
+
+def configurar_simulacion(args, tickers, mercado, url, directorio, puerto_socket):
+    """Apunta la configuración al simulador. Debe llamarse antes de importar app."""
+    CONFIG["FUENTE_DATOS"]["URL"] = url
+    CONFIG["TELEGRAM"]["API_URL"] = url
+    canales = {
+        "telegram": {"TIPO": "telegram"},
+        "webhook": {"TIPO": "webhook", "URL": f"{url}/webhook"},
+        "archivo": {"TIPO": "archivo", "RUTA": os.path.join(directorio, "alertas.jsonl")},
+        "socket": {"TIPO": "socket", "HOST": "127.0.0.1", "PUERTO": puerto_socket},
+    }
+    CONFIG["NOTIFICACIONES"]["CANALES"] = {nombre: canales[nombre] for nombre in args.canales}
+    CONFIG["NOTIFICACIONES"]["RUTAS"] = {"*": list(args.canales)}
+    CONFIG["DETECCION_MOVIMIENTO"]["TICKERS_WATCHLIST"] = tickers
+    CONFIG["DETECCION_MOVIMIENTO"]["UMBRALES_POR_TICKER"] = {}
+    CONFIG["POSICIONES_CORTO"] = {
+        ticker: {"precio_apertura": round(float(mercado.precios[i, 0]), 2), "acciones": 100, "umbral_porcentaje": 2.0}
+        for i, ticker in enumerate(tickers[:args.cortos])
+    }
+    CONFIG["ARCHIVO_BARRAS"]["DIRECTORIO"] = directorio
+    CONFIG["SERVIDOR_ESTADO"]["PUERTO"] = 0 # Puerto libre cualquiera
+    if args.solicitudes_por_segundo:
+        CONFIG["LIMITADOR"]["SOLICITUDES_POR_SEGUNDO"] = args.solicitudes_por_segundo
+    if args.presupuesto_minuto:
+        CONFIG["PLANIFICADOR"]["SOLICITUDES_POR_MINUTO"] = args.presupuesto_minuto
+    # Los módulos leen la configuración compilada: recompilar con los cambios
+    ajustes.establecer(ajustes.compilar(CONFIG))
+
+
+def hilos_monitores():
+    """Nombres de los hilos de app.main() que deben seguir vivos al final de la sesión."""
+    nombres = list(HILOS_MONITORES)
+    # Mismos nombres que arma app.main() para la publicación de top gainers
+    for hora in CONFIG["CLASIFICACION"]["HORAS_PUBLICACION"]:
+        nombres.append(f"TopGainers{datetime.time.fromisoformat(hora).strftime('%H%M')}")
+    if CONFIG["SERVIDOR_ESTADO"]["ENABLED"]:
+        nombres.append("ServidorEstado")
+    return nombres
+
+
+def generar_reporte(args, simulador, muestras, hilos_inicio, fin):
+    resumen = metricas.resumen()
+    ciclos = {}
+    for nombre, serie in resumen["series"].items():
+        if not nombre.startswith("ciclo."):
+            continue
+        modulo = nombre.split(".", 1)[1]
+        total = resumen["contadores"].get(f"ciclos.{modulo}", serie["n"])
+        excesos = resumen["contadores"].get(f"excesos.{modulo}", 0)
+        ciclos[modulo] = dict(serie, ciclos=total, excesos=excesos, fraccion_excesos=excesos / total if total else 0.0)
+
+    # Solo cuentan los saltos con margen suficiente para ser alertados antes del cierre
+    margen = CONFIG["INTERVALOS"]["DETECCION_MOVIMIENTO"] * 2
+    saltos_esperados = [t for t, momento in simulador.mercado.saltos.items() if momento <= fin - margen]
+    retrasos = np.array([simulador.retrasos[t] for t in saltos_esperados if t in simulador.retrasos])
+    memoria = [m["memoria_mb"] for m in muestras if m["mercado_abierto"]] or [m["memoria_mb"] for m in muestras]
+    hilos = [m["hilos"] for m in muestras]
+    recibidos = dict(simulador.mensajes)
+    if "archivo" in args.canales:
+        recibidos["archivo"] = contar_lineas(CONFIG["NOTIFICACIONES"]["CANALES"]["archivo"]["RUTA"])
+    envios = estado.leer("notificaciones", {})
+    notificaciones = {
+        canal: {
+            "recibidos": recibidos.get(canal, 0),
+            "enviados": envios.get(canal, {}).get("enviados", 0),
+            "envios": envios.get(canal, {}).get("envios", 0),
+            "fallidos": envios.get(canal, {}).get("fallidos", 0),
+            "descartados": envios.get(canal, {}).get("descartados", 0),
+            "pendientes": envios.get(canal, {}).get("pendientes", 0),
+        }
+        for canal in args.canales
+    }
+    vivos = {hilo.name for hilo in threading.enumerate() if hilo.is_alive()}
+
+    return {
+        "parametros": vars(args),
+        "solicitudes_datos": simulador.solicitudes,
+        "notificaciones": notificaciones,
+        "ciclos": ciclos,
+        "alertas": {
+            "saltos": len(saltos_esperados),
+            "detectados": len(retrasos),
+            "fraccion_detectada": len(retrasos) / len(saltos_esperados) if saltos_esperados else 1.0,
+            "retraso_p50": float(np.percentile(retrasos, 50)) if len(retrasos) else None,
+            "retraso_p95": float(np.percentile(retrasos, 95)) if len(retrasos) else None,
+            "retraso_max": float(retrasos.max()) if len(retrasos) else None,
+        },
+        "memoria": {
+            "inicial_mb": memoria[0] if memoria else None,
+            "final_mb": memoria[-1] if memoria else None,
+            "crecimiento_mb": (max(memoria) - memoria[0]) if memoria else 0.0,
+        },
+        "hilos": {
+            "inicio": hilos_inicio,
+            "maximo": max(hilos, default=hilos_inicio),
+            "monitores_caidos": [nombre for nombre in hilos_monitores() if nombre not in vivos],
+        },
+    }
+
+
+def evaluar_presupuestos(args, reporte):
+    """Lista de presupuestos superados (vacía si la prueba pasa)."""
+    fallas = []
+    for modulo, ciclo in reporte["ciclos"].items():
+        if ciclo["fraccion_excesos"] > args.max_excesos:
+            fallas.append(f"{modulo}: {ciclo['fraccion_excesos']:.1%} de ciclos exceden su intervalo (máx {args.max_excesos:.1%})")
+    alertas = reporte["alertas"]
+    if alertas["retraso_p95"] is not None and alertas["retraso_p95"] > args.max_retraso_alerta:
+        fallas.append(f"Retraso p95 de alertas {alertas['retraso_p95']:.0f}s (máx {args.max_retraso_alerta:.0f}s)")
+    if alertas["fraccion_detectada"] < args.min_deteccion:
+        fallas.append(f"Solo {alertas['fraccion_detectada']:.1%} de los saltos alertados (mín {args.min_deteccion:.1%})")
+    if reporte["memoria"]["crecimiento_mb"] > args.max_crecimiento_memoria:
+        fallas.append(f"Memoria creció {reporte['memoria']['crecimiento_mb']:.0f} MB (máx {args.max_crecimiento_memoria:.0f} MB)")
+    hilos = reporte["hilos"]
+    if hilos["maximo"] - hilos["inicio"] > args.max_hilos_extra:
+        fallas.append(f"Hilos pasaron de {hilos['inicio']} a {hilos['maximo']} (máx +{args.max_hilos_extra})")
+    for canal, datos in reporte["notificaciones"].items():
+        perdidos = datos["fallidos"] + datos["descartados"]
+        if perdidos > args.max_perdidas:
+            fallas.append(f"Canal {canal}: {perdidos} notificaciones perdidas (máx {args.max_perdidas})")
+    if hilos["monitores_caidos"]:
+        fallas.append(f"Hilos caídos: {', '.join(hilos['monitores_caidos'])}")
+    return fallas
+
+
+def imprimir_reporte(reporte, fallas):
+    print("\n📋 Reporte de prueba de carga")
+    print(f"  Solicitudes de datos: {reporte['solicitudes_datos']}")
+    for canal, datos in reporte["notificaciones"].items():
+        print(
+            f"  Canal {canal}: {datos['recibidos']} mensajes recibidos ({datos['envios']} enviados) |"
+            f" {datos['enviados']} alertas entregadas, {datos['fallidos']} fallidas,"
+            f" {datos['descartados']} descartados, {datos['pendientes']} pendientes"
+        )
+    for modulo, ciclo in sorted(reporte["ciclos"].items()):
+        print(
+            f"  {modulo}: {ciclo['ciclos']} ciclos | p50 {ciclo['p50']:.1f}s p95 {ciclo['p95']:.1f}s max {ciclo['max']:.1f}s"
+            f" | excesos {ciclo['excesos']} ({ciclo['fraccion_excesos']:.1%})"
+        )
+    alertas = reporte["alertas"]
+    print(f"  Saltos alertados: {alertas['detectados']}/{alertas['saltos']} ({alertas['fraccion_detectada']:.1%})")
+    if alertas["retraso_p50"] is not None:
+        print(f"  Retraso de alertas: p50 {alertas['retraso_p50']:.0f}s p95 {alertas['retraso_p95']:.0f}s max {alertas['retraso_max']:.0f}s")
+    memoria = reporte["memoria"]
+    if memoria["inicial_mb"] is not None:
+        print(f"  Memoria: {memoria['inicial_mb']:.0f} MB → {memoria['final_mb']:.0f} MB (crecimiento máx {memoria['crecimiento_mb']:.0f} MB)")
+    hilos = reporte["hilos"]
+    print(f"  Hilos: {hilos['inicio']} al iniciar, máximo {hilos['maximo']}")
+    if fallas:
+        print("❌ Presupuestos superados:")
+        for falla in fallas:
+            print(f"  • {falla}")
+    else:
+        print("✅ Todos los presupuestos se cumplieron.")
+
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Prueba de carga de extremo a extremo con datos sintéticos.")
+    parser.add_argument("--tickers", type=int, default=5000, help="Tickers en la watchlist simulada")
+    parser.add_argument("--cortos", type=int, default=8, help="Posiciones cortas simuladas (tomadas de la watchlist)")
+    parser.add_argument("--volatilidad", type=float, default=0.03, help="Volatilidad diaria de los precios (0.03 = 3%%)")
+    parser.add_argument("--prob-salto", type=float, default=0.02, help="Probabilidad de que un ticker tenga un salto en la sesión")
+    parser.add_argument("--magnitud-salto", type=float, default=5.0, help="Tamaño del salto (%%)")
+    parser.add_argument("--factor", type=float, default=60.0, help="Aceleración del reloj (60 = una hora simulada por minuto)")
+    parser.add_argument("--fecha", type=datetime.date.fromisoformat, default=None, help="Sesión simulada (por defecto el próximo día hábil)")
+    parser.add_argument("--inicio", default="09:25", help="Hora ET de inicio de la simulación")
+    parser.add_argument("--fin", default="16:35", help="Hora ET de fin de la simulación")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--canales", type=lambda v: [c.strip() for c in v.split(",") if c.strip()], default=["telegram"],
+                        help="Canales de notificación a probar: telegram,webhook,archivo,socket")
+    parser.add_argument("--latencia-telegram", type=float, default=0.0, help="Latencia real (s) del Telegram falso")
+    parser.add_argument("--solicitudes-por-segundo", type=float, default=None, help="Sobrescribe LIMITADOR.SOLICITUDES_POR_SEGUNDO")
+    parser.add_argument("--presupuesto-minuto", type=int, default=None, help="Sobrescribe PLANIFICADOR.SOLICITUDES_POR_MINUTO")
+    parser.add_argument("--muestreo", type=float, default=1.0, help="Segundos reales entre muestras de memoria e hilos")
+    # Presupuestos: si se supera alguno la prueba sale con código 1
+    parser.add_argument("--max-excesos", type=float, default=0.05, help="Fracción máxima de ciclos que exceden su intervalo")
+    parser.add_argument("--max-retraso-alerta", type=float, default=900.0, help="Retraso p95 máximo (s simulados) entre salto y alerta")
+    parser.add_argument("--min-deteccion", type=float, default=0.9,
+                        help="Fracción mínima (0-1) de saltos inyectados que deben terminar en alerta; 0 desactiva el control")
+    parser.add_argument("--max-crecimiento-memoria", type=float, default=200.0, help="Crecimiento máximo de memoria (MB)")
+    parser.add_argument("--max-perdidas", type=int, default=0, help="Notificaciones fallidas o descartadas permitidas por canal")
+    parser.add_argument("--max-hilos-extra", type=int, default=10, help="Hilos adicionales permitidos sobre los del arranque")
+    parser.add_argument("--json", default=None, help="Archivo donde guardar el reporte en JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parsear_argumentos()
+    desconocidos = set(args.canales) - {"telegram", "webhook", "archivo", "socket"}
+    if desconocidos:
+        sys.exit(f"Canales desconocidos: {', '.join(sorted(desconocidos))}")
+    tz = CONFIG["MERCADO"]["ZONA_HORARIA"]
+    fecha = args.fecha or proximo_dia_habil(datetime.date.today())
+    hora_inicio = datetime.time.fromisoformat(args.inicio)
+    hora_fin = datetime.time.fromisoformat(args.fin)
+    inicio = tz.localize(datetime.datetime.combine(fecha, hora_inicio))
+    fin = tz.localize(datetime.datetime.combine(fecha, hora_fin)).timestamp()
+
+    tickers = [f"SIM{i:05d}" for i in range(args.tickers)]
+    print(f"🧪 Generando mercado sintético: {len(tickers)} tickers, sesión {fecha}")
+    mercado = MercadoSintetico(tickers, fecha, args.volatilidad, args.prob_salto, args.magnitud_salto, args.semilla)
+    simulador = Simulador(mercado, args.latencia_telegram)
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), crear_manejador(simulador))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="Simulador").start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}"
+    receptor_socket = crear_receptor_socket(simulador)
+    threading.Thread(target=receptor_socket.serve_forever, daemon=True, name="ReceptorSocket").start()
+
+    directorio = tempfile.mkdtemp(prefix="prueba_carga_")
+    configurar_simulacion(args, tickers, mercado, url, directorio, receptor_socket.server_address[1])
+    ruta_json = os.path.abspath(args.json) if args.json else None
+    os.chdir(directorio) # Los CSV de los reportes quedan en el directorio temporal
+    reloj.acelerar(inicio, args.factor)
+
+    import app # Después de configurar: el portafolio se construye al importar
+    from utils.notificaciones import mercado_abierto
+    threading.Thread(target=app.main, daemon=True, name="Main").start()
+    print(f"🚀 Simulando {args.inicio}–{args.fin} ET a x{args.factor:g} (servidor en {url})")
+
+    muestras = []
+    hilos_inicio = None
+    espera = threading.Event()
+    while reloj.epoch() < fin:
+        espera.wait(args.muestreo)
+        hilos = threading.active_count()
+        if hilos_inicio is None:
+            hilos_inicio = hilos
+        muestras.append({
+            "momento": reloj.ahora(tz).isoformat(),
+            "memoria_mb": memoria_mb(),
+            "hilos": hilos,
+            "mercado_abierto": mercado_abierto(),
+        })
+
+    from utils.enrutador import enrutador_notificaciones # Importado tras configurar los canales
+    enrutador_notificaciones.esperar() # Entregar lo que quede en las colas antes de contar
+    reporte = generar_reporte(args, simulador, muestras, hilos_inicio or threading.active_count(), fin)
+    fallas = evaluar_presupuestos(args, reporte)
+    reporte["fallas"] = fallas
+    imprimir_reporte(reporte, fallas)
+    if ruta_json:
+        with open(ruta_json, "w", encoding="utf-8") as f:
+            json.dump(dict(reporte, muestras=muestras), f, ensure_ascii=False, indent=2, default=str)
+
+    servidor.shutdown()
+    receptor_socket.shutdown()
+    shutil.rmtree(directorio, ignore_errors=True)
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
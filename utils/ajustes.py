@@ -0,0 +1,342 @@
+# utils/ajustes.py
+"""
+Configuración tipada. CONFIG se compila una sola vez al arrancar en dataclasses
+inmutables con __slots__, con las reglas por ticker (umbral y posición) ya resueltas.
+Los monitores leen estos objetos en lugar de recorrer diccionarios anidados por ticker.
+Las reglas de alerta (CONFIG["REGLAS"]) se compilan aquí mismo con utils.reglas.
+La compilación valida el esquema completo y falla con todos los errores encontrados.
+"""
+import datetime
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from utils.reglas import ErrorRegla, compilar_regla
+
+_NUMERO = (int, float)
+_FALTA = object()
+UMBRAL_CORTO_POR_DEFECTO = 2.0 # Umbral de movimiento brusco si la posición no define uno
+
+
+class ErrorConfiguracion(ValueError):
+    """Configuración inválida. El mensaje enumera todos los problemas encontrados."""
+
+
+@dataclass(frozen=True, slots=True)
+class Telegram:
+    token: str
+    chat_id: str
+    habilitado: bool
+    api_url: str
+
+
+@dataclass(frozen=True, slots=True)
+class Mercado:
+    apertura: datetime.time
+    cierre: datetime.time
+    dias_habiles: frozenset
+    zona_horaria: datetime.tzinfo
+
+    @property
+    def minutos_sesion(self):
+        return (self.cierre.hour * 60 + self.cierre.minute) - (self.apertura.hour * 60 + self.apertura.minute)
+
+    def abierto(self, ahora):
+        """Indica si el mercado está abierto en `ahora` (datetime en la zona del mercado)."""
+        return ahora.weekday() in self.dias_habiles and self.apertura <= ahora.time() <= self.cierre
+
+
+@dataclass(frozen=True, slots=True)
+class Intervalos:
+    short_monitor: int
+    top_gainers: int
+    anomaly_detector: int
+    movimiento_brusco: int
+    deteccion_movimiento: int
+
+
+@dataclass(frozen=True, slots=True)
+class PosicionCorto:
+    ticker: str
+    precio_apertura: float
+    acciones: int
+    umbral: float # Cambio % entre intervalos que dispara la alerta de movimiento brusco
+
+
+@dataclass(frozen=True, slots=True)
+class ReglaTicker:
+    ticker: str
+    umbral: float              # Umbral de la watchlist ya resuelto (específico o por defecto)
+    posicion: PosicionCorto | None # Posición corta del mismo ticker, si existe
+
+
+@dataclass(frozen=True, slots=True)
+class Watchlist:
+    tickers: tuple
+    umbral_por_defecto: float
+    reglas: Mapping # ticker -> ReglaTicker
+
+    def regla(self, ticker):
+        """Regla de un ticker; los que no están en la watchlist usan el umbral por defecto."""
+        regla = self.reglas.get(ticker)
+        return regla if regla is not None else ReglaTicker(ticker, self.umbral_por_defecto, None)
+
+
+@dataclass(frozen=True, slots=True)
+class Configuracion:
+    telegram: Telegram
+    mercado: Mercado
+    intervalos: Intervalos
+    posiciones: Mapping # ticker -> PosicionCorto
+    watchlist: Watchlist
+    universo: tuple     # Watchlist + posiciones cortas, sin repetir
+    reglas: tuple       # utils.reglas.Regla ya compiladas, en el orden de CONFIG["REGLAS"]
+
+    def reglas_de(self, modulo):
+        """Reglas que evalúa el monitor `modulo`."""
+        return tuple(regla for regla in self.reglas if modulo in regla.modulos)
+
+
+# Secciones que los módulos leen una sola vez al construirse: solo se valida su esquema
+# clave -> (tipos aceptados, mínimo o None)
+_ESQUEMA = {
+    "NOTIFICACIONES": {
+        "TAMANO_COLA": (int, 1), "REINTENTOS": (int, 0), "BACKOFF_BASE": (_NUMERO, 0),
+        "BACKOFF_MAXIMO": (_NUMERO, 0), "TIMEOUT": (_NUMERO, 0), "VENTANA_DIGESTO": (_NUMERO, 0),
+        "TIPOS_URGENTES": (list, None),
+    },
+    "CLASIFICACION": {
+        "TAMANO": (int, 1), "TAMANO_PUBLICACION": (int, 1), "HORAS_PUBLICACION": (list, None),
+        "ALERTAR_CAMBIOS_RANGO": (bool, None), "ENFRIAMIENTO_ALERTA": (_NUMERO, 0),
+        "MIN_TICKERS_EVENTOS": (int, 1), "INTERVALO_EVENTOS": (_NUMERO, 1), "INTERVALO_PUBLICACION": (_NUMERO, 0),
+    },
+    "ANOMALIAS_VOLUMEN": {
+        "DIAS_PERFIL": (int, 1), "MIN_SESIONES": (int, 1), "Z_UMBRAL": (_NUMERO, 0),
+        "VENTANA_Z": (int, 1), "DESVIACION_MINIMA": (_NUMERO, 0),
+    },
+    "TRANSVERSAL": {
+        "UMBRAL_MERCADO": (_NUMERO, 0), "AMPLITUD_MINIMA": (_NUMERO, 0), "MIN_TICKERS": (int, 1),
+        "Z_ATIPICO": (_NUMERO, 0), "DISPERSION_MINIMA": (_NUMERO, 0), "ETF_REFERENCIA": (str, None),
+        "BETAS": (dict, None),
+    },
+    "PLANIFICADOR": {
+        "SOLICITUDES_POR_MINUTO": (int, 1), "FACTOR_INTERVALO_MINIMO": (_NUMERO, 0),
+        "FACTOR_INTERVALO_MAXIMO": (_NUMERO, 1), "PESO_VOLATILIDAD": (_NUMERO, 0),
+        "PESO_CERCANIA": (_NUMERO, 0), "PESO_EXPOSICION": (_NUMERO, 0), "SUAVIZADO_VOLATILIDAD": (_NUMERO, 0),
+    },
+    "LIMITADOR": {
+        "SOLICITUDES_POR_SEGUNDO": (_NUMERO, 0), "TASA_MINIMA": (_NUMERO, 0), "RAFAGA": (int, 1),
+        "REINTENTOS": (int, 0), "BACKOFF_BASE": (_NUMERO, 0), "BACKOFF_MAXIMO": (_NUMERO, 0),
+        "FALLOS_PARA_ABRIR": (int, 1), "PAUSA_CIRCUITO": (_NUMERO, 0), "RESERVA_POSICIONES": (int, 0),
+    },
+    "FUENTE_DATOS": {"URL": (str, None)},
+    "PERFILADOR": {
+        "ARCHIVO_CONTROL": (str, None), "DIRECTORIO": (str, None), "MODULO": (str, None), "CICLOS": (int, 1),
+        "INTERVALO_MUESTREO": (_NUMERO, 0.0005), "REVISION_CONTROL": (_NUMERO, 0.1),
+    },
+    "MEMORIA_PRECIOS": {"ENABLED": (bool, None), "NOMBRE": (str, None), "CAPACIDAD": (int, 1)},
+    "REGISTRO": {"NIVEL": (str, None), "FORMATO": (str, None), "TAMANO_COLA": (int, 1)},
+    "SERVIDOR_ESTADO": {"ENABLED": (bool, None), "HOST": (str, None), "PUERTO": (int, 0)},
+    "ARCHIVO_BARRAS": {"ENABLED": (bool, None), "DIRECTORIO": (str, None), "INTERVALOS": (list, None)},
+}
+
+
+class _Lector:
+    """Lee valores de CONFIG verificando tipo y mínimo, y acumula los errores."""
+
+    def __init__(self, config):
+        self.config = config
+        self.errores = []
+
+    def valor(self, ruta, tipos, minimo=None, defecto=_FALTA):
+        actual = self.config
+        for clave in ruta:
+            if not isinstance(actual, Mapping) or clave not in actual:
+                if defecto is not _FALTA:
+                    return defecto
+                self.errores.append(f"{'.'.join(ruta)}: falta la clave")
+                return None
+            actual = actual[clave]
+        tipos = tipos if isinstance(tipos, tuple) else (tipos,)
+        # bool es subclase de int: no aceptarlo donde se espera un número
+        if (isinstance(actual, bool) and bool not in tipos) or not isinstance(actual, tipos):
+            esperado = " o ".join(t.__name__ for t in tipos)
+            self.errores.append(f"{'.'.join(ruta)}: se esperaba {esperado}, no {type(actual).__name__} ({actual!r})")
+            return None
+        if minimo is not None and actual < minimo:
+            self.errores.append(f"{'.'.join(ruta)}: debe ser >= {minimo} ({actual!r})")
+            return None
+        return actual
+
+    def verificar(self, condicion, mensaje):
+        if not condicion:
+            self.errores.append(mensaje)
+
+
+def _hora(lector, seccion, prefijo):
+    hora = lector.valor((seccion, f"{prefijo}_HORA"), int, 0)
+    minuto = lector.valor((seccion, f"{prefijo}_MINUTO"), int, 0)
+    if hora is None or minuto is None:
+        return None
+    lector.verificar(hora < 24 and minuto < 60, f"{seccion}.{prefijo}: hora inválida {hora}:{minuto:02d}")
+    return datetime.time(min(hora, 23), min(minuto, 59))
+
+
+def _es_hora(texto):
+    try:
+        datetime.time.fromisoformat(texto)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+# Tipo de canal de notificación -> claves obligatorias
+_CLAVES_CANAL = {"telegram": (), "webhook": ("URL",), "archivo": ("RUTA",), "socket": ("HOST", "PUERTO")}
+
+
+def _notificaciones(lector):
+    canales = lector.valor(("NOTIFICACIONES", "CANALES"), dict) or {}
+    for nombre in canales:
+        tipo = lector.valor(("NOTIFICACIONES", "CANALES", nombre, "TIPO"), str)
+        if tipo is None:
+            continue
+        if tipo not in _CLAVES_CANAL:
+            lector.verificar(False, f"NOTIFICACIONES.CANALES.{nombre}.TIPO: debe ser {', '.join(_CLAVES_CANAL)} ({tipo!r})")
+            continue
+        for clave in _CLAVES_CANAL[tipo]:
+            lector.valor(("NOTIFICACIONES", "CANALES", nombre, clave), int if clave == "PUERTO" else str)
+    rutas = lector.valor(("NOTIFICACIONES", "RUTAS"), dict) or {}
+    for tipo in rutas:
+        nombres = lector.valor(("NOTIFICACIONES", "RUTAS", tipo), (list, tuple)) or ()
+        desconocidos = [n for n in nombres if n not in canales]
+        lector.verificar(not desconocidos, f"NOTIFICACIONES.RUTAS.{tipo}: canales no definidos {desconocidos}")
+
+
+MODULOS_CON_REGLAS = ("MovimientoBrusco", "DeteccionMovimiento")
+
+
+def _reglas(lector):
+    reglas = []
+    crudas = lector.valor(("REGLAS",), dict) or {}
+    for nombre in crudas:
+        ruta = ("REGLAS", nombre)
+        condicion = lector.valor((*ruta, "CONDICION"), str)
+        salida = lector.valor((*ruta, "SALIDA"), str, defecto=None)
+        enfriamiento = lector.valor((*ruta, "ENFRIAMIENTO"), _NUMERO, 0, defecto=0)
+        modulos = lector.valor((*ruta, "MODULOS"), (list, tuple)) or ()
+        descripcion = lector.valor((*ruta, "DESCRIPCION"), str, defecto="")
+        tipo_alerta = lector.valor((*ruta, "TIPO_ALERTA"), str, defecto=None)
+        desconocidos = [m for m in modulos if m not in MODULOS_CON_REGLAS]
+        lector.verificar(not desconocidos, f"REGLAS.{nombre}.MODULOS: módulos desconocidos {desconocidos} (válidos: {', '.join(MODULOS_CON_REGLAS)})")
+        if condicion is None or enfriamiento is None:
+            continue
+        try:
+            reglas.append(compilar_regla(nombre, condicion, salida, enfriamiento, modulos, descripcion, tipo_alerta))
+        except ErrorRegla as e:
+            lector.verificar(False, f"REGLAS.{nombre}: {e}")
+    return tuple(reglas)
+
+
+def _posiciones(lector):
+    posiciones = {}
+    crudas = lector.valor(("POSICIONES_CORTO",), dict) or {}
+    for ticker in crudas:
+        ruta = ("POSICIONES_CORTO", ticker)
+        precio = lector.valor((*ruta, "precio_apertura"), _NUMERO, 0)
+        acciones = lector.valor((*ruta, "acciones"), int, 1)
+        umbral = lector.valor((*ruta, "umbral_porcentaje"), _NUMERO, 0, defecto=UMBRAL_CORTO_POR_DEFECTO)
+        lector.verificar(precio is None or precio > 0, f"POSICIONES_CORTO.{ticker}.precio_apertura: debe ser > 0")
+        if None not in (precio, acciones, umbral):
+            posiciones[ticker] = PosicionCorto(ticker, float(precio), int(acciones), float(umbral))
+    return MappingProxyType(posiciones)
+
+
+def _watchlist(lector, posiciones):
+    ruta = ("DETECCION_MOVIMIENTO",)
+    tickers = lector.valor((*ruta, "TICKERS_WATCHLIST"), (list, tuple)) or []
+    defecto = lector.valor((*ruta, "UMBRAL_POR_DEFECTO"), _NUMERO, 0)
+    especificos = lector.valor((*ruta, "UMBRALES_POR_TICKER"), dict) or {}
+    for ticker in especificos:
+        lector.valor((*ruta, "UMBRALES_POR_TICKER", ticker), _NUMERO, 0)
+    lector.verificar(all(isinstance(t, str) and t for t in tickers), "DETECCION_MOVIMIENTO.TICKERS_WATCHLIST: los tickers deben ser textos no vacíos")
+    defecto = float(defecto or 0.0)
+    tickers = tuple(dict.fromkeys(tickers)) # Sin repetidos, en el orden original
+    reglas = {
+        ticker: ReglaTicker(ticker, float(especificos.get(ticker, defecto)), posiciones.get(ticker))
+        for ticker in tickers
+    }
+    return Watchlist(tickers=tickers, umbral_por_defecto=defecto, reglas=MappingProxyType(reglas))
+
+
+def compilar(config):
+    """
+    Valida CONFIG y lo convierte en una Configuracion inmutable.
+    Lanza ErrorConfiguracion con la lista completa de problemas si algo no es válido.
+    """
+    lector = _Lector(config)
+
+    telegram = Telegram(
+        token=lector.valor(("TELEGRAM", "TOKEN"), str),
+        chat_id=lector.valor(("TELEGRAM", "CHAT_ID"), str),
+        habilitado=lector.valor(("TELEGRAM", "ENABLED"), bool, defecto=False),
+        api_url=(lector.valor(("TELEGRAM", "API_URL"), str, defecto="https://api.telegram.org") or "").rstrip("/"),
+    )
+
+    apertura = _hora(lector, "MERCADO", "APERTURA")
+    cierre = _hora(lector, "MERCADO", "CIERRE")
+    lector.verificar(apertura is None or cierre is None or apertura < cierre, "MERCADO: la apertura debe ser anterior al cierre")
+    dias = lector.valor(("MERCADO", "DIAS_HABILES"), (list, tuple, set, frozenset)) or ()
+    lector.verificar(all(isinstance(d, int) and 0 <= d <= 6 for d in dias), "MERCADO.DIAS_HABILES: deben ser enteros entre 0 (lunes) y 6 (domingo)")
+    zona = lector.valor(("MERCADO", "ZONA_HORARIA"), datetime.tzinfo)
+    mercado = Mercado(apertura=apertura, cierre=cierre, dias_habiles=frozenset(dias), zona_horaria=zona)
+
+    intervalos = Intervalos(**{
+        campo: lector.valor(("INTERVALOS", campo.upper()), int, 1)
+        for campo in Intervalos.__dataclass_fields__
+    })
+
+    posiciones = _posiciones(lector)
+    watchlist = _watchlist(lector, posiciones)
+
+    _notificaciones(lector)
+    reglas = _reglas(lector)
+    for seccion, claves in _ESQUEMA.items():
+        for clave, (tipos, minimo) in claves.items():
+            lector.valor((seccion, clave), tipos, minimo)
+    lector.verificar(
+        config.get("REGISTRO", {}).get("NIVEL") in (None, "DEBUG", "INFO", "WARNING", "ERROR"),
+        "REGISTRO.NIVEL: debe ser DEBUG, INFO, WARNING o ERROR",
+    )
+    for hora in config.get("CLASIFICACION", {}).get("HORAS_PUBLICACION", []):
+        lector.verificar(_es_hora(hora), f"CLASIFICACION.HORAS_PUBLICACION: hora inválida {hora!r} (formato HH:MM)")
+    lector.verificar(config.get("REGISTRO", {}).get("FORMATO") in (None, "kv", "json"), "REGISTRO.FORMATO: debe ser 'kv' o 'json'")
+
+    if lector.errores:
+        raise ErrorConfiguracion("Configuración inválida:\n  - " + "\n  - ".join(lector.errores))
+
+    return Configuracion(
+        telegram=telegram,
+        mercado=mercado,
+        intervalos=intervalos,
+        posiciones=posiciones,
+        watchlist=watchlist,
+        universo=tuple(dict.fromkeys(watchlist.tickers + tuple(posiciones))),
+        reglas=reglas,
+    )
+
+
+# Configuración compilada vigente (la fija config.py al importarse)
+_actual = None
+
+
+def establecer(configuracion):
+    """Publica la configuración compilada que leerán los módulos."""
+    global _actual
+    _actual = configuracion
+    return configuracion
+
+
+def actual():
+    """Configuración compilada vigente (compila CONFIG si aún no se importó config)."""
+    if _actual is None:
+        import config # Al importarse compila y llama a establecer()
+    return _actual
@@ -0,0 +1,180 @@
+# utils/archivo_barras.py
+"""
+Archivo binario de solo-anexado para barras OHLCV intradiarias.
+
+Un archivo por ticker, intervalo y día: {DIRECTORIO}/{intervalo}/{YYYY-MM-DD}/{TICKER}.bin
+Cada archivo tiene una cabecera fija seguida de registros de ancho fijo (DTYPE_BARRA),
+de modo que los lectores pueden abrirlo con numpy.memmap sin copiar ni parsear.
+"""
+import os
+import struct
+import datetime
+import threading
+import numpy as np
+from config import CONFIG
+from utils import reloj
+from utils.registro import obtener_registro
+
+log = obtener_registro("ArchivoBarras")
+
+# Registro de ancho fijo (48 bytes, little-endian). ts = segundos epoch UTC del inicio de la barra.
+DTYPE_BARRA = np.dtype([
+    ("ts", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+MAGIC = b"MMBARS01"
+# Cabecera: magic (8 bytes) + tamaño de registro (uint32) + reservado (uint32)
+CABECERA = struct.Struct("<8sII")
+TAMANO_CABECERA = CABECERA.size
+
+SEGUNDOS_INTERVALO = {"1m": 60, "5m": 300}
+
+_lock_escritura = threading.Lock()
+
+
+def ruta_archivo(ticker, intervalo, fecha, directorio=None):
+    """Devuelve la ruta del archivo de barras de un ticker para una fecha (date o 'YYYY-MM-DD')."""
+    directorio = directorio or CONFIG["ARCHIVO_BARRAS"]["DIRECTORIO"]
+    fecha_str = fecha if isinstance(fecha, str) else fecha.strftime("%Y-%m-%d")
+    return os.path.join(directorio, intervalo, fecha_str, f"{ticker.upper()}.bin")
+
+
+def _reparar_cola(ruta):
+    """
+    Recorta un registro parcial al final del archivo (p. ej. un corte a mitad de escritura)
+    para que los próximos registros queden alineados. Devuelve la cantidad de registros completos.
+    """
+    tamano = os.path.getsize(ruta)
+    n = max(0, (tamano - TAMANO_CABECERA) // DTYPE_BARRA.itemsize)
+    esperado = TAMANO_CABECERA + n * DTYPE_BARRA.itemsize
+    if tamano != esperado:
+        with open(ruta, "r+b") as f:
+            if tamano < TAMANO_CABECERA:
+                f.truncate(0)
+                f.write(CABECERA.pack(MAGIC, DTYPE_BARRA.itemsize, 0))
+            else:
+                f.truncate(esperado)
+        log.warning("Registro parcial recortado en el archivo de barras", ruta=ruta, bytes_descartados=max(0, tamano - esperado))
+    return n
+
+
+def _ultimo_ts(ruta):
+    """Lee el timestamp del último registro del archivo, tras recortar una cola parcial (None si está vacío)."""
+    n = _reparar_cola(ruta)
+    if n <= 0:
+        return None
+    with open(ruta, "rb") as f:
+        f.seek(TAMANO_CABECERA + (n - 1) * DTYPE_BARRA.itemsize)
+        return struct.unpack("<q", f.read(8))[0]
+
+
+def _registros_desde_dataframe(df):
+    """Convierte un DataFrame de yfinance (índice datetime con tz) en registros DTYPE_BARRA."""
+    registros = np.empty(len(df), dtype=DTYPE_BARRA)
+    indice = df.index
+    if indice.tz is None:
+        indice = indice.tz_localize("UTC")
+    utc = indice.tz_convert("UTC").tz_localize(None)
+    registros["ts"] = np.asarray(utc, dtype="datetime64[s]").astype(np.int64)
+    registros["open"] = df["Open"].to_numpy(dtype=np.float64)
+    registros["high"] = df["High"].to_numpy(dtype=np.float64)
+    registros["low"] = df["Low"].to_numpy(dtype=np.float64)
+    registros["close"] = df["Close"].to_numpy(dtype=np.float64)
+    registros["volume"] = df["Volume"].to_numpy(dtype=np.float64)
+    return registros
+
+
+def agregar_barras(ticker, intervalo, df, ahora=None):
+    """
+    Anexa al archivo las barras cerradas de `df` que aún no estén guardadas.
+    La barra en curso (todavía incompleta) se omite para no fijar valores parciales.
+    Devuelve el número de registros escritos.
+    """
+    if intervalo not in SEGUNDOS_INTERVALO or df is None or df.empty:
+        return 0
+
+    registros = _registros_desde_dataframe(df)
+    ahora_ts = int((ahora or reloj.ahora(datetime.timezone.utc)).timestamp())
+    registros = registros[registros["ts"] + SEGUNDOS_INTERVALO[intervalo] <= ahora_ts]
+    if len(registros) == 0:
+        return 0
+
+    # Agrupar por fecha de mercado (ET), un archivo por día
+    tz = CONFIG["MERCADO"]["ZONA_HORARIA"]
+    fechas = [datetime.datetime.fromtimestamp(ts, tz).date() for ts in registros["ts"]]
+    escritos = 0
+    with _lock_escritura:
+        for fecha in sorted(set(fechas)):
+            del_dia = registros[np.array([f == fecha for f in fechas])]
+            ruta = ruta_archivo(ticker, intervalo, fecha)
+            if os.path.isfile(ruta):
+                ultimo = _ultimo_ts(ruta)
+                if ultimo is not None:
+                    del_dia = del_dia[del_dia["ts"] > ultimo]
+            else:
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                with open(ruta, "wb") as f:
+                    f.write(CABECERA.pack(MAGIC, DTYPE_BARRA.itemsize, 0))
+            if len(del_dia) == 0:
+                continue
+            with open(ruta, "ab") as f:
+                f.write(del_dia.tobytes())
+            escritos += len(del_dia)
+    return escritos
+
+
+def leer_barras(ticker, intervalo, fecha, directorio=None):
+    """
+    Abre las barras de un ticker para un día como numpy.memmap de solo lectura.
+    Devuelve un arreglo vacío si no hay archivo. Un registro final incompleto
+    (escritura en curso) se ignora.
+    """
+    ruta = ruta_archivo(ticker, intervalo, fecha, directorio)
+    if not os.path.isfile(ruta):
+        return np.empty(0, dtype=DTYPE_BARRA)
+
+    with open(ruta, "rb") as f:
+        magic, tamano_registro, _ = CABECERA.unpack(f.read(TAMANO_CABECERA))
+    if magic != MAGIC or tamano_registro != DTYPE_BARRA.itemsize:
+        raise ValueError(f"Archivo de barras con formato desconocido: {ruta}")
+
+    n = (os.path.getsize(ruta) - TAMANO_CABECERA) // DTYPE_BARRA.itemsize
+    if n <= 0:
+        return np.empty(0, dtype=DTYPE_BARRA)
+    return np.memmap(ruta, dtype=DTYPE_BARRA, mode="r", offset=TAMANO_CABECERA, shape=(n,))
+
+
+def fechas_disponibles(intervalo, directorio=None):
+    """Lista ordenada de fechas ('YYYY-MM-DD') con barras archivadas para un intervalo."""
+    directorio = directorio or CONFIG["ARCHIVO_BARRAS"]["DIRECTORIO"]
+    base = os.path.join(directorio, intervalo)
+    if not os.path.isdir(base):
+        return []
+    return sorted(d for d in os.listdir(base) if os.path.isdir(os.path.join(base, d)))
+
+
+def iterar_barras(ticker, intervalo, fecha_inicio, fecha_fin, directorio=None):
+    """
+    Recorre los días archivados entre dos fechas (inclusive) y entrega (fecha, memmap)
+    sin copiar los datos. Útil para backtests sobre años de barras.
+    """
+    inicio = fecha_inicio if isinstance(fecha_inicio, str) else fecha_inicio.strftime("%Y-%m-%d")
+    fin = fecha_fin if isinstance(fecha_fin, str) else fecha_fin.strftime("%Y-%m-%d")
+    for fecha in fechas_disponibles(intervalo, directorio):
+        if inicio <= fecha <= fin:
+            barras = leer_barras(ticker, intervalo, fecha, directorio)
+            if len(barras):
+                yield fecha, barras
+
+
+def leer_rango(ticker, intervalo, fecha_inicio, fecha_fin, directorio=None):
+    """Concatena en un solo arreglo las barras de un rango de fechas (copia los datos)."""
+    partes = [barras for _, barras in iterar_barras(ticker, intervalo, fecha_inicio, fecha_fin, directorio)]
+    if not partes:
+        return np.empty(0, dtype=DTYPE_BARRA)
+    return np.concatenate(partes)
@@ -0,0 +1,243 @@
+# utils/clasificacion.py
+"""
+Tabla intradía de ganadores y perdedores desde la apertura, mantenida de forma incremental.
+
+Cada precio nuevo cuesta O(log n): los tickers viven en montículos indexados que separan
+los N mayores (y los N menores) del resto. Al cruzar esa frontera se generan eventos de
+cambio de rango (entra / sale del top N) que el módulo de clasificación puede alertar.
+"""
+import threading
+from collections import deque
+from dataclasses import dataclass
+from config import CONFIG
+from utils import estado, reloj
+
+
+class MonticuloIndexado:
+    """
+    Montículo binario mínimo con un índice clave -> posición, para poder actualizar
+    o quitar cualquier clave en O(log n) y no solo el mínimo.
+    """
+
+    def __init__(self):
+        self._claves = []
+        self._valores = []
+        self._posicion = {}
+
+    def __len__(self):
+        return len(self._claves)
+
+    def __contains__(self, clave):
+        return clave in self._posicion
+
+    def items(self):
+        return zip(self._claves, self._valores)
+
+    def minimo(self):
+        return self._claves[0], self._valores[0]
+
+    def actualizar(self, clave, valor):
+        """Inserta la clave o cambia su valor, restaurando el orden del montículo."""
+        i = self._posicion.get(clave)
+        if i is None:
+            self._claves.append(clave)
+            self._valores.append(valor)
+            self._posicion[clave] = len(self._claves) - 1
+            self._subir(len(self._claves) - 1)
+            return
+        anterior = self._valores[i]
+        self._valores[i] = valor
+        if valor < anterior:
+            self._subir(i)
+        else:
+            self._bajar(i)
+
+    def extraer_minimo(self):
+        clave, valor = self._claves[0], self._valores[0]
+        self.eliminar(clave)
+        return clave, valor
+
+    def eliminar(self, clave):
+        i = self._posicion.pop(clave)
+        ultima_clave = self._claves.pop()
+        ultimo_valor = self._valores.pop()
+        if i == len(self._claves):
+            return
+        self._claves[i], self._valores[i] = ultima_clave, ultimo_valor
+        self._posicion[ultima_clave] = i
+        self._subir(i)
+        self._bajar(self._posicion[ultima_clave])
+
+    def _intercambiar(self, i, j):
+        self._claves[i], self._claves[j] = self._claves[j], self._claves[i]
+        self._valores[i], self._valores[j] = self._valores[j], self._valores[i]
+        self._posicion[self._claves[i]] = i
+        self._posicion[self._claves[j]] = j
+
+    def _subir(self, i):
+        while i > 0:
+            padre = (i - 1) // 2
+            if self._valores[i] >= self._valores[padre]:
+                break
+            self._intercambiar(i, padre)
+            i = padre
+
+    def _bajar(self, i):
+        n = len(self._claves)
+        while True:
+            menor = i
+            for hijo in (2 * i + 1, 2 * i + 2):
+                if hijo < n and self._valores[hijo] < self._valores[menor]:
+                    menor = hijo
+            if menor == i:
+                return
+            self._intercambiar(i, menor)
+            i = menor
+
+
+class ParticionTopN:
+    """
+    Separa las N claves de mayor valor del resto con dos montículos indexados:
+    un mínimo con las N mejores y un máximo (valores negados) con las demás.
+    Una actualización provoca a lo sumo un intercambio entre ambos lados.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self._top = MonticuloIndexado()
+        self._resto = MonticuloIndexado()
+
+    def __contains__(self, clave):
+        return clave in self._top
+
+    def actualizar(self, clave, valor):
+        """Actualiza una clave y devuelve [(clave, "entra" | "sale")] si cambió el top N."""
+        eventos = []
+        if clave in self._top:
+            self._top.actualizar(clave, valor)
+        elif clave in self._resto:
+            self._resto.actualizar(clave, -valor)
+        elif len(self._top) < self.n:
+            self._top.actualizar(clave, valor)
+            return [(clave, "entra")]
+        else:
+            self._resto.actualizar(clave, -valor)
+
+        # Desigualdad estricta: los empates no hacen rotar la frontera
+        if self._top and self._resto and -self._resto.minimo()[1] > self._top.minimo()[1]:
+            sube, valor_sube = self._resto.extraer_minimo()
+            baja, valor_baja = self._top.extraer_minimo()
+            self._top.actualizar(sube, -valor_sube)
+            self._resto.actualizar(baja, -valor_baja)
+            eventos = [(sube, "entra"), (baja, "sale")]
+        return eventos
+
+    def ordenados(self):
+        """Las N claves del top, de mayor a menor valor (O(N log N), N pequeño)."""
+        return [clave for clave, _ in sorted(self._top.items(), key=lambda par: par[1], reverse=True)]
+
+
+@dataclass(frozen=True, slots=True)
+class FilaClasificacion:
+    rango: int
+    ticker: str
+    cambio: float   # % desde la apertura de hoy
+    apertura: float
+    precio: float
+
+
+@dataclass(frozen=True, slots=True)
+class EventoRango:
+    momento: float  # Epoch
+    lista: str      # "ganadores" o "perdedores"
+    tipo: str       # "entra" o "sale"
+    ticker: str
+    rango: int | None # Posición al entrar (None al salir)
+    cambio: float
+
+
+@dataclass(frozen=True)
+class SnapshotClasificacion:
+    momento: float
+    fecha: object
+    total: int       # Tickers con precio hoy
+    ganadores: tuple # FilaClasificacion, de mayor a menor cambio
+    perdedores: tuple
+
+
+class ClasificacionIntradia:
+    """Ganadores y perdedores del día, actualizados con cada precio que llega."""
+
+    def __init__(self, config=None):
+        config = config or CONFIG["CLASIFICACION"]
+        self.tamano = config["TAMANO"]
+        self.min_tickers_eventos = config["MIN_TICKERS_EVENTOS"]
+        self.intervalo_publicacion = config["INTERVALO_PUBLICACION"]
+        self._lock = threading.Lock()
+        self._eventos = deque(maxlen=1000)
+        self._reiniciar(None)
+
+    def _reiniciar(self, fecha):
+        self._fecha = fecha
+        self._precios = {} # ticker -> (cambio, apertura, precio)
+        self._ganadores = ParticionTopN(self.tamano)
+        self._perdedores = ParticionTopN(self.tamano)
+        self._ultima_publicacion = 0.0
+
+    def actualizar(self, ticker, apertura, precio, fecha):
+        """Registra el último precio de un ticker para la sesión `fecha`. O(log n)."""
+        if not apertura or apertura <= 0 or not precio or precio <= 0:
+            return
+        cambio = (precio - apertura) / apertura * 100
+        ahora = reloj.epoch()
+        with self._lock:
+            if fecha != self._fecha:
+                if self._fecha is not None and fecha < self._fecha:
+                    return # Barras de una sesión anterior (p. ej. caché): ignorar
+                self._reiniciar(fecha)
+            self._precios[ticker] = (cambio, apertura, precio)
+            cambios = [("ganadores", t, tipo) for t, tipo in self._ganadores.actualizar(ticker, cambio)]
+            cambios += [("perdedores", t, tipo) for t, tipo in self._perdedores.actualizar(ticker, -cambio)]
+
+            # Mientras se llena la tabla todos "entran": no es un cambio de rango real
+            if cambios and len(self._precios) >= self.min_tickers_eventos:
+                for lista, t, tipo in cambios:
+                    particion = self._ganadores if lista == "ganadores" else self._perdedores
+                    rango = particion.ordenados().index(t) + 1 if tipo == "entra" else None
+                    self._eventos.append(EventoRango(ahora, lista, tipo, t, rango, self._precios[t][0]))
+
+            publicar = bool(cambios) or ahora - self._ultima_publicacion >= self.intervalo_publicacion
+            if publicar:
+                self._ultima_publicacion = ahora
+        if publicar:
+            estado.publicar("clasificacion", self.snapshot())
+
+    def _filas(self, particion, n):
+        filas = []
+        for rango, ticker in enumerate(particion.ordenados()[:n], start=1):
+            cambio, apertura, precio = self._precios[ticker]
+            filas.append(FilaClasificacion(rango, ticker, round(cambio, 2), apertura, precio))
+        return tuple(filas)
+
+    def snapshot(self, n=None):
+        """Top y fondo N (por defecto el tamaño completo) en una foto inmutable."""
+        n = n or self.tamano
+        with self._lock:
+            return SnapshotClasificacion(
+                momento=reloj.epoch(),
+                fecha=self._fecha,
+                total=len(self._precios),
+                ganadores=self._filas(self._ganadores, n),
+                perdedores=self._filas(self._perdedores, n),
+            )
+
+    def extraer_eventos(self):
+        """Devuelve y vacía los eventos de cambio de rango acumulados."""
+        with self._lock:
+            eventos = list(self._eventos)
+            self._eventos.clear()
+        return eventos
+
+
+# Instancia compartida: la alimenta utils.datos_mercado con cada consulta intradiaria
+clasificacion_intradia = ClasificacionIntradia()
@@ -0,0 +1,88 @@
+# utils/datos_mercado.py
+import threading
+import requests
+import pandas as pd
+import yfinance as yf
+from config import CONFIG
+from utils.archivo_barras import agregar_barras
+from utils.clasificacion import clasificacion_intradia
+from utils.limitador import limitador_yahoo, CircuitoAbiertoError, PRIORIDAD_NORMAL
+from utils.registro import obtener_registro
+
+log = obtener_registro("DatosMercado")
+
+# Último resultado válido por (ticker, period, interval), servido mientras el circuito está abierto
+_cache_historial = {}
+_lock_cache = threading.Lock()
+
+COLUMNAS_HISTORIAL = ["Open", "High", "Low", "Close", "Volume"]
+
+# Sesión compartida con la fuente alternativa: reutiliza las conexiones en lugar de abrir una por consulta
+_sesion_http = requests.Session()
+
+def _clave_cache(ticker, kwargs):
+    # Solo se cachean consultas relativas (period); las de rango start/end cambian en cada llamada
+    if "period" not in kwargs:
+        return None
+    return (ticker, kwargs["period"], kwargs.get("interval", "1d"))
+
+def _historial_http(ticker, **kwargs):
+    """
+    Pide el historial a la fuente alternativa (CONFIG["FUENTE_DATOS"]["URL"]).
+    Responde un JSON con columnas (ts en epoch y Open/High/Low/Close/Volume) y se
+    devuelve con el mismo formato que yf.Ticker(ticker).history.
+    """
+    url = f"{CONFIG['FUENTE_DATOS']['URL']}/historial"
+    respuesta = _sesion_http.get(url, params={"ticker": ticker, **kwargs}, timeout=10)
+    respuesta.raise_for_status()
+    datos = respuesta.json()
+    indice = pd.to_datetime(datos["ts"], unit="s", utc=True).tz_convert(CONFIG["MERCADO"]["ZONA_HORARIA"])
+    return pd.DataFrame({columna: datos[columna] for columna in COLUMNAS_HISTORIAL}, index=indice)
+
+def _actualizar_clasificacion(ticker, hist):
+    """Alimenta la tabla de ganadores/perdedores con las barras intradiarias del día."""
+    try:
+        clasificacion_intradia.actualizar(
+            ticker, float(hist["Open"].iloc[0]), float(hist["Close"].iloc[-1]), hist.index[-1].date()
+        )
+    except Exception as e:
+        log.warning("Error actualizando clasificación", ticker=ticker, error=str(e))
+
+def obtener_historial(ticker, prioridad=PRIORIDAD_NORMAL, **kwargs):
+    """
+    Punto único de acceso a los datos de Yahoo (equivalente a yf.Ticker(ticker).history).
+    Las solicitudes pasan por el gobernador global (utils.limitador). Si el circuito está
+    abierto se devuelve el último resultado en caché, o se relanza el error si no lo hay.
+    Las barras intradiarias obtenidas se anexan al archivo binario para no descartarlas.
+    Las barras de 5m del día actualizan la clasificación intradía (utils.clasificacion).
+    Si CONFIG["FUENTE_DATOS"]["URL"] está definida, los datos salen de esa fuente en lugar de Yahoo.
+    `prioridad` es la clase de la solicitud en el gobernador (PRIORIDAD_POSICIONES para las posiciones).
+    """
+    clave = _clave_cache(ticker, kwargs)
+    try:
+        if CONFIG["FUENTE_DATOS"]["URL"]:
+            hist = limitador_yahoo.ejecutar(_historial_http, ticker, prioridad=prioridad, **kwargs)
+        else:
+            hist = limitador_yahoo.ejecutar(yf.Ticker(ticker).history, prioridad=prioridad, **kwargs)
+    except CircuitoAbiertoError:
+        with _lock_cache:
+            cacheado = _cache_historial.get(clave) if clave else None
+        if cacheado is None:
+            raise
+        return cacheado
+
+    if clave and not hist.empty:
+        with _lock_cache:
+            _cache_historial[clave] = hist
+
+    intervalo = kwargs.get("interval")
+    if intervalo == "5m" and kwargs.get("period") == "1d" and not hist.empty:
+        _actualizar_clasificacion(ticker, hist)
+
+    config_archivo = CONFIG["ARCHIVO_BARRAS"]
+    if config_archivo["ENABLED"] and intervalo in config_archivo["INTERVALOS"]:
+        try:
+            agregar_barras(ticker, intervalo, hist)
+        except Exception as e:
+            log.warning("Error archivando barras", ticker=ticker, intervalo=intervalo, error=str(e))
+    return hist
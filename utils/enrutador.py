@@ -0,0 +1,359 @@
+# utils/enrutador.py
+"""
+Enrutador de notificaciones: cada tipo de alerta (reporte, movimiento, oportunidad, ...)
+se envía a uno o más canales (chats de Telegram, webhook, archivo local o socket).
+
+Cada canal tiene su propia cola acotada y su hilo de envío: el monitor solo encola y
+sigue. Si un canal es lento o falla, sus reintentos solo retrasan su propia cola; si la
+cola se llena se descarta el mensaje más antiguo de ese canal y los demás no se enteran.
+
+Digesto: los canales que lo tienen activo (Telegram por defecto) juntan las alertas que
+llegan dentro de VENTANA_DIGESTO segundos (la ráfaga de un ciclo, de todos los módulos)
+en un solo mensaje, dividido si supera el límite de caracteres del canal. Las alertas
+urgentes (TIPOS_URGENTES o notificar(..., urgente=True)) se envían solas y sin esperar.
+"""
+import json
+import queue
+import socket
+import threading
+import requests
+from config import CONFIG
+from utils import ajustes, estado, reloj
+from utils.registro import obtener_registro
+from utils.metricas import metricas
+
+log = obtener_registro("Enrutador")
+
+RUTA_POR_DEFECTO = "*" # Tipos de alerta sin ruta propia
+LIMITE_TELEGRAM = 4096 # Caracteres máximos por mensaje de Telegram
+SEPARADOR_DIGESTO = "\n\n"
+
+
+def dividir_texto(partes, limite, encabezado=""):
+    """
+    Junta las partes en mensajes de a lo sumo `limite` caracteres (encabezado incluido).
+    Devuelve [(texto, índices de las partes que lleva)].
+    Corta entre partes, así las entidades Markdown de cada alerta quedan completas; solo una
+    parte que por sí sola no entra se corta por líneas y, si hace falta, por caracteres.
+    """
+    disponible = limite - len(encabezado) - 16 # Margen para la numeración "(2/3)"
+    piezas = [] # (texto, índice de la parte)
+    for indice, parte in enumerate(partes):
+        if len(parte) <= disponible:
+            piezas.append((parte, indice))
+            continue
+        actual = ""
+        for linea in parte.split("\n"):
+            while len(linea) > disponible:
+                if actual:
+                    piezas.append((actual, indice))
+                    actual = ""
+                piezas.append((linea[:disponible], indice))
+                linea = linea[disponible:]
+            if actual and len(actual) + 1 + len(linea) > disponible:
+                piezas.append((actual, indice))
+                actual = linea
+            else:
+                actual = f"{actual}\n{linea}" if actual else linea
+        if actual:
+            piezas.append((actual, indice))
+
+    mensajes = []
+    actual, indices = "", set()
+    for pieza, indice in piezas:
+        if actual and len(actual) + len(SEPARADOR_DIGESTO) + len(pieza) > disponible:
+            mensajes.append((actual, frozenset(indices)))
+            actual, indices = pieza, {indice}
+        else:
+            actual = f"{actual}{SEPARADOR_DIGESTO}{pieza}" if actual else pieza
+            indices.add(indice)
+    if actual:
+        mensajes.append((actual, frozenset(indices)))
+    if not encabezado:
+        return mensajes
+    if len(mensajes) == 1:
+        return [(f"{encabezado}\n{mensajes[0][0]}", mensajes[0][1])]
+    return [
+        (f"{encabezado} ({i}/{len(mensajes)})\n{mensaje}", indices)
+        for i, (mensaje, indices) in enumerate(mensajes, start=1)
+    ]
+
+
+def publicar_telegram(mensaje, chat_id=None, timeout=10, parse_mode="Markdown"):
+    """Envía un mensaje al chat indicado (o al principal). Lanza si la API responde con error."""
+    telegram = ajustes.actual().telegram
+    datos = {"chat_id": chat_id or telegram.chat_id, "text": mensaje}
+    if parse_mode:
+        datos["parse_mode"] = parse_mode
+    response = requests.post(
+        f"{telegram.api_url}/bot{telegram.token}/sendMessage",
+        json=datos,
+        timeout=timeout
+    )
+    response.raise_for_status()
+
+
+class Canal:
+    """Destino de notificaciones con cola acotada y un hilo de envío propio."""
+
+    tipo = None
+    digesto_por_defecto = False
+    limite_caracteres = None # Sin límite
+
+    def __init__(self, nombre, config, general):
+        self.nombre = nombre
+        self.config = config
+        self.timeout = general["TIMEOUT"]
+        self.reintentos = general["REINTENTOS"]
+        self.backoff_base = general["BACKOFF_BASE"]
+        self.backoff_maximo = general["BACKOFF_MAXIMO"]
+        self.ventana_digesto = general["VENTANA_DIGESTO"] if config.get("DIGESTO", self.digesto_por_defecto) else 0
+        self.tipos_urgentes = frozenset(general["TIPOS_URGENTES"])
+        self._cola = queue.Queue(maxsize=general["TAMANO_COLA"])
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.enviados = 0    # Alertas entregadas
+        self.fallidos = 0
+        self.descartados = 0
+        self.envios = 0      # Mensajes enviados (un digesto o un mensaje dividido cuentan varias alertas)
+
+    def entregar(self, tipo_alerta, mensaje, momento):
+        """Envía un mensaje (en el hilo del canal). Debe lanzar una excepción si falla."""
+        raise NotImplementedError
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, daemon=True, name=f"Canal-{self.nombre}")
+                self._hilo.start()
+
+    def encolar(self, tipo_alerta, mensaje, urgente=False):
+        """Agrega el mensaje a la cola sin bloquear; si está llena descarta el más antiguo."""
+        elemento = (reloj.epoch(), tipo_alerta, mensaje, urgente or tipo_alerta in self.tipos_urgentes)
+        try:
+            self._cola.put_nowait(elemento)
+            return
+        except queue.Full:
+            pass
+        try:
+            self._cola.get_nowait()
+            self._cola.task_done()
+        except queue.Empty:
+            pass
+        self.descartados += 1
+        metricas.contar(f"notificaciones.descartadas.{self.nombre}")
+        log.warning("Cola del canal llena: se descarta el mensaje más antiguo", canal=self.nombre)
+        try:
+            self._cola.put_nowait(elemento)
+        except queue.Full:
+            pass
+
+    def pendientes(self):
+        return self._cola.unfinished_tasks
+
+    def _trabajar(self):
+        while True:
+            elemento = self._cola.get()
+            lote = [elemento]
+            try:
+                if self.ventana_digesto and not elemento[3]:
+                    self._juntar(lote)
+                self._entregar_lote(lote)
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+                self._publicar_estado()
+
+    def _juntar(self, lote):
+        """Agrega al lote lo que llegue durante la ventana; las urgentes salen en el momento."""
+        limite = reloj.monotonico() + self.ventana_digesto
+        while True:
+            restante = limite - reloj.monotonico()
+            if restante <= 0:
+                return
+            try:
+                # La espera de la cola es en tiempo real: escalar si el reloj está acelerado
+                elemento = self._cola.get(timeout=restante / reloj.factor())
+            except queue.Empty:
+                return
+            if elemento[3]:
+                try:
+                    self._entregar_lote([elemento])
+                finally:
+                    self._cola.task_done()
+            else:
+                lote.append(elemento)
+
+    def _entregar_lote(self, lote):
+        """Envía una alerta sola o el digesto de varias, dividido según el límite del canal."""
+        if len(lote) == 1:
+            _, tipo_alerta, mensaje, _ = lote[0]
+            textos = dividir_texto([mensaje], self.limite_caracteres) if self.limite_caracteres else [(mensaje, {0})]
+        else:
+            tipo_alerta = "digesto"
+            encabezado = f"🗞️ *Resumen de {len(lote)} alertas*"
+            partes = [mensaje for _, _, mensaje, _ in lote]
+            if self.limite_caracteres:
+                textos = dividir_texto(partes, self.limite_caracteres, encabezado)
+            else:
+                textos = [(encabezado + "\n" + SEPARADOR_DIGESTO.join(partes), range(len(lote)))]
+
+        # Se envían todas las partes aunque alguna falle: cada alerta cuenta como entregada
+        # solo si llegaron todos los mensajes que la llevan
+        perdidas = set()
+        for texto, indices in textos:
+            if not self._entregar_con_reintentos(tipo_alerta, texto, lote[0][0]):
+                perdidas.update(indices)
+        if perdidas:
+            self.fallidos += len(perdidas)
+            metricas.contar(f"notificaciones.fallidas.{self.nombre}", len(perdidas))
+        for indice, (momento, _, _, _) in enumerate(lote):
+            if indice not in perdidas:
+                self.enviados += 1
+                metricas.observar(f"notificaciones.latencia.{self.nombre}", reloj.epoch() - momento)
+        if len(lote) > 1:
+            log.debug("Digesto entregado", canal=self.nombre, alertas=len(lote), mensajes=len(textos), perdidas=len(perdidas))
+
+    def _entregar_con_reintentos(self, tipo_alerta, mensaje, momento):
+        for intento in range(self.reintentos + 1):
+            try:
+                self.entregar(tipo_alerta, mensaje, momento)
+                self.envios += 1
+                log.debug("Notificación entregada", canal=self.nombre, tipo=tipo_alerta)
+                return True
+            except Exception as e:
+                if intento == self.reintentos:
+                    log.error("Notificación no entregada", canal=self.nombre, tipo=tipo_alerta, intentos=intento + 1, error=str(e))
+                    return False
+                espera = min(self.backoff_base * 2 ** intento, self.backoff_maximo)
+                log.warning("Error enviando notificación, se reintenta", canal=self.nombre, intento=intento + 1, espera=espera, error=str(e))
+                reloj.dormir(espera)
+
+    def _publicar_estado(self):
+        estado.fusionar("notificaciones", {self.nombre: {
+            "tipo": self.tipo,
+            "enviados": self.enviados,
+            "fallidos": self.fallidos,
+            "descartados": self.descartados,
+            "envios": self.envios,
+            "pendientes": self.pendientes(),
+        }})
+
+
+class CanalTelegram(Canal):
+    """Chat de Telegram (CHAT_ID propio o el principal de TELEGRAM)."""
+
+    tipo = "telegram"
+    digesto_por_defecto = True
+    limite_caracteres = LIMITE_TELEGRAM
+
+    def entregar(self, tipo_alerta, mensaje, momento):
+        if not ajustes.actual().telegram.habilitado:
+            log.info("Telegram deshabilitado. Mensaje no enviado", canal=self.nombre, mensaje=mensaje[:50])
+            return
+        try:
+            publicar_telegram(mensaje, self.config.get("CHAT_ID"), self.timeout)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 400:
+                raise
+            # Markdown que Telegram no acepta (p. ej. una entidad cortada al dividir un
+            # mensaje muy largo): se reenvía como texto plano en lugar de perderlo
+            log.warning("Markdown rechazado por Telegram, se envía como texto plano", canal=self.nombre, error=str(e))
+            publicar_telegram(mensaje, self.config.get("CHAT_ID"), self.timeout, parse_mode=None)
+
+
+class CanalWebhook(Canal):
+    """POST en JSON a una URL genérica (Slack, Discord, un servicio propio, ...)."""
+
+    tipo = "webhook"
+
+    def entregar(self, tipo_alerta, mensaje, momento):
+        response = requests.post(
+            self.config["URL"],
+            json={"tipo": tipo_alerta, "mensaje": mensaje, "momento": momento},
+            headers=self.config.get("CABECERAS") or {},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class CanalArchivo(Canal):
+    """Anexa cada alerta como una línea JSON a un archivo local."""
+
+    tipo = "archivo"
+
+    def entregar(self, tipo_alerta, mensaje, momento):
+        linea = json.dumps({"momento": momento, "tipo": tipo_alerta, "mensaje": mensaje}, ensure_ascii=False)
+        with open(self.config["RUTA"], "a", encoding="utf-8") as f:
+            f.write(linea + "\n")
+
+
+class CanalSocket(Canal):
+    """Envía cada alerta como una línea JSON por una conexión TCP (se reconecta si se cae)."""
+
+    tipo = "socket"
+
+    def __init__(self, nombre, config, general):
+        super().__init__(nombre, config, general)
+        self._conexion = None
+
+    def entregar(self, tipo_alerta, mensaje, momento):
+        linea = json.dumps({"momento": momento, "tipo": tipo_alerta, "mensaje": mensaje}, ensure_ascii=False)
+        try:
+            if self._conexion is None:
+                self._conexion = socket.create_connection((self.config["HOST"], self.config["PUERTO"]), timeout=self.timeout)
+            self._conexion.sendall((linea + "\n").encode("utf-8"))
+        except OSError:
+            if self._conexion is not None:
+                self._conexion.close()
+                self._conexion = None
+            raise
+
+
+TIPOS_CANAL = {clase.tipo: clase for clase in (CanalTelegram, CanalWebhook, CanalArchivo, CanalSocket)}
+
+
+class EnrutadorNotificaciones:
+    """Reparte cada alerta entre los canales de su tipo según NOTIFICACIONES.RUTAS."""
+
+    def __init__(self, config=None):
+        config = config or CONFIG["NOTIFICACIONES"]
+        self.canales = {
+            nombre: TIPOS_CANAL[canal["TIPO"]](nombre, canal, config)
+            for nombre, canal in config["CANALES"].items()
+        }
+        self.rutas = {tipo: tuple(nombres) for tipo, nombres in config["RUTAS"].items()}
+        self._iniciado = False
+
+    def iniciar(self):
+        """Arranca los hilos de envío (también se arrancan solos con la primera alerta)."""
+        for canal in self.canales.values():
+            canal.iniciar()
+        self._iniciado = True
+
+    def destinos(self, tipo_alerta):
+        return self.rutas.get(tipo_alerta, self.rutas.get(RUTA_POR_DEFECTO, ()))
+
+    def notificar(self, tipo_alerta, mensaje, urgente=False):
+        """Encola el mensaje en cada canal de su ruta. No bloquea."""
+        if not self._iniciado:
+            self.iniciar()
+        destinos = self.destinos(tipo_alerta)
+        if not destinos:
+            log.debug("Alerta sin canales configurados", tipo=tipo_alerta)
+        for nombre in destinos:
+            self.canales[nombre].encolar(tipo_alerta, mensaje, urgente)
+        metricas.contar(f"notificaciones.{tipo_alerta}")
+
+    def esperar(self, limite=10.0):
+        """Espera (hasta `limite` segundos reales) a que se vacíen las colas. True si se vaciaron."""
+        espera = threading.Event()
+        for _ in range(int(limite / 0.05)):
+            if all(canal.pendientes() == 0 for canal in self.canales.values()):
+                return True
+            espera.wait(0.05)
+        return False
+
+
+# Instancia compartida por todos los monitores
+enrutador_notificaciones = EnrutadorNotificaciones()
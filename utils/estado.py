@@ -0,0 +1,51 @@
+# utils/estado.py
+"""
+Snapshots del estado en vivo para consumidores de solo lectura (servidor de estado, etc.).
+
+Los monitores publican objetos inmutables y el mapa completo se reemplaza de forma
+atómica (copia al escribir). Los lectores solo toman la referencia actual: nunca
+usan locks ni provocan consultas a Yahoo.
+"""
+import threading
+from types import MappingProxyType
+from utils import reloj
+
+_lock_escritura = threading.Lock()  # Solo serializa a los escritores entre sí
+_estado = MappingProxyType({})
+
+
+def publicar(clave, valor):
+    """Reemplaza el snapshot de `clave` por `valor` (que no debe modificarse después)."""
+    global _estado
+    with _lock_escritura:
+        nuevo = dict(_estado)
+        nuevo[clave] = valor
+        _estado = MappingProxyType(nuevo)
+
+
+def fusionar(clave, entradas):
+    """
+    Publica un nuevo mapa para `clave` combinando el actual con `entradas`
+    ({subclave: valor}). Útil para precios o alertas que llegan desde varios hilos.
+    """
+    global _estado
+    with _lock_escritura:
+        actual = _estado.get(clave) or {}
+        combinado = dict(actual)
+        combinado.update({k: MappingProxyType(dict(v)) if isinstance(v, dict) else v for k, v in entradas.items()})
+        nuevo = dict(_estado)
+        nuevo[clave] = MappingProxyType(combinado)
+        _estado = MappingProxyType(nuevo)
+
+
+def leer(clave=None, defecto=None):
+    """Devuelve el snapshot de `clave` (o el estado completo). Sin locks."""
+    estado = _estado
+    if clave is None:
+        return estado
+    return estado.get(clave, defecto)
+
+
+def registrar_latido(nombre, **datos):
+    """Marca que el hilo `nombre` completó un ciclo (para el estado de salud de hilos)."""
+    fusionar("latidos", {nombre: dict(datos, momento=reloj.epoch())})
@@ -0,0 +1,185 @@
+# utils/limitador.py
+import re
+import random
+import threading
+import requests
+from config import CONFIG
+from utils import reloj
+from utils.registro import obtener_registro
+
+log = obtener_registro("Limitador")
+
+
+class CircuitoAbiertoError(Exception):
+    """Se lanza cuando el circuito está abierto y no se permiten solicitudes a Yahoo."""
+
+
+_PATRON_CODIGO_TRANSITORIO = re.compile(r"\b(429|5\d\d)\b")
+
+# Clases de prioridad de las solicitudes (menor = más urgente)
+PRIORIDAD_POSICIONES = 0 # Monitoreo de las posiciones abiertas: pocas consultas, sensibles a la latencia
+PRIORIDAD_NORMAL = 1     # Barridos de la watchlist, reportes y demás
+
+
+def es_error_transitorio(error):
+    """
+    Indica si un error de Yahoo amerita reintento: límite de tasa (429), errores 5xx
+    o fallas de red. Otros errores (ticker inexistente, datos faltantes) no se reintentan.
+    """
+    respuesta = getattr(error, "response", None)
+    codigo = getattr(respuesta, "status_code", None)
+    if codigo is not None:
+        return codigo == 429 or codigo >= 500
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    nombre = type(error).__name__
+    texto = str(error)
+    return "RateLimit" in nombre or "Too Many Requests" in texto or bool(_PATRON_CODIGO_TRANSITORIO.search(texto))
+
+
+class LimitadorSolicitudes:
+    """
+    Gobernador de solicitudes a Yahoo para todo el proceso.
+    - Cubeta de fichas: limita la tasa y permite ráfagas cortas.
+    - Tasa adaptativa: se reduce a la mitad ante un 429 y se recupera de a poco con los éxitos,
+      para mantenerse en la mayor tasa sostenible.
+    - Backoff exponencial con jitter ante errores transitorios.
+    - Interruptor de circuito: tras varios fallos seguidos pausa las solicitudes.
+    - Prioridad de posiciones: las solicitudes de PRIORIDAD_NORMAL ceden el paso mientras
+      haya alguna de posiciones esperando o en curso, y no usan las últimas
+      RESERVA_POSICIONES fichas, así los barridos masivos no demoran a las posiciones.
+    """
+
+    def __init__(self, config=None):
+        config = config or CONFIG["LIMITADOR"]
+        self.tasa_maxima = config["SOLICITUDES_POR_SEGUNDO"]
+        self.tasa_minima = config["TASA_MINIMA"]
+        self.capacidad = config["RAFAGA"]
+        self.reintentos = config["REINTENTOS"]
+        self.backoff_base = config["BACKOFF_BASE"]
+        self.backoff_maximo = config["BACKOFF_MAXIMO"]
+        self.fallos_para_abrir = config["FALLOS_PARA_ABRIR"]
+        self.pausa_circuito = config["PAUSA_CIRCUITO"]
+        self.reserva_posiciones = min(config["RESERVA_POSICIONES"], self.capacidad - 1)
+
+        self._lock = threading.Lock()
+        self._condicion = threading.Condition(self._lock)
+        self._esperando_posiciones = 0
+        self._en_curso_posiciones = 0
+        self.tasa = self.tasa_maxima
+        self._fichas = float(self.capacidad)
+        self._ultima_recarga = reloj.monotonico()
+        self._fallos_consecutivos = 0
+        self._abierto_hasta = 0.0
+        self._prueba_en_curso = False
+
+    # --- Cubeta de fichas ---
+    def adquirir(self, prioridad=PRIORIDAD_NORMAL):
+        """Bloquea hasta obtener una ficha (las de posiciones pasan primero)."""
+        posiciones = prioridad == PRIORIDAD_POSICIONES
+        minimo = 1 if posiciones else 1 + self.reserva_posiciones
+        with self._condicion:
+            if posiciones:
+                self._esperando_posiciones += 1
+            try:
+                while True:
+                    ahora = reloj.monotonico()
+                    self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultima_recarga) * self.tasa)
+                    self._ultima_recarga = ahora
+                    cede = not posiciones and (self._esperando_posiciones or self._en_curso_posiciones)
+                    if not cede and self._fichas >= minimo:
+                        self._fichas -= 1
+                        return
+                    espera = (minimo - self._fichas) / self.tasa
+                    if cede:
+                        # Se despierta al terminar la solicitud de posiciones (el plazo es solo un resguardo)
+                        espera = max(espera, 1.0)
+                    # Espera en tiempo real: escalar si el reloj está acelerado
+                    self._condicion.wait(espera / reloj.factor())
+            finally:
+                if posiciones:
+                    self._esperando_posiciones -= 1
+
+    def _llamar(self, funcion, args, kwargs, prioridad):
+        """Hace la solicitud llevando la cuenta de las de posiciones en curso."""
+        if prioridad != PRIORIDAD_POSICIONES:
+            return funcion(*args, **kwargs)
+        with self._condicion:
+            self._en_curso_posiciones += 1
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            with self._condicion:
+                self._en_curso_posiciones -= 1
+                if not self._en_curso_posiciones and not self._esperando_posiciones:
+                    self._condicion.notify_all()
+
+    # --- Interruptor de circuito ---
+    def circuito_abierto(self):
+        return reloj.monotonico() < self._abierto_hasta
+
+    def segundos_para_reintento(self):
+        """Segundos que faltan para que el circuito admita una solicitud de prueba."""
+        return max(0.0, self._abierto_hasta - reloj.monotonico())
+
+    def _permitir_solicitud(self):
+        """Cerrado: siempre. Abierto: nunca. Semiabierto (pausa vencida): una sola solicitud de prueba."""
+        with self._lock:
+            if self._fallos_consecutivos < self.fallos_para_abrir:
+                return True
+            if reloj.monotonico() < self._abierto_hasta or self._prueba_en_curso:
+                return False
+            self._prueba_en_curso = True
+            return True
+
+    def _registrar_exito(self):
+        with self._lock:
+            if self._fallos_consecutivos >= self.fallos_para_abrir:
+                log.info("Circuito de Yahoo cerrado: se reanudan las solicitudes")
+            self._fallos_consecutivos = 0
+            self._prueba_en_curso = False
+            # Recuperación aditiva de la tasa
+            self.tasa = min(self.tasa_maxima, self.tasa + self.tasa_maxima * 0.05)
+
+    def _registrar_fallo(self, error):
+        with self._lock:
+            self._fallos_consecutivos += 1
+            self._prueba_en_curso = False
+            if "429" in str(error) or "RateLimit" in type(error).__name__:
+                # Reducción multiplicativa de la tasa ante límite de Yahoo
+                self.tasa = max(self.tasa_minima, self.tasa / 2)
+            if self._fallos_consecutivos >= self.fallos_para_abrir:
+                self._abierto_hasta = reloj.monotonico() + self.pausa_circuito
+                log.warning("Circuito de Yahoo abierto", pausa=self.pausa_circuito, fallos=self._fallos_consecutivos, error=str(error))
+                return True
+            return False
+
+    def ejecutar(self, funcion, *args, prioridad=PRIORIDAD_NORMAL, **kwargs):
+        """
+        Ejecuta una solicitud respetando la tasa y su prioridad, con reintentos y backoff.
+        Lanza CircuitoAbiertoError si el circuito está (o queda) abierto.
+        """
+        for intento in range(self.reintentos + 1):
+            if not self._permitir_solicitud():
+                raise CircuitoAbiertoError("Circuito de Yahoo abierto")
+            self.adquirir(prioridad)
+            try:
+                resultado = self._llamar(funcion, args, kwargs, prioridad)
+            except Exception as e:
+                if not es_error_transitorio(e):
+                    with self._lock:
+                        self._prueba_en_curso = False
+                    raise
+                if self._registrar_fallo(e):
+                    raise CircuitoAbiertoError("Circuito de Yahoo abierto") from e
+                if intento == self.reintentos:
+                    raise
+                # Backoff exponencial con jitter completo
+                reloj.dormir(random.uniform(0, min(self.backoff_maximo, self.backoff_base * 2 ** intento)))
+                continue
+            self._registrar_exito()
+            return resultado
+
+
+# Gobernador compartido por todos los hilos y trabajos programados
+limitador_yahoo = LimitadorSolicitudes()
@@ -0,0 +1,321 @@
+# utils/memoria_precios.py
+"""
+Pizarra de precios en memoria compartida para consumidores locales (tableros, scripts de riesgo).
+
+El monitor publica el último precio, apertura, cambios y P&L de cada ticker en un bloque
+multiprocessing.shared_memory con una cabecera fija seguida de registros de ancho fijo
+(DTYPE_REGISTRO). Otro proceso de la misma máquina lo abre por nombre con LectorPrecios
+y lee snapshots consistentes sin red, sin consultas a Yahoo y sin frenar al escritor.
+
+Consistencia con un seqlock: el escritor incrementa la secuencia (impar = escritura en
+curso), escribe los registros y la vuelve a incrementar (par). El lector copia los
+registros y reintenta si la secuencia cambió o era impar. El escritor nunca espera a
+los lectores.
+
+Limitación: no hay barreras de memoria explícitas (Python no las expone). Las escrituras
+son stores numpy comunes, y el seqlock depende de que el hardware no reordene stores entre sí
+ni loads entre sí (x86-64, TSO). En arquitecturas de orden débil (ARM, POWER) un lector
+podría aceptar un snapshot mezclado. Allí conviene validar los datos o leer por la API de
+estado.
+
+La cabecera guarda el PID del escritor: si al iniciar ya existe un bloque con el mismo
+nombre y su dueño sigue vivo, no se toca (iniciar() lanza FileExistsError).
+
+Este módulo no importa config: los lectores externos solo necesitan numpy.
+
+    from utils.memoria_precios import LectorPrecios
+    with LectorPrecios() as lector:
+        snapshot = lector.snapshot()
+        snapshot.fila("AAPL")  # {"precio": ..., "apertura": ..., "pnl": ..., ...}
+
+`python -m utils.memoria_precios [nombre]` muestra el contenido actual.
+"""
+import os
+import atexit
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+import numpy as np
+from utils import reloj # No depende de config
+
+NOMBRE_POR_DEFECTO = "market_monitor_precios"
+
+# Registro de ancho fijo (72 bytes, little-endian). Los valores sin dato son NaN.
+DTYPE_REGISTRO = np.dtype([
+    ("ticker", "S16"),
+    ("precio", "<f8"),      # Último precio
+    ("apertura", "<f8"),    # Precio de apertura de hoy
+    ("cambio", "<f8"),      # Cambio % contra la referencia del intervalo del monitor
+    ("cambio_dia", "<f8"),  # Cambio % desde la apertura de hoy
+    ("pnl", "<f8"),         # P&L no realizado de la posición corta ($)
+    ("pnl_pct", "<f8"),     # P&L no realizado (%)
+    ("momento", "<f8"),     # Epoch de la última actualización del registro
+])
+CAMPOS = DTYPE_REGISTRO.names[1:-1] # Campos que pueden actualizar los monitores
+
+MAGIC = b"MMPRECIO"
+VERSION = 2
+# Cabecera: magic (8) + versión, tamaño de registro, capacidad y registros usados (uint32)
+# + secuencia del seqlock (uint64) + momento de la última publicación (float64) + PID del escritor (uint32)
+CABECERA = struct.Struct("<8sIIIIQdI")
+OFFSET_USADOS = 20
+OFFSET_SECUENCIA = 24
+OFFSET_MOMENTO = 32
+TAMANO_CABECERA = 64 # Cabecera rellenada para alinear los registros
+
+
+def _vistas(buf, capacidad):
+    """Vistas numpy sobre el bloque: usados, secuencia, momento y registros (sin copiar)."""
+    usados = np.ndarray((1,), dtype="<u4", buffer=buf, offset=OFFSET_USADOS)
+    secuencia = np.ndarray((1,), dtype="<u8", buffer=buf, offset=OFFSET_SECUENCIA)
+    momento = np.ndarray((1,), dtype="<f8", buffer=buf, offset=OFFSET_MOMENTO)
+    registros = np.ndarray((capacidad,), dtype=DTYPE_REGISTRO, buffer=buf, offset=TAMANO_CABECERA)
+    return usados, secuencia, momento, registros
+
+
+class PizarraPrecios:
+    """
+    Escritor del bloque compartido (uno por proceso). Mientras no se llama a iniciar(),
+    actualizar() no hace nada, así los monitores pueden llamarlo siempre.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock() # Solo serializa a los escritores del proceso entre sí
+        self._shm = None
+        self._indice = {} # ticker -> posición del registro
+        self._llena = False
+
+    def iniciar(self, nombre=NOMBRE_POR_DEFECTO, capacidad=1024):
+        """
+        Crea el bloque y lo libera al salir. Un bloque con el mismo nombre solo se reemplaza
+        si es una pizarra huérfana; si su escritor sigue vivo se lanza FileExistsError.
+        """
+        with self._lock:
+            if self._shm is not None:
+                return
+            tamano = TAMANO_CABECERA + capacidad * DTYPE_REGISTRO.itemsize
+            try:
+                shm = shared_memory.SharedMemory(name=nombre, create=True, size=tamano)
+            except FileExistsError:
+                _verificar_huerfano(nombre)
+                # Bloque de una ejecución anterior que no terminó limpia
+                huerfano = shared_memory.SharedMemory(name=nombre)
+                huerfano.close()
+                huerfano.unlink()
+                shm = shared_memory.SharedMemory(name=nombre, create=True, size=tamano)
+            CABECERA.pack_into(shm.buf, 0, MAGIC, VERSION, DTYPE_REGISTRO.itemsize, capacidad, 0, 0, 0.0, os.getpid())
+            self._usados, self._secuencia, self._momento, self._registros = _vistas(shm.buf, capacidad)
+            self._registros[:] = np.zeros(1, dtype=DTYPE_REGISTRO)
+            for campo in CAMPOS:
+                self._registros[campo] = np.nan
+            self._shm = shm
+        atexit.register(self.cerrar)
+
+    @property
+    def nombre(self):
+        return self._shm.name if self._shm is not None else None
+
+    def actualizar(self, filas, momento=None):
+        """
+        Publica {ticker: {campo: valor}} en una sola escritura del seqlock. Solo se tocan los
+        campos indicados (None se guarda como NaN); el resto del registro conserva su valor.
+        """
+        if self._shm is None or not filas:
+            return
+        momento = reloj.epoch() if momento is None else momento
+        with self._lock:
+            if self._shm is None:
+                return
+            # Armar las columnas fuera de la ventana del seqlock: dentro solo hay copias vectorizadas
+            filas_usadas = []
+            columnas = {}
+            for ticker, valores in filas.items():
+                i = self._posicion(ticker)
+                if i is None:
+                    continue
+                filas_usadas.append(i)
+                for campo, valor in valores.items():
+                    indices, datos = columnas.setdefault(campo, ([], []))
+                    indices.append(i)
+                    datos.append(np.nan if valor is None else valor)
+            columnas = {campo: (np.array(i, dtype=np.intp), np.array(d, dtype=np.float64)) for campo, (i, d) in columnas.items()}
+
+            registros = self._registros
+            self._secuencia[0] += 1 # Impar: escritura en curso
+            try:
+                for campo, (indices, datos) in columnas.items():
+                    registros[campo][indices] = datos
+                registros["momento"][filas_usadas] = momento
+                self._usados[0] = len(self._indice)
+                self._momento[0] = momento
+            finally:
+                self._secuencia[0] += 1 # Par: snapshot consistente
+
+    def _posicion(self, ticker):
+        """Posición del registro de un ticker; la asigna la primera vez (None si no hay lugar)."""
+        i = self._indice.get(ticker)
+        if i is None:
+            if len(self._indice) >= len(self._registros):
+                if not self._llena:
+                    self._llena = True
+                    # Import diferido: los lectores no deben arrastrar config
+                    from utils.registro import obtener_registro
+                    obtener_registro("MemoriaPrecios").warning(
+                        "Pizarra de precios llena: se ignoran tickers nuevos", capacidad=len(self._registros)
+                    )
+                return None
+            # Los registros nuevos quedan fuera de `usados` hasta la publicación: se pueden escribir ya
+            i = self._indice[ticker] = len(self._indice)
+            self._registros["ticker"][i] = ticker.encode("ascii", "replace")[:16]
+        return i
+
+    def cerrar(self):
+        """Libera el bloque. Los lectores que lo tengan abierto conservan su mapeo."""
+        with self._lock:
+            shm, self._shm = self._shm, None
+            if shm is None:
+                return
+            del self._usados, self._secuencia, self._momento, self._registros
+            self._indice = {}
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+@dataclass(frozen=True)
+class SnapshotPrecios:
+    """Copia consistente de la pizarra. `registros` es de solo lectura y sigue el orden de `tickers`."""
+    secuencia: int
+    momento: float # Epoch de la última publicación
+    tickers: tuple
+    registros: np.ndarray
+    indices: dict # ticker -> fila de `registros`
+
+    def fila(self, ticker):
+        """Valores de un ticker como diccionario (None si no está publicado)."""
+        i = self.indices.get(ticker)
+        if i is None:
+            return None
+        registro = self.registros[i]
+        return {campo: float(registro[campo]) for campo in DTYPE_REGISTRO.names[1:]}
+
+    def columna(self, campo):
+        """Arreglo de un campo para todos los tickers (vista, sin copia)."""
+        return self.registros[campo]
+
+
+class LectorPrecios:
+    """Abre la pizarra de otro proceso por nombre y toma snapshots consistentes."""
+
+    def __init__(self, nombre=NOMBRE_POR_DEFECTO):
+        self._shm = _abrir_sin_seguimiento(nombre)
+        magic, version, tamano_registro, capacidad = CABECERA.unpack_from(self._shm.buf, 0)[:4]
+        if magic != MAGIC or version != VERSION or tamano_registro != DTYPE_REGISTRO.itemsize:
+            self._shm.close()
+            raise ValueError(f"{nombre!r} no es una pizarra de precios compatible (versión {version})")
+        self._usados, self._secuencia, self._momento, self._registros = _vistas(self._shm.buf, capacidad)
+        self._tickers = ()
+        self._indices = {}
+
+    def secuencia(self):
+        """Secuencia actual: si no cambió desde el último snapshot, no hay datos nuevos."""
+        return int(self._secuencia[0])
+
+    def snapshot(self, reintentos=1000):
+        """
+        Copia los registros usados sin bloquear al escritor. Reintenta mientras haya una
+        escritura en curso; lanza TimeoutError si no logra una lectura consistente.
+        """
+        for intento in range(reintentos):
+            antes = int(self._secuencia[0])
+            if antes % 2 == 0:
+                usados = int(self._usados[0])
+                registros = self._registros[:usados].copy()
+                momento = float(self._momento[0])
+                if int(self._secuencia[0]) == antes:
+                    registros.setflags(write=False)
+                    if len(self._tickers) != usados:
+                        # Los tickers solo se agregan al final: se decodifican una vez
+                        self._tickers = tuple(t.decode("ascii") for t in registros["ticker"])
+                        self._indices = {ticker: i for i, ticker in enumerate(self._tickers)}
+                    return SnapshotPrecios(antes, momento, self._tickers, registros, self._indices)
+            if intento % 100 == 99:
+                time.sleep(0.0001)
+        raise TimeoutError("no se pudo leer un snapshot consistente de la pizarra de precios")
+
+    def cerrar(self):
+        if self._shm is not None:
+            del self._usados, self._secuencia, self._momento, self._registros
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Existe, pero es de otro usuario
+    return True
+
+
+def _verificar_huerfano(nombre):
+    """
+    Lanza FileExistsError salvo que el bloque existente sea una pizarra de precios cuyo
+    escritor ya no corre. Un bloque ajeno o de otra versión no se borra.
+    """
+    shm = _abrir_sin_seguimiento(nombre)
+    try:
+        if shm.size < CABECERA.size:
+            raise FileExistsError(f"{nombre!r} existe y no es una pizarra de precios")
+        magic, version = CABECERA.unpack_from(shm.buf, 0)[:2]
+        if magic != MAGIC or version != VERSION:
+            raise FileExistsError(f"{nombre!r} existe y no es una pizarra de precios compatible (versión {version})")
+        pid = CABECERA.unpack_from(shm.buf, 0)[-1]
+        if pid == os.getpid() or (pid > 0 and _proceso_vivo(pid)):
+            raise FileExistsError(f"{nombre!r} está en uso por el proceso {pid}")
+    finally:
+        shm.close()
+
+
+def _abrir_sin_seguimiento(nombre):
+    """
+    Abre un bloque existente sin que el resource_tracker de este proceso lo borre al salir
+    (en Python < 3.13 un lector que solo se conecta también lo registraba).
+    """
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=nombre)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+# Instancia compartida del proceso del monitor (se activa en app.main)
+pizarra_precios = PizarraPrecios()
+
+
+if __name__ == "__main__":
+    import sys
+    with LectorPrecios(sys.argv[1] if len(sys.argv) > 1 else NOMBRE_POR_DEFECTO) as lector:
+        snapshot = lector.snapshot()
+        print(f"secuencia={snapshot.secuencia} momento={time.strftime('%H:%M:%S', time.localtime(snapshot.momento))}")
+        print(f"{'ticker':<10}" + "".join(f"{campo:>12}" for campo in CAMPOS))
+        for ticker in snapshot.tickers:
+            fila = snapshot.fila(ticker)
+            print(f"{ticker:<10}" + "".join(f"{fila[campo]:>12.2f}" for campo in CAMPOS))
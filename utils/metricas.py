@@ -0,0 +1,65 @@
+# utils/metricas.py
+"""
+Métricas de rendimiento en memoria: duración de ciclos de los monitores y excesos
+sobre su intervalo. Las consulta la prueba de carga (prueba_carga.py).
+"""
+import threading
+from collections import deque
+import numpy as np
+
+MAXIMO_OBSERVACIONES = 10000 # Por serie; se conservan las más recientes
+
+
+class Metricas:
+    def __init__(self, maximo=MAXIMO_OBSERVACIONES):
+        self._lock = threading.Lock()
+        self._maximo = maximo
+        self._series = {}     # nombre -> deque de valores
+        self._contadores = {} # nombre -> entero
+
+    def observar(self, nombre, valor):
+        with self._lock:
+            serie = self._series.get(nombre)
+            if serie is None:
+                serie = self._series[nombre] = deque(maxlen=self._maximo)
+            serie.append(float(valor))
+
+    def contar(self, nombre, cantidad=1):
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def registrar_ciclo(self, modulo, duracion, intervalo):
+        """Registra la duración de un ciclo y cuenta un exceso si superó su intervalo."""
+        self.observar(f"ciclo.{modulo}", duracion)
+        self.contar(f"ciclos.{modulo}")
+        if duracion > intervalo:
+            self.contar(f"excesos.{modulo}")
+
+    def resumen(self):
+        """Percentiles de cada serie y valores de los contadores."""
+        with self._lock:
+            series = {nombre: np.array(serie) for nombre, serie in self._series.items()}
+            contadores = dict(self._contadores)
+        resumen = {}
+        for nombre, valores in series.items():
+            if len(valores) == 0:
+                continue
+            p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+            resumen[nombre] = {
+                "n": len(valores),
+                "media": float(valores.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(valores.max()),
+            }
+        return {"series": resumen, "contadores": contadores}
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+            self._contadores.clear()
+
+
+# Instancia compartida por todos los módulos
+metricas = Metricas()
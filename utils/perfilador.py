@@ -0,0 +1,243 @@
+# utils/perfilador.py
+"""
+Perfilador por muestreo bajo demanda para los ciclos de los monitores.
+
+Se activa en caliente con la señal SIGUSR1 (monitor y ciclos por defecto de CONFIG) o
+creando el archivo de control con "Modulo [ciclos]" (p. ej. "MovimientoBrusco 3"). Perfila
+los próximos N ciclos del monitor elegido: un hilo toma la pila de ese hilo cada pocos
+milisegundos y al terminar escribe pilas plegadas ("a;b;c cuenta", compatibles con
+flamegraph.pl y speedscope), con el monitor y el número de ciclo como raíz de cada pila.
+
+Apagado, el costo es una comparación por ciclo en los monitores y una revisión del
+archivo de control cada pocos segundos.
+"""
+import os
+import sys
+import signal
+import threading
+from collections import Counter
+from config import CONFIG
+from utils import estado, reloj
+from utils.registro import obtener_registro
+
+log = obtener_registro("Perfilador")
+
+PROFUNDIDAD_MAXIMA = 200
+# Monitores que marcan sus ciclos con iniciar_ciclo/terminar_ciclo
+MODULOS_PERFILABLES = ("ShortMonitor", "MovimientoBrusco", "DeteccionMovimiento", "AnomaliasVolumen", "Clasificacion")
+
+
+class PerfiladorMuestreo:
+    """Toma muestras de la pila del hilo de un monitor durante sus próximos N ciclos."""
+
+    def __init__(self, config=None):
+        config = config or CONFIG["PERFILADOR"]
+        self.config = config
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._etiquetas = {} # code -> "modulo:funcion"
+        self._modulo = None  # Monitor objetivo (None: apagado). Es lo único que leen los monitores.
+        self._reiniciar_sesion()
+
+    def _reiniciar_sesion(self):
+        self._ciclos_pedidos = 0
+        self._ciclo = 0           # Ciclo en curso (1..N), 0 si todavía no empezó
+        self._hilo_objetivo = None
+        self._en_ciclo = False
+        self._inicio_ciclo = 0.0
+        self._muestras = Counter() # pila plegada -> muestras
+        self._duraciones = []
+
+    # --- Control ---
+
+    def solicitar(self, modulo, ciclos=None):
+        """Perfila los próximos `ciclos` ciclos de `modulo` (reemplaza una sesión en curso)."""
+        ciclos = int(ciclos or self.config["CICLOS"])
+        if modulo not in MODULOS_PERFILABLES:
+            log.warning("Monitor desconocido para el perfilador", modulo=modulo, validos=",".join(MODULOS_PERFILABLES))
+            return
+        with self._lock:
+            if self._modulo is not None:
+                self._finalizar("reemplazada")
+            self._reiniciar_sesion()
+            self._ciclos_pedidos = ciclos
+            self._modulo = modulo
+        log.info("Perfilado solicitado", modulo=modulo, ciclos=ciclos)
+        self._publicar_estado()
+        self._despertar.set()
+
+    def cancelar(self):
+        """Detiene la sesión en curso y escribe lo muestreado hasta ahora."""
+        with self._lock:
+            if self._modulo is not None:
+                self._finalizar("cancelada")
+        self._publicar_estado()
+
+    def alternar(self):
+        """Enciende con los valores por defecto o apaga (lo usa la señal)."""
+        if self._modulo is None:
+            self.solicitar(self.config["MODULO"])
+        else:
+            self.cancelar()
+
+    def instalar_senal(self):
+        """Asocia SIGUSR1 a alternar(). Solo funciona desde el hilo principal y en POSIX."""
+        try:
+            signal.signal(signal.SIGUSR1, lambda *_: self.alternar())
+            return True
+        except (AttributeError, ValueError) as e:
+            log.info("Señal del perfilador no disponible", error=str(e))
+            return False
+
+    def iniciar(self):
+        """Arranca el hilo que revisa el archivo de control y toma las muestras."""
+        with self._lock:
+            if self._hilo is None:
+                self._detener.clear()
+                self._hilo = threading.Thread(target=self._trabajar, daemon=True, name="Perfilador")
+                self._hilo.start()
+
+    def detener(self, timeout=5.0):
+        """Cierra la sesión en curso (si la hay) y termina el hilo del perfilador."""
+        self.cancelar()
+        self._detener.set()
+        self._despertar.set()
+        hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            hilo.join(timeout)
+
+    # --- Ganchos de los monitores ---
+
+    def iniciar_ciclo(self, modulo):
+        if self._modulo != modulo:
+            return
+        with self._lock:
+            if self._modulo != modulo:
+                return
+            if not self._en_ciclo:
+                self._ciclo += 1
+            self._hilo_objetivo = threading.get_ident()
+            self._inicio_ciclo = reloj.monotonico()
+            self._en_ciclo = True
+        self._despertar.set()
+
+    def terminar_ciclo(self, modulo):
+        if self._modulo != modulo:
+            return
+        with self._lock:
+            if self._modulo != modulo or not self._en_ciclo:
+                return
+            self._en_ciclo = False
+            self._duraciones.append(reloj.monotonico() - self._inicio_ciclo)
+            if self._ciclo >= self._ciclos_pedidos:
+                self._finalizar("completa")
+        self._publicar_estado()
+
+    # --- Muestreo ---
+
+    def _etiqueta(self, codigo, frame):
+        etiqueta = self._etiquetas.get(codigo)
+        if etiqueta is None:
+            modulo = frame.f_globals.get("__name__", "?")
+            etiqueta = self._etiquetas[codigo] = f"{modulo}:{codigo.co_name}".replace(";", ",").replace(" ", "_")
+        return etiqueta
+
+    def _muestrear(self):
+        with self._lock:
+            if not self._en_ciclo:
+                return
+            frame = sys._current_frames().get(self._hilo_objetivo)
+            if frame is None:
+                return
+            pila = []
+            while frame is not None and len(pila) < PROFUNDIDAD_MAXIMA:
+                pila.append(self._etiqueta(frame.f_code, frame))
+                frame = frame.f_back
+            pila.append(f"ciclo_{self._ciclo}")
+            pila.append(self._modulo)
+            self._muestras[";".join(reversed(pila))] += 1
+
+    def _trabajar(self):
+        # Esperas en tiempo real: el muestreo mide el proceso, no el reloj simulado
+        while not self._detener.is_set():
+            if self._modulo is not None and self._en_ciclo:
+                self._muestrear()
+                self._detener.wait(self.config["INTERVALO_MUESTREO"])
+                continue
+            self._despertar.wait(self.config["REVISION_CONTROL"])
+            self._despertar.clear()
+            if not self._detener.is_set():
+                self._revisar_control()
+
+    def _revisar_control(self):
+        ruta = self.config["ARCHIVO_CONTROL"]
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                contenido = f.read().split()
+            os.remove(ruta)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            log.warning("No se pudo leer el archivo de control", archivo=ruta, error=str(e))
+            return
+        if not contenido or contenido[0].lower() in ("off", "detener"):
+            self.cancelar()
+            return
+        ciclos = contenido[1] if len(contenido) > 1 and contenido[1].isdigit() else None
+        self.solicitar(contenido[0], ciclos)
+
+    # --- Resultado ---
+
+    def _finalizar(self, motivo):
+        """Escribe las pilas plegadas y apaga el perfilador. Se llama con el lock tomado."""
+        modulo, muestras, duraciones = self._modulo, self._muestras, self._duraciones
+        self._modulo = None
+        self._reiniciar_sesion()
+        if not muestras:
+            log.info("Perfilado terminado sin muestras", modulo=modulo, motivo=motivo)
+            return None
+
+        directorio = self.config["DIRECTORIO"]
+        os.makedirs(directorio, exist_ok=True)
+        marca = reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"]).strftime("%Y%m%d_%H%M%S")
+        ruta = os.path.join(directorio, f"{modulo}_{marca}.folded")
+        with open(ruta, "w", encoding="utf-8") as f:
+            for pila, cuenta in sorted(muestras.items()):
+                f.write(f"{pila} {cuenta}\n")
+
+        # Resumen: funciones con más tiempo propio (la hoja de cada pila)
+        propias = Counter()
+        for pila, cuenta in muestras.items():
+            propias[pila.rsplit(";", 1)[-1]] += cuenta
+        total = sum(muestras.values())
+        log.info(
+            "Perfilado terminado",
+            modulo=modulo,
+            motivo=motivo,
+            archivo=ruta,
+            muestras=total,
+            ciclos=",".join(f"{d:.1f}s" for d in duraciones),
+            top=",".join(f"{funcion}={cuenta / total:.0%}" for funcion, cuenta in propias.most_common(5)),
+        )
+        estado.publicar("perfilador_ultimo", {
+            "modulo": modulo,
+            "archivo": ruta,
+            "muestras": total,
+            "duraciones": tuple(duraciones),
+            "momento": reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"]).isoformat(),
+        })
+        return ruta
+
+    def _publicar_estado(self):
+        estado.publicar("perfilador", {
+            "activo": self._modulo is not None,
+            "modulo": self._modulo,
+            "ciclo": self._ciclo,
+            "ciclos_pedidos": self._ciclos_pedidos,
+        })
+
+
+# Instancia compartida: los monitores marcan sus ciclos con iniciar_ciclo/terminar_ciclo
+perfilador = PerfiladorMuestreo()
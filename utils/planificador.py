@@ -0,0 +1,144 @@
+# utils/planificador.py
+import threading
+from collections import deque
+from config import CONFIG
+from utils import reloj
+
+
+class PresupuestoSolicitudes:
+    """
+    Presupuesto global de solicitudes por minuto (ventana deslizante de 60 s),
+    compartido por todos los planificadores del proceso.
+    """
+
+    def __init__(self, max_por_minuto):
+        self.max_por_minuto = max_por_minuto
+        self._lock = threading.Lock()
+        self._marcas = deque()
+
+    def _purgar(self, ahora):
+        while self._marcas and ahora - self._marcas[0] >= 60:
+            self._marcas.popleft()
+
+    def disponibles(self, ahora=None):
+        ahora = ahora or reloj.epoch()
+        with self._lock:
+            self._purgar(ahora)
+            return max(0, self.max_por_minuto - len(self._marcas))
+
+    def consumir(self, cantidad, ahora=None):
+        """Reserva hasta `cantidad` solicitudes y devuelve cuántas se concedieron."""
+        ahora = ahora or reloj.epoch()
+        with self._lock:
+            self._purgar(ahora)
+            concedidas = max(0, min(cantidad, self.max_por_minuto - len(self._marcas)))
+            self._marcas.extend([ahora] * concedidas)
+            return concedidas
+
+    def devolver(self, cantidad):
+        """Libera `cantidad` solicitudes reservadas que al final no se hicieron."""
+        with self._lock:
+            for _ in range(min(cantidad, len(self._marcas))):
+                self._marcas.pop()
+
+    def espera(self, ahora=None):
+        """Segundos hasta que se libere al menos una solicitud."""
+        ahora = ahora or reloj.epoch()
+        with self._lock:
+            self._purgar(ahora)
+            if len(self._marcas) < self.max_por_minuto:
+                return 0.0
+            return max(0.0, 60 - (ahora - self._marcas[0]))
+
+
+presupuesto_global = PresupuestoSolicitudes(CONFIG["PLANIFICADOR"]["SOLICITUDES_POR_MINUTO"])
+
+
+class PlanificadorPrioridad:
+    """
+    Decide qué tickers consultar en cada vuelta del monitor.
+    Un ticker se consulta más seguido cuanto más volátil es, más cerca está de su
+    umbral de alerta o mayor es su exposición; los tickers tranquilos se espacian.
+    El total de consultas respeta el presupuesto global por minuto.
+    """
+
+    def __init__(self, tickers, intervalo_base, costo_por_ticker=1, presupuesto=None):
+        config = CONFIG["PLANIFICADOR"]
+        self.intervalo_base = intervalo_base
+        self.intervalo_minimo = max(1, intervalo_base * config["FACTOR_INTERVALO_MINIMO"])
+        self.intervalo_maximo = intervalo_base * config["FACTOR_INTERVALO_MAXIMO"]
+        # Puntaje de un ticker quieto: su intervalo llega justo al máximo
+        self._puntaje_minimo = 1 / config["FACTOR_INTERVALO_MAXIMO"]
+        self.costo_por_ticker = costo_por_ticker
+        self.presupuesto = presupuesto or presupuesto_global
+        self._pesos = (config["PESO_VOLATILIDAD"], config["PESO_CERCANIA"], config["PESO_EXPOSICION"])
+        self._suavizado = config["SUAVIZADO_VOLATILIDAD"]
+
+        self._proximo = {ticker: 0.0 for ticker in tickers}  # Todos se consultan en la primera vuelta
+        self._intervalo = {ticker: float(intervalo_base) for ticker in tickers}
+        self._volatilidad = {ticker: 0.0 for ticker in tickers}  # EWMA de |retorno| por intervalo base (%)
+        self._ultimo = {}  # ticker -> (precio, momento)
+
+    def prioridad(self, ticker, cambio_porcentual, umbral, exposicion=0.0):
+        """Puntaje de prioridad: 1/FACTOR_INTERVALO_MAXIMO para un ticker quieto, mayor cuanto más relevante."""
+        peso_vol, peso_cercania, peso_exposicion = self._pesos
+        umbral = umbral if umbral and umbral > 0 else 1.0
+        volatilidad = self._volatilidad.get(ticker, 0.0) / umbral
+        cercania = min(abs(cambio_porcentual) / umbral, 1.5)
+        return self._puntaje_minimo + peso_vol * volatilidad + peso_cercania * cercania ** 2 + peso_exposicion * exposicion
+
+    def registrar(self, ticker, precio, cambio_porcentual, umbral, exposicion=0.0, ahora=None):
+        """
+        Actualiza las métricas del ticker tras una consulta y reprograma la siguiente.
+        `exposicion` es la fracción (0-1) del libro que representa la posición.
+        """
+        ahora = ahora or reloj.epoch()
+        anterior = self._ultimo.get(ticker)
+        if anterior and anterior[0] > 0 and ahora > anterior[1]:
+            retorno = abs(precio - anterior[0]) / anterior[0] * 100
+            # Escalar el retorno al intervalo base para comparar con el umbral
+            retorno *= (self.intervalo_base / (ahora - anterior[1])) ** 0.5
+            previa = self._volatilidad.get(ticker, 0.0)
+            self._volatilidad[ticker] = previa + self._suavizado * (retorno - previa)
+        self._ultimo[ticker] = (precio, ahora)
+
+        puntaje = self.prioridad(ticker, cambio_porcentual, umbral, exposicion)
+        intervalo = min(self.intervalo_maximo, max(self.intervalo_minimo, self.intervalo_base / puntaje))
+        self._intervalo[ticker] = intervalo
+        self._proximo[ticker] = ahora + intervalo
+
+    def reprogramar(self, ticker, ahora=None):
+        """Reprograma un ticker con su intervalo actual (p. ej. tras un error)."""
+        ahora = ahora or reloj.epoch()
+        self._proximo[ticker] = ahora + self._intervalo.get(ticker, self.intervalo_base)
+
+    def pendientes(self, ahora=None):
+        """
+        Tickers a consultar ahora, los más atrasados (relativo a su intervalo) primero,
+        recortados a lo que permita el presupuesto global. El presupuesto se reserva al
+        devolverlos: si el monitor corta la vuelta antes de consultarlos, debe llamar a devolver().
+        """
+        ahora = ahora or reloj.epoch()
+        vencidos = [t for t, proximo in self._proximo.items() if proximo <= ahora]
+        if not vencidos:
+            return []
+        vencidos.sort(key=lambda t: (ahora - self._proximo[t]) / self._intervalo[t], reverse=True)
+        # Los tickers que no entren en el presupuesto siguen vencidos para la próxima vuelta
+        maximo = self.presupuesto.disponibles(ahora) // self.costo_por_ticker
+        concedidas = self.presupuesto.consumir(min(len(vencidos), maximo) * self.costo_por_ticker, ahora)
+        return vencidos[:concedidas // self.costo_por_ticker]
+
+    def devolver(self, tickers):
+        """Devuelve al presupuesto lo reservado para tickers de pendientes() que no se consultaron."""
+        if tickers:
+            self.presupuesto.devolver(len(tickers) * self.costo_por_ticker)
+
+    def espera(self, ahora=None):
+        """Segundos a dormir hasta el próximo ticker vencido (o hasta liberar presupuesto)."""
+        ahora = ahora or reloj.epoch()
+        if not self._proximo:
+            return self.intervalo_base
+        hasta_proximo = min(self._proximo.values()) - ahora
+        if hasta_proximo <= 0:
+            hasta_proximo = self.presupuesto.espera(ahora)
+        return min(self.intervalo_minimo, max(1.0, hasta_proximo))
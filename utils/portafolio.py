@@ -0,0 +1,141 @@
+# utils/portafolio.py
+import threading
+import datetime
+from dataclasses import dataclass
+import numpy as np
+from config import CONFIG
+from utils import ajustes, reloj
+from utils import estado
+from utils.memoria_precios import pizarra_precios
+
+
+def _solo_lectura(arreglo):
+    """Marca un arreglo como inmutable para que el snapshot no pueda alterarse."""
+    arreglo.setflags(write=False)
+    return arreglo
+
+
+@dataclass(frozen=True)
+class SnapshotPortafolio:
+    """
+    Foto inmutable del libro de cortos tras una revaluación.
+    Todos los arreglos siguen el orden de `tickers`. Los valores sin precio son NaN.
+    """
+    momento: datetime.datetime
+    tickers: tuple
+    precio_apertura: np.ndarray  # Precio de venta en corto
+    acciones: np.ndarray
+    precio_actual: np.ndarray
+    apertura_dia: np.ndarray     # Precio de apertura de HOY
+    pnl: np.ndarray              # P&L no realizado desde la venta
+    pnl_pct: np.ndarray
+    exposicion: np.ndarray       # Valor de mercado de la posición corta
+    pnl_dia: np.ndarray          # P&L desde la apertura de hoy
+    pnl_dia_pct: np.ndarray
+    pnl_total: float
+    pnl_dia_total: float
+    exposicion_total: float
+
+    def posicion(self, ticker):
+        """Devuelve los valores de una posición como diccionario (o None si no existe)."""
+        try:
+            i = self.tickers.index(ticker)
+        except ValueError:
+            return None
+        return {
+            "ticker": ticker,
+            "precio_apertura": float(self.precio_apertura[i]),
+            "acciones": int(self.acciones[i]),
+            "precio_actual": float(self.precio_actual[i]),
+            "apertura_dia": float(self.apertura_dia[i]),
+            "pnl": float(self.pnl[i]),
+            "pnl_pct": float(self.pnl_pct[i]),
+            "exposicion": float(self.exposicion[i]),
+            "pnl_dia": float(self.pnl_dia[i]),
+            "pnl_dia_pct": float(self.pnl_dia_pct[i]),
+        }
+
+
+class PortafolioCortos:
+    """
+    Motor de P&L vectorizado para las posiciones cortas.
+    Guarda las posiciones como arreglos y revalúa todo el libro en una sola pasada.
+    Los módulos actualizan precios y leen el mismo snapshot en lugar de recalcular el P&L.
+    """
+
+    def __init__(self, posiciones):
+        """`posiciones`: {ticker: PosicionCorto} de la configuración compilada."""
+        self._lock = threading.Lock()
+        self.tickers = tuple(posiciones)
+        self._indice = {ticker: i for i, ticker in enumerate(self.tickers)}
+        n = len(self.tickers)
+        self._precio_apertura = np.array(
+            [posiciones[t].precio_apertura for t in self.tickers], dtype=np.float64
+        )
+        self._acciones = np.array([posiciones[t].acciones for t in self.tickers], dtype=np.int64)
+        self._precio_actual = np.full(n, np.nan)
+        self._apertura_dia = np.full(n, np.nan)
+        self._snapshot = None
+
+    def actualizar(self, ticker, precio_actual, apertura_dia=None):
+        """Registra el último precio (y opcionalmente la apertura de hoy) de un ticker."""
+        i = self._indice.get(ticker)
+        if i is None:
+            return
+        with self._lock:
+            self._precio_actual[i] = precio_actual
+            if apertura_dia is not None and apertura_dia > 0:
+                self._apertura_dia[i] = apertura_dia
+
+    def revaluar(self, momento=None):
+        """
+        Recalcula P&L, exposición y P&L del día de todas las posiciones a la vez
+        y publica un nuevo snapshot inmutable.
+        """
+        with self._lock:
+            precio_actual = self._precio_actual.copy()
+            apertura_dia = self._apertura_dia.copy()
+
+        acciones = self._acciones
+        # Mismas fórmulas que calcular_cambio_porcentual(base=precio actual) en los módulos
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precio_valido = np.where(precio_actual > 0, precio_actual, np.nan)
+            pnl = (self._precio_apertura - precio_valido) * acciones
+            pnl_pct = (self._precio_apertura - precio_valido) / precio_valido * 100
+            pnl_dia = (apertura_dia - precio_valido) * acciones
+            pnl_dia_pct = (apertura_dia - precio_valido) / precio_valido * 100
+        exposicion = precio_valido * acciones
+
+        snapshot = SnapshotPortafolio(
+            momento=momento or reloj.ahora(CONFIG["MERCADO"]["ZONA_HORARIA"]),
+            tickers=self.tickers,
+            precio_apertura=_solo_lectura(self._precio_apertura.copy()),
+            acciones=_solo_lectura(acciones.copy()),
+            precio_actual=_solo_lectura(precio_actual),
+            apertura_dia=_solo_lectura(apertura_dia),
+            pnl=_solo_lectura(pnl),
+            pnl_pct=_solo_lectura(pnl_pct),
+            exposicion=_solo_lectura(exposicion),
+            pnl_dia=_solo_lectura(pnl_dia),
+            pnl_dia_pct=_solo_lectura(pnl_dia_pct),
+            pnl_total=float(np.nansum(pnl)),
+            pnl_dia_total=float(np.nansum(pnl_dia)),
+            exposicion_total=float(np.nansum(exposicion)),
+        )
+        # Reemplazo atómico de la referencia: los lectores nunca ven un snapshot a medias
+        self._snapshot = snapshot
+        estado.publicar("portafolio", snapshot)
+        # Mismos valores en la pizarra compartida para procesos externos
+        pizarra_precios.actualizar({
+            ticker: {"precio": precio_actual[i], "apertura": apertura_dia[i], "pnl": pnl[i], "pnl_pct": pnl_pct[i]}
+            for i, ticker in enumerate(self.tickers) if precio_actual[i] > 0
+        })
+        return snapshot
+
+    def snapshot(self):
+        """Devuelve el último snapshot publicado (revalúa si aún no existe ninguno)."""
+        return self._snapshot or self.revaluar()
+
+
+# Instancia compartida por short_monitor, movimiento_brusco y reporte_diario
+portafolio_cortos = PortafolioCortos(ajustes.actual().posiciones)
@@ -0,0 +1,139 @@
+# utils/registro.py
+"""
+Registro estructurado asíncrono.
+
+Los hilos de monitoreo solo encolan el evento; un hilo escritor en segundo plano
+lo formatea (JSON o clave=valor) y lo escribe. Si el nivel está deshabilitado,
+la llamada retorna sin construir ni formatear nada.
+"""
+import sys
+import json
+import queue
+import atexit
+import logging
+import datetime
+import threading
+import logging.handlers
+from config import CONFIG
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+_lock_configuracion = threading.Lock()
+_listener = None
+
+
+class FormateadorEstructurado(logging.Formatter):
+    """Formatea cada evento como una línea JSON o de pares clave=valor."""
+
+    def __init__(self, formato="kv"):
+        super().__init__()
+        self.formato = formato
+
+    def format(self, record):
+        momento = datetime.datetime.fromtimestamp(record.created, CONFIG["MERCADO"]["ZONA_HORARIA"])
+        campos = getattr(record, "campos", None) or {}
+        if self.formato == "json":
+            evento = {
+                "ts": momento.isoformat(timespec="milliseconds"),
+                "nivel": record.levelname,
+                "hilo": record.threadName,
+                "modulo": record.name,
+                "evento": record.getMessage(),
+            }
+            evento.update(campos)
+            if record.exc_info:
+                evento["error"] = self.formatException(record.exc_info)
+            return json.dumps(evento, ensure_ascii=False, default=str)
+
+        partes = [
+            momento.strftime("%Y-%m-%d %H:%M:%S"),
+            record.levelname,
+            record.threadName,
+            record.name.rsplit(".", 1)[-1],
+            f"evento={json.dumps(record.getMessage(), ensure_ascii=False)}",
+        ]
+        for clave, valor in campos.items():
+            if isinstance(valor, float):
+                valor = f"{valor:.4g}" if abs(valor) < 1e-2 else f"{valor:.2f}"
+            elif isinstance(valor, str) and (" " in valor or not valor):
+                valor = json.dumps(valor, ensure_ascii=False)
+            partes.append(f"{clave}={valor}")
+        linea = " ".join(partes)
+        if record.exc_info:
+            linea += "\n" + self.formatException(record.exc_info)
+        return linea
+
+
+class _ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que no formatea en el hilo que registra: el formateo ocurre en el escritor."""
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        # Si el escritor no da abasto se descarta el evento en lugar de frenar al monitor
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+class Registro:
+    """Envoltura liviana sobre logging.Logger con campos estructurados como kwargs."""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def habilitado(self, nivel):
+        return self._logger.isEnabledFor(nivel)
+
+    def _registrar(self, nivel, evento, campos, exc_info=False):
+        if self._logger.isEnabledFor(nivel):
+            self._logger.log(nivel, evento, extra={"campos": campos}, exc_info=exc_info)
+
+    def debug(self, evento, **campos):
+        self._registrar(DEBUG, evento, campos)
+
+    def info(self, evento, **campos):
+        self._registrar(INFO, evento, campos)
+
+    def warning(self, evento, **campos):
+        self._registrar(WARNING, evento, campos)
+
+    def error(self, evento, **campos):
+        self._registrar(ERROR, evento, campos)
+
+    def exception(self, evento, **campos):
+        self._registrar(ERROR, evento, campos, exc_info=True)
+
+
+def configurar_registro():
+    """Configura (una sola vez) la cola, el hilo escritor y el nivel del registro."""
+    global _listener
+    with _lock_configuracion:
+        if _listener is not None:
+            return
+        config = CONFIG["REGISTRO"]
+        cola = queue.Queue(maxsize=config["TAMANO_COLA"])
+        manejador_salida = logging.StreamHandler(sys.stdout)
+        manejador_salida.setFormatter(FormateadorEstructurado(config["FORMATO"]))
+
+        raiz = logging.getLogger("monitor")
+        raiz.setLevel(config["NIVEL"])
+        raiz.propagate = False
+        raiz.handlers[:] = [_ManejadorCola(cola)]
+
+        _listener = logging.handlers.QueueListener(cola, manejador_salida, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def obtener_registro(nombre):
+    """Devuelve el registro de un módulo (p. ej. 'MovimientoBrusco')."""
+    configurar_registro()
+    return Registro(logging.getLogger(f"monitor.{nombre}"))
@@ -0,0 +1,219 @@
+# utils/reglas.py
+"""
+Motor de reglas de alerta declarativas.
+
+Cada regla es una expresión sobre campos por ticker (p. ej. "cambio <= -umbral" o
+"pnl < -500 and cambio_dia > 3") que se compila una sola vez en una función sobre
+columnas numpy: en cada ciclo se evalúa de una vez para todos los tickers del módulo.
+
+La expresión usa un subconjunto de Python validado con ast: números, campos, + - * /,
+comparaciones (encadenadas también), and / or / not y las funciones abs, min y max.
+Un campo sin dato (NaN) hace falsa cualquier comparación.
+
+Histéresis: tras disparar, la regla queda desarmada para ese ticker hasta que se cumple
+su expresión de SALIDA (o, si no tiene, hasta que la condición deja de cumplirse).
+El enfriamiento fija además un mínimo de segundos entre disparos del mismo ticker.
+"""
+import ast
+import operator
+from dataclasses import dataclass, field
+import numpy as np
+
+# Campos disponibles en las expresiones (columnas de TablaCampos)
+CAMPOS = (
+    "precio",      # Último precio
+    "cambio",      # Cambio % contra el precio de referencia del intervalo
+    "cambio_dia",  # Cambio % desde la apertura de hoy
+    "umbral",      # Umbral % configurado para el ticker
+    "pnl",         # P&L no realizado de la posición corta ($)
+    "pnl_pct",     # P&L no realizado (%)
+)
+
+_BINARIOS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+_COMPARACIONES = {
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt,
+    ast.GtE: operator.ge, ast.Eq: operator.eq, ast.NotEq: operator.ne,
+}
+_FUNCIONES = {"abs": (np.abs, 1), "min": (np.minimum, 2), "max": (np.maximum, 2)}
+
+
+class ErrorRegla(ValueError):
+    """Expresión de regla inválida."""
+
+
+def _compilar_nodo(nodo, texto, usados):
+    """Convierte un nodo del ast en una función columnas -> arreglo (o escalar)."""
+    if isinstance(nodo, ast.Constant) and isinstance(nodo.value, (int, float)):
+        valor = nodo.value
+        return lambda columnas: valor
+    if isinstance(nodo, ast.Name):
+        if nodo.id not in CAMPOS:
+            raise ErrorRegla(f"campo desconocido {nodo.id!r} en {texto!r} (campos: {', '.join(CAMPOS)})")
+        usados.add(nodo.id)
+        nombre = nodo.id
+        return lambda columnas: columnas[nombre]
+    if isinstance(nodo, ast.UnaryOp) and isinstance(nodo.op, (ast.USub, ast.UAdd, ast.Not)):
+        operando = _compilar_nodo(nodo.operand, texto, usados)
+        if isinstance(nodo.op, ast.Not):
+            return lambda columnas: np.logical_not(operando(columnas))
+        if isinstance(nodo.op, ast.USub):
+            return lambda columnas: np.negative(operando(columnas))
+        return operando
+    if isinstance(nodo, ast.BinOp) and type(nodo.op) in _BINARIOS:
+        funcion = _BINARIOS[type(nodo.op)]
+        izquierda = _compilar_nodo(nodo.left, texto, usados)
+        derecha = _compilar_nodo(nodo.right, texto, usados)
+        return lambda columnas: funcion(izquierda(columnas), derecha(columnas))
+    if isinstance(nodo, ast.BoolOp):
+        funcion = np.logical_and if isinstance(nodo.op, ast.And) else np.logical_or
+        partes = [_compilar_nodo(valor, texto, usados) for valor in nodo.values]
+
+        def booleano(columnas):
+            resultado = partes[0](columnas)
+            for parte in partes[1:]:
+                resultado = funcion(resultado, parte(columnas))
+            return resultado
+        return booleano
+    if isinstance(nodo, ast.Compare) and all(type(op) in _COMPARACIONES for op in nodo.ops):
+        # a < b <= c equivale a (a < b) and (b <= c)
+        operandos = [_compilar_nodo(n, texto, usados) for n in (nodo.left, *nodo.comparators)]
+        funciones = [_COMPARACIONES[type(op)] for op in nodo.ops]
+
+        def comparar(columnas):
+            valores = [operando(columnas) for operando in operandos]
+            resultado = funciones[0](valores[0], valores[1])
+            for i, funcion in enumerate(funciones[1:], start=1):
+                resultado = np.logical_and(resultado, funcion(valores[i], valores[i + 1]))
+            return resultado
+        return comparar
+    if isinstance(nodo, ast.Call) and isinstance(nodo.func, ast.Name) and nodo.func.id in _FUNCIONES and not nodo.keywords:
+        funcion, aridad = _FUNCIONES[nodo.func.id]
+        if len(nodo.args) != aridad:
+            raise ErrorRegla(f"{nodo.func.id}() recibe {aridad} argumento(s) en {texto!r}")
+        argumentos = [_compilar_nodo(a, texto, usados) for a in nodo.args]
+        return lambda columnas: funcion(*(a(columnas) for a in argumentos))
+    raise ErrorRegla(f"expresión no permitida en {texto!r}: {ast.dump(nodo)[:60]}")
+
+
+def compilar_expresion(texto):
+    """
+    Compila una expresión en (función columnas -> arreglo booleano, campos usados).
+    Lanza ErrorRegla si usa algo fuera del lenguaje.
+    """
+    try:
+        arbol = ast.parse(texto, mode="eval")
+    except SyntaxError as e:
+        raise ErrorRegla(f"sintaxis inválida en {texto!r}: {e.msg}") from None
+    usados = set()
+    funcion = _compilar_nodo(arbol.body, texto, usados)
+
+    def evaluar(columnas, n):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            resultado = funcion(columnas)
+        return np.broadcast_to(np.asarray(resultado, dtype=bool), (n,))
+    return evaluar, frozenset(usados)
+
+
+@dataclass(frozen=True, slots=True)
+class Regla:
+    nombre: str
+    condicion: str
+    salida: str | None     # Expresión que vuelve a armar la regla (histéresis)
+    enfriamiento: float    # Segundos mínimos entre disparos del mismo ticker
+    modulos: tuple         # Monitores que la evalúan (MovimientoBrusco, DeteccionMovimiento)
+    descripcion: str
+    tipo_alerta: str | None # Ruta de notificación; None usa la del módulo
+    evaluar_condicion: object = field(repr=False, compare=False)
+    evaluar_salida: object = field(repr=False, compare=False)
+    campos: frozenset = frozenset() # Campos que usa la condición
+
+
+def compilar_regla(nombre, condicion, salida=None, enfriamiento=0.0, modulos=(), descripcion="", tipo_alerta=None):
+    evaluar_condicion, campos = compilar_expresion(condicion)
+    evaluar_salida = compilar_expresion(salida)[0] if salida else None
+    return Regla(
+        nombre=nombre,
+        condicion=condicion,
+        salida=salida,
+        enfriamiento=float(enfriamiento),
+        modulos=tuple(modulos),
+        descripcion=descripcion or nombre,
+        tipo_alerta=tipo_alerta or None,
+        evaluar_condicion=evaluar_condicion,
+        evaluar_salida=evaluar_salida,
+        campos=campos,
+    )
+
+
+class TablaCampos:
+    """Una columna numpy por campo y una fila por ticker del módulo."""
+
+    def __init__(self, tickers):
+        self.tickers = tuple(tickers)
+        self.indice = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.columnas = {campo: np.full(len(self.tickers), np.nan) for campo in CAMPOS}
+        self.actualizados = np.zeros(len(self.tickers), dtype=bool) # Filas con datos nuevos en el ciclo
+
+    def actualizar(self, ticker, **valores):
+        """Fija los campos de un ticker y lo marca como actualizado en este ciclo."""
+        i = self.indice[ticker]
+        for campo, valor in valores.items():
+            self.columnas[campo][i] = np.nan if valor is None else valor
+        self.actualizados[i] = True
+
+    def asignar(self, campo, tickers, valores):
+        """Fija un campo para varios tickers a la vez (sin marcarlos como actualizados)."""
+        filas = [self.indice[t] for t in tickers if t in self.indice]
+        self.columnas[campo][filas] = [v for t, v in zip(tickers, valores) if t in self.indice]
+
+    def valor(self, ticker, campo):
+        return float(self.columnas[campo][self.indice[ticker]])
+
+
+@dataclass(frozen=True, slots=True)
+class Disparo:
+    regla: Regla
+    ticker: str
+
+
+class MotorReglas:
+    """Evalúa un conjunto de reglas sobre una TablaCampos y lleva su histéresis y enfriamiento."""
+
+    def __init__(self, reglas, tickers):
+        self.reglas = tuple(reglas)
+        n = len(tuple(tickers))
+        self._armada = {regla.nombre: np.ones(n, dtype=bool) for regla in self.reglas}
+        self._ultimo_disparo = {regla.nombre: np.full(n, -np.inf) for regla in self.reglas}
+
+    def evaluar(self, tabla, ahora):
+        """
+        Evalúa todas las reglas sobre los tickers actualizados en el ciclo y limpia las marcas.
+        Devuelve la lista de Disparo, en el orden de las reglas.
+        """
+        n = len(tabla.tickers)
+        actualizados = tabla.actualizados
+        disparos = []
+        for regla in self.reglas:
+            cumple = regla.evaluar_condicion(tabla.columnas, n)
+            armada = self._armada[regla.nombre]
+            ultimo = self._ultimo_disparo[regla.nombre]
+
+            # Rearmar: la salida explícita o, sin ella, que la condición deje de cumplirse
+            rearme = regla.evaluar_salida(tabla.columnas, n) if regla.evaluar_salida else ~cumple
+            armada |= rearme & actualizados
+
+            dispara = cumple & armada & actualizados & (ahora - ultimo >= regla.enfriamiento)
+            armada &= ~dispara
+            ultimo[dispara] = ahora
+            disparos.extend(Disparo(regla, tabla.tickers[i]) for i in np.flatnonzero(dispara))
+        actualizados[:] = False
+        return disparos
+
+
+def agrupar_disparos(disparos, tipo_por_defecto):
+    """Agrupa los disparos en {(ticker, tipo de alerta): [reglas]} para enviar un mensaje por grupo."""
+    grupos = {}
+    for disparo in disparos:
+        clave = (disparo.ticker, disparo.regla.tipo_alerta or tipo_por_defecto)
+        grupos.setdefault(clave, []).append(disparo.regla)
+    return grupos
@@ -0,0 +1,54 @@
+# utils/reloj.py
+"""
+Reloj del proceso. Todos los módulos leen la hora y duermen a través de este módulo
+para que la prueba de carga pueda simular una sesión completa en minutos.
+Sin acelerar, equivale exactamente a time.time / time.monotonic / time.sleep.
+"""
+import time
+import datetime
+
+_factor = 1.0
+_inicio_real = None     # time.monotonic() al acelerar
+_inicio_simulado = None # Epoch simulado al acelerar
+
+
+def acelerar(inicio, factor):
+    """
+    Hace que el reloj arranque en `inicio` (datetime con zona horaria) y avance `factor`
+    veces más rápido que el tiempo real. Pensado solo para pruebas de carga.
+    """
+    global _factor, _inicio_real, _inicio_simulado
+    if factor <= 0:
+        raise ValueError("El factor de aceleración debe ser positivo.")
+    _inicio_simulado = inicio.timestamp()
+    _inicio_real = time.monotonic()
+    _factor = float(factor)
+
+
+def factor():
+    return _factor
+
+
+def epoch():
+    """Equivalente a time.time()."""
+    if _inicio_real is None:
+        return time.time()
+    return _inicio_simulado + (time.monotonic() - _inicio_real) * _factor
+
+
+def monotonico():
+    """Equivalente a time.monotonic() (en segundos simulados si el reloj está acelerado)."""
+    if _inicio_real is None:
+        return time.monotonic()
+    return epoch()
+
+
+def ahora(tz=None):
+    """Equivalente a datetime.datetime.now(tz)."""
+    return datetime.datetime.fromtimestamp(epoch(), tz)
+
+
+def dormir(segundos):
+    """Equivalente a time.sleep(); con el reloj acelerado duerme proporcionalmente menos."""
+    if segundos > 0:
+        time.sleep(segundos / _factor)
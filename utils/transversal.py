@@ -0,0 +1,132 @@
+# utils/transversal.py
+"""
+Etapa transversal: compara el movimiento de cada ticker con el del resto del universo
+en una sola pasada vectorizada para distinguir un movimiento de mercado de uno propio.
+"""
+from dataclasses import dataclass
+import numpy as np
+from config import CONFIG
+from utils import reloj
+from utils.datos_mercado import obtener_historial
+
+# Factor para que la MAD sea un estimador consistente de la desviación estándar
+_FACTOR_MAD = 1.4826
+
+
+@dataclass(frozen=True)
+class AnalisisTransversal:
+    tickers: tuple
+    cambios: np.ndarray        # Cambio % de cada ticker en el intervalo
+    mediana: float             # Movimiento típico del universo
+    dispersion: float          # Dispersión robusta (MAD escalada)
+    residuos: np.ndarray       # Cambio menos el movimiento de mercado (mediana o beta * referencia)
+    z: np.ndarray              # Residuo en unidades de dispersión
+    amplitud: float            # Fracción de tickers que se mueven en la dirección de la mediana
+    cambio_referencia: float   # Cambio del ETF de referencia (NaN si no se usa)
+    movimiento_mercado: bool   # True si el universo entero se está moviendo
+    atipico: np.ndarray        # |z| >= Z_ATIPICO por ticker, calculado una vez en analizar()
+    indices: dict              # ticker -> posición en los arreglos
+
+    def es_atipico(self, ticker):
+        """Indica si el movimiento del ticker es propio (no explicado por el mercado)."""
+        i = self.indices.get(ticker)
+        return True if i is None else bool(self.atipico[i])
+
+
+def analizar(cambios, cambio_referencia=None, betas=None):
+    """
+    Calcula mediana, dispersión y z-scores del universo a partir de {ticker: cambio %}.
+    Si se da el cambio de un ETF de referencia, el residuo es el cambio ajustado por beta
+    (beta 1.0 salvo que se indique en `betas`); si no, el residuo se mide contra la mediana.
+    """
+    config = CONFIG["TRANSVERSAL"]
+    tickers = tuple(cambios)
+    valores = np.array([cambios[t] for t in tickers], dtype=np.float64)
+    if len(valores) == 0:
+        return None
+
+    mediana = float(np.median(valores))
+    dispersion = float(np.median(np.abs(valores - mediana)) * _FACTOR_MAD)
+    dispersion = max(dispersion, config["DISPERSION_MINIMA"])
+
+    if cambio_referencia is not None and np.isfinite(cambio_referencia):
+        vector_betas = np.array([(betas or {}).get(t, 1.0) for t in tickers], dtype=np.float64)
+        movimiento_mercado_esperado = vector_betas * cambio_referencia
+        movimiento_tipico = float(cambio_referencia)
+    else:
+        movimiento_mercado_esperado = mediana
+        movimiento_tipico = mediana
+        cambio_referencia = float("nan")
+    residuos = valores - movimiento_mercado_esperado
+    z = residuos / dispersion
+
+    signo = np.sign(movimiento_tipico)
+    amplitud = float(np.mean(np.sign(valores) == signo)) if signo != 0 else 0.0
+    movimiento_mercado = bool(
+        len(valores) >= config["MIN_TICKERS"]
+        and abs(movimiento_tipico) >= config["UMBRAL_MERCADO"]
+        and amplitud >= config["AMPLITUD_MINIMA"]
+    )
+
+    return AnalisisTransversal(
+        tickers=tickers,
+        cambios=valores,
+        mediana=mediana,
+        dispersion=dispersion,
+        residuos=residuos,
+        z=z,
+        amplitud=amplitud,
+        cambio_referencia=float(cambio_referencia),
+        movimiento_mercado=movimiento_mercado,
+        atipico=np.abs(z) >= config["Z_ATIPICO"],
+        indices={ticker: i for i, ticker in enumerate(tickers)},
+    )
+
+
+def cambio_referencia(segundos):
+    """
+    Cambio % del ETF de referencia en los últimos `segundos`, a partir de sus barras de 5m.
+    Devuelve None si no hay ETF configurado o no hay datos suficientes.
+    """
+    etf = CONFIG["TRANSVERSAL"]["ETF_REFERENCIA"]
+    if not etf:
+        return None
+    hist = obtener_historial(etf, period="1d", interval="5m")
+    if hist.empty:
+        return None
+    cierres = hist["Close"]
+    limite = cierres.index[-1] - np.timedelta64(int(segundos), "s")
+    previos = cierres[cierres.index <= limite]
+    base = previos.iloc[-1] if not previos.empty else hist["Open"].iloc[0]
+    if not base or base <= 0:
+        return None
+    return float((cierres.iloc[-1] - base) / base * 100)
+
+
+def analizar_recientes(ultimos_cambios, ventana):
+    """
+    Analiza los últimos cambios ({ticker: (cambio %, momento epoch)}) que tengan menos
+    de `ventana` segundos, usando el ETF de referencia si está configurado.
+    """
+    ahora = reloj.epoch()
+    recientes = {t: cambio for t, (cambio, momento) in ultimos_cambios.items() if ahora - momento <= ventana}
+    if not recientes:
+        return None
+    try:
+        referencia = cambio_referencia(ventana)
+    except Exception:
+        referencia = None # Sin referencia se usa la mediana del universo
+    return analizar(recientes, referencia, CONFIG["TRANSVERSAL"]["BETAS"])
+
+
+def mensaje_mercado(analisis, universo):
+    """Mensaje de Telegram para una alerta de movimiento de mercado."""
+    direccion = "📉 Caída" if analisis.mediana < 0 else "📈 Subida"
+    mensaje = (
+        f"🌐 {direccion} generalizada en {universo}:\n"
+        f"  Mediana: {analisis.mediana:+.2f}% | Dispersión: {analisis.dispersion:.2f}%\n"
+        f"  Amplitud: {analisis.amplitud * 100:.0f}% de {len(analisis.tickers)} tickers en la misma dirección"
+    )
+    if np.isfinite(analisis.cambio_referencia):
+        mensaje += f"\n  {CONFIG['TRANSVERSAL']['ETF_REFERENCIA']}: {analisis.cambio_referencia:+.2f}%"
+    return mensaje + "\n  Solo se alertarán movimientos atípicos respecto al mercado."